@@ -20,6 +20,9 @@ class Settings(BaseSettings):
     HDFS_URL: str = "http://localhost:9870"
     HDFS_USER: str = "hadoop"
     HDFS_BASE_PATH: str = "/urban_data"
+
+    # Instantané des routes /current (secondes entre deux rafraîchissements)
+    SNAPSHOT_REFRESH_INTERVAL: float = 10.0
     
     # CORS
     CORS_ORIGINS: list = [
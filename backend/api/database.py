@@ -1,6 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from config import settings
+from mongodb_service import mongodb_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,6 +35,9 @@ async def connect_to_mongodb():
         # Test de connexion
         await mongodb.client.admin.command('ping')
         logger.info(" Connecté à MongoDB avec succès")
+
+        # Index composés des agrégations (mongodb_service.py)
+        await mongodb_service.ensure_indexes(mongodb.db)
         
         # Afficher les stats
         emissions_count = await mongodb.emissions.count_documents({})
@@ -0,0 +1,230 @@
+"""
+Historique des routes traffic/pollution/noise
+
+- séries réduites: une série par zone, ramenée à `points` points
+  (services/downsampling.py). Pour les longues plages, le rollup le plus
+  grossier qui donne encore `points` fenêtres est lu à la place des
+  agrégats à la seconde: volume lu et taille de la réponse suivent la
+  résolution de l'écran, pas la durée demandée.
+- pages brutes: enregistrements triés par (timestamp, zone), pagination
+  par curseur opaque (position du dernier élément renvoyé, pas d'offset).
+  Une page ne lit que les timestamps nécessaires, par fenêtres croissantes.
+- build_router: les trois routers (/current, /historical, /historical/raw),
+  qui ne diffèrent que par le modèle, les métriques et le champ de
+  l'instantané.
+"""
+
+import base64
+import json
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from pydantic import BaseModel
+
+from downsampling import DOWNSAMPLERS, downsample
+from hdfs_service import hdfs_service
+from models import HistoricalData, HistoricalPage
+from snapshot import snapshot_store
+
+# Rollups de mapper_aggregate_zone.py (AGG_ROLLUPS), du plus grossier au plus fin
+ROLLUP_RESOLUTIONS = [3600, 300, 60]
+# Résolutions produites par le job (1 = seconde SUMO)
+RESOLUTIONS = (1, *ROLLUP_RESOLUTIONS)
+
+DEFAULT_POINTS = 1000
+MAX_POINTS = 10000
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+def encode_cursor(timestamp: int, zone: str) -> str:
+    """Curseur opaque désignant le dernier enregistrement d'une page"""
+    raw = json.dumps([timestamp, zone], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    Position (timestamp, zone) d'un curseur
+
+    Raises:
+        HTTPException: 400 si le curseur est invalide
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, zone = json.loads(raw)
+        return int(timestamp), str(zone)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+
+
+def _check_range(start: int, end: int):
+    if end < start:
+        raise HTTPException(status_code=400, detail="end doit être supérieur ou égal à start")
+
+
+def _check_resolution(resolution: int):
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Résolution inconnue: {resolution} "
+                                                    f"({', '.join(map(str, sorted(RESOLUTIONS)))})")
+
+
+def choose_resolution(start: int, end: int, points: int) -> int:
+    """Rollup le plus grossier qui couvre la plage avec au moins `points` fenêtres"""
+    for resolution in ROLLUP_RESOLUTIONS:
+        if (end - start + 1) // resolution >= points and hdfs_service.has_resolution(resolution):
+            return resolution
+    return 1
+
+
+def _read(start: int, end: int, resolution: int, zone: Optional[str]) -> List[Dict]:
+    # Fenêtres de rollup alignées: celle qui contient start est incluse
+    records = hdfs_service.read_aggregated_range(start - start % resolution, end, resolution)
+    if zone is not None:
+        records = [r for r in records if r.get('zone') == zone]
+    return records
+
+
+def get_series(metrics: Sequence[str], metric: Optional[str], start: int, end: int,
+               zone: Optional[str] = None, points: int = DEFAULT_POINTS,
+               method: str = 'lttb') -> Dict:
+    """
+    Séries réduites d'une métrique, par zone
+
+    Args:
+        metrics: métriques autorisées (la première est la valeur par défaut)
+        metric: clé de `stats` (avg_speed_kmh, avg_co2...)
+        start: premier timestamp (inclus)
+        end: dernier timestamp (inclus)
+        zone: Zone spécifique (optionnel)
+        points: nombre de points maximal par série
+        method: 'lttb' ou 'minmax'
+
+    Returns:
+        Document HistoricalData
+    """
+    metric = metric or metrics[0]
+    if metric not in metrics:
+        raise HTTPException(status_code=400, detail=f"Métrique inconnue: {metric} ({', '.join(metrics)})")
+    if method not in DOWNSAMPLERS:
+        raise HTTPException(status_code=400, detail=f"Méthode inconnue: {method} ({', '.join(DOWNSAMPLERS)})")
+    _check_range(start, end)
+
+    resolution = choose_resolution(start, end, points)
+    by_zone = defaultdict(list)
+    raw_points = 0
+    for record in _read(start, end, resolution, zone):
+        value = record.get('stats', {}).get(metric)
+        if value is None:
+            continue
+        by_zone[record['zone']].append((record['timestamp'], value))
+        raw_points += 1
+
+    series = []
+    for name, values in sorted(by_zone.items()):
+        values.sort()
+        series.append({
+            'zone': name,
+            'points': [{'timestamp': t, 'value': v} for t, v in downsample(values, points, method)],
+        })
+
+    return {
+        'metric': metric, 'start': start, 'end': end, 'resolution': resolution,
+        'method': method, 'raw_points': raw_points, 'series': series,
+    }
+
+
+def get_page(start: int, end: int, zone: Optional[str] = None, resolution: int = 1,
+             limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """
+    Page d'enregistrements bruts triés par (timestamp, zone)
+
+    Args:
+        start: premier timestamp (inclus)
+        end: dernier timestamp (inclus)
+        zone: Zone spécifique (optionnel)
+        resolution: Résolution en secondes (1 ou un rollup, 400 sinon)
+        limit: taille de la page
+        cursor: next_cursor de la page précédente
+
+    Returns:
+        Document HistoricalPage (next_cursor à None sur la dernière page)
+    """
+    _check_range(start, end)
+    _check_resolution(resolution)
+    after = decode_cursor(cursor) if cursor else None
+    # Fenêtres alignées sur la résolution: deux lectures ne se recouvrent pas
+    start -= start % resolution
+    low = max(start, after[0]) if after else start
+
+    items = []
+    # Une fenêtre de `limit` timestamps suffit en général; doublée tant que la page n'est pas pleine
+    span = limit * resolution
+    while low <= end and len(items) <= limit:
+        high = min(end, low + span - 1)
+        window = _read(low, high, resolution, zone)
+        window.sort(key=lambda r: (r['timestamp'], r['zone']))
+        if after:
+            window = [r for r in window if (r['timestamp'], r['zone']) > after]
+        items.extend(window)
+        low = high + 1
+        span *= 2
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1]['timestamp'], items[-1]['zone'])
+    return {'items': items, 'next_cursor': next_cursor}
+
+
+def build_router(model: Type[BaseModel], metrics: Sequence[str], field: str,
+                 current_doc: str, historical_doc: str) -> APIRouter:
+    """
+    Router /current, /historical et /historical/raw d'un type de mesure
+
+    Args:
+        model: modèle d'un point de /current (TrafficDataPoint...)
+        metrics: clés de `stats` exposées par /historical (la première par défaut)
+        field: attribut de l'instantané servi par /current (traffic, pollution, noise)
+        current_doc: description de /current
+        historical_doc: description de /historical
+    """
+    router = APIRouter()
+
+    # async: aucune I/O, la réponse est l'instantané déjà sérialisé
+    async def get_current():
+        snapshot = snapshot_store.current
+        if snapshot is None:
+            raise HTTPException(status_code=503, detail="Instantané pas encore disponible")
+        return Response(content=getattr(snapshot, field), media_type="application/json")
+
+    def get_historical(
+        start: int = Query(..., description="Premier timestamp (inclus)"),
+        end: int = Query(..., description="Dernier timestamp (inclus)"),
+        zone: Optional[str] = None,
+        metric: Optional[str] = None,
+        points: int = Query(DEFAULT_POINTS, ge=4, le=MAX_POINTS,
+                            description="Nombre de points maximal par zone"),
+        method: str = Query('lttb', description="lttb ou minmax"),
+    ):
+        return get_series(metrics, metric, start, end, zone, points, method)
+
+    def get_historical_raw(
+        start: int = Query(..., description="Premier timestamp (inclus)"),
+        end: int = Query(..., description="Dernier timestamp (inclus)"),
+        zone: Optional[str] = None,
+        resolution: int = Query(1, description="1, 60, 300 ou 3600"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor de la page précédente"),
+    ):
+        return get_page(start, end, zone, resolution, limit, cursor)
+
+    router.add_api_route("/current", get_current, response_model=List[model],
+                         name=f"get_current_{field}", description=current_doc)
+    router.add_api_route("/historical", get_historical, response_model=HistoricalData,
+                         name=f"get_historical_{field}", description=historical_doc)
+    router.add_api_route("/historical/raw", get_historical_raw, response_model=HistoricalPage,
+                         name=f"get_historical_{field}_raw",
+                         description="Enregistrements bruts par pages (curseur opaque)")
+    return router
@@ -2,9 +2,15 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
+import os
+import sys
+
+# Services partagés avec les scripts (backend/services)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services'))
 
 from config import settings
 from database import connect_to_mongodb, close_mongodb_connection
+from snapshot import snapshot_store
 
 # Import routes
 from routes import traffic, pollution, noise, alerts, analytics
@@ -22,9 +28,11 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info(" Démarrage de l'API SmartCity...")
     await connect_to_mongodb()
+    snapshot_store.start()
     yield
     # Shutdown
     logger.info(" Arrêt de l'API SmartCity...")
+    await snapshot_store.stop()
     await close_mongodb_connection()
 
 # Application FastAPI
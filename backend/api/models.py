@@ -92,4 +92,27 @@ class AnalyticsData(BaseModel):
     hourly_trends: List[dict]
     zone_distribution: List[dict]
     top_issues: List[dict]
-    performance_metrics: List[dict]
\ No newline at end of file
+    performance_metrics: List[dict]
+
+# ============ Historique ============
+
+class SeriesPoint(BaseModel):
+    timestamp: int
+    value: float
+
+class ZoneSeries(BaseModel):
+    zone: str
+    points: List[SeriesPoint]
+
+class HistoricalData(BaseModel):
+    metric: str
+    start: int
+    end: int
+    resolution: int  # 1 = seconde SUMO, 60/300/3600 = rollups
+    method: str  # lttb, minmax
+    raw_points: int  # points lus avant réduction
+    series: List[ZoneSeries]
+
+class HistoricalPage(BaseModel):
+    items: List[dict]  # {zone, timestamp, resolution, stats}
+    next_cursor: Optional[str] = None
@@ -0,0 +1,41 @@
+"""
+Routes Alerts: épisodes d'alerte détectés par le job alert_detector.py
+(/urban_data/alerts), les plus récents d'abord
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from models import Alert
+from hdfs_service import hdfs_service
+
+router = APIRouter()
+
+TYPES = ('traffic', 'pollution', 'noise')
+STATUSES = ('active', 'resolved')
+
+
+@router.get("/", response_model=List[Alert])
+def get_alerts(
+    zone: Optional[str] = None,
+    type: Optional[str] = Query(None, description="traffic, pollution ou noise"),
+    status: Optional[str] = Query(None, description="active ou resolved"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Épisodes d'alerte, filtrés par zone, type et statut"""
+    if type is not None and type not in TYPES:
+        raise HTTPException(status_code=400, detail=f"Type inconnu: {type} ({', '.join(TYPES)})")
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"Statut inconnu: {status} ({', '.join(STATUSES)})")
+
+    alerts = hdfs_service.read_alerts(zone, status)
+    if type is not None:
+        alerts = [a for a in alerts if a.get('type') == type]
+    return alerts[:limit]
+
+
+@router.get("/active", response_model=List[Alert])
+def get_active_alerts(zone: Optional[str] = None):
+    """Épisodes encore en cours à la fin des données agrégées"""
+    return hdfs_service.read_alerts(zone, 'active')
@@ -0,0 +1,20 @@
+"""
+Routes Analytics: cube précalculé à chaque exécution du pipeline
+(stats_aggregator.py), servi tel quel sans parcourir HDFS ni MongoDB
+"""
+
+from fastapi import APIRouter, HTTPException
+
+from models import AnalyticsData
+from hdfs_service import hdfs_service
+
+router = APIRouter()
+
+
+@router.get("/", response_model=AnalyticsData)
+def get_analytics():
+    """Tendances horaires, répartition par zone, problèmes principaux et indicateurs"""
+    data = hdfs_service.read_analytics()
+    if data is None:
+        raise HTTPException(status_code=503, detail="Cube analytique pas encore calculé")
+    return data
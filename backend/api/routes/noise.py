@@ -0,0 +1,17 @@
+"""
+Routes Noise: dernières valeurs par zone servies depuis l'instantané
+rafraîchi en tâche de fond (snapshot.py), historique réduit ou paginé
+(historical.py)
+"""
+
+import historical
+from models import NoiseDataPoint
+
+# Clés de `stats` exposées par /historical (la première par défaut)
+METRICS = ('avg_noise_db', 'p95_noise_db', 'avg_ambient_noise_db')
+
+router = historical.build_router(
+    NoiseDataPoint, METRICS, 'noise',
+    current_doc="Dernier bruit (décibels, niveau) de chaque zone",
+    historical_doc="Historique (décibels) réduit à `points` points par zone",
+)
@@ -0,0 +1,17 @@
+"""
+Routes Pollution: dernières valeurs par zone servies depuis l'instantané
+rafraîchi en tâche de fond (snapshot.py), historique réduit ou paginé
+(historical.py)
+"""
+
+import historical
+from models import PollutionDataPoint
+
+# Clés de `stats` exposées par /historical (la première par défaut)
+METRICS = ('avg_co2', 'avg_co', 'avg_nox', 'avg_pmx')
+
+router = historical.build_router(
+    PollutionDataPoint, METRICS, 'pollution',
+    current_doc="Dernière pollution (AQI, particules, CO2, NOx) de chaque zone",
+    historical_doc="Historique (CO2, CO, NOx, PMx) réduit à `points` points par zone",
+)
@@ -0,0 +1,17 @@
+"""
+Routes Traffic: dernières valeurs par zone servies depuis l'instantané
+rafraîchi en tâche de fond (snapshot.py), historique réduit ou paginé
+(historical.py)
+"""
+
+import historical
+from models import TrafficDataPoint
+
+# Clés de `stats` exposées par /historical (la première par défaut)
+METRICS = ('avg_speed_kmh', 'vehicle_count', 'p50_speed_kmh', 'p95_speed_kmh')
+
+router = historical.build_router(
+    TrafficDataPoint, METRICS, 'traffic',
+    current_doc="Dernier trafic (vitesse, véhicules, congestion) de chaque zone",
+    historical_doc="Historique (vitesse, véhicules) réduit à `points` points par zone",
+)
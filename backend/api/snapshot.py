@@ -0,0 +1,194 @@
+"""
+Instantané des dernières statistiques par zone (routes /current)
+
+Une tâche de fond, démarrée et arrêtée par le lifespan de l'API, relit
+toutes les SNAPSHOT_REFRESH_INTERVAL secondes le dernier timestamp
+agrégé (cache de hdfs_service, lecture dans un thread) et construit un
+nouvel instantané: points trafic/pollution/bruit déjà convertis et déjà
+sérialisés en JSON. L'instantané n'est jamais modifié, seulement
+remplacé: une requête ne fait ni I/O ni sérialisation, quel que soit le
+nombre de tableaux de bord ouverts.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from pydantic import TypeAdapter
+
+from config import settings
+from models import TrafficDataPoint, PollutionDataPoint, NoiseDataPoint
+from hdfs_service import hdfs_service
+
+logger = logging.getLogger(__name__)
+
+# Niveaux de zone_stats.get_pollution_level -> qualités de PollutionDataPoint
+QUALITY_BY_POLLUTION_LEVEL = {
+    "Bon": "Bon",
+    "Médiocre": "Modéré",
+    "Mauvais": "Mauvais",
+    "Très Mauvais": "Mauvais",
+    "Dangereux": "Dangereux",
+    "Toxique": "Dangereux",
+}
+
+# Points de rupture de l'AQI PM2.5 (US EPA): (concentration basse, haute, indice bas, haut)
+AQI_BREAKPOINTS = [
+    (0.0, 12.0, 0, 50),
+    (12.1, 35.4, 51, 100),
+    (35.5, 55.4, 101, 150),
+    (55.5, 150.4, 151, 200),
+    (150.5, 250.4, 201, 300),
+    (250.5, 500.4, 301, 500),
+]
+
+_traffic_json = TypeAdapter(List[TrafficDataPoint])
+_pollution_json = TypeAdapter(List[PollutionDataPoint])
+_noise_json = TypeAdapter(List[NoiseDataPoint])
+
+
+def compute_aqi(pm25: float) -> int:
+    """Indice de qualité de l'air (0-500) d'une concentration PM2.5"""
+    for c_low, c_high, i_low, i_high in AQI_BREAKPOINTS:
+        if pm25 <= c_high:
+            return round(i_low + (i_high - i_low) * (max(pm25, c_low) - c_low) / (c_high - c_low))
+    return 500
+
+
+def get_congestion_level(speed: float) -> str:
+    """Niveau de congestion (seuils de settings.ALERT_THRESHOLDS)"""
+    thresholds = settings.ALERT_THRESHOLDS["traffic"]
+    if speed < thresholds["speed_low"] / 2:
+        return "très dense"
+    if speed < thresholds["speed_low"]:
+        return "dense"
+    if speed < thresholds["speed_medium"]:
+        return "modéré"
+    return "fluide"
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Dernières statistiques par zone, converties et sérialisées"""
+    timestamp: int
+    built_at: float
+    traffic: bytes
+    pollution: bytes
+    noise: bytes
+    zones: frozenset
+
+
+def build_snapshot(timestamp: int, zone_stats: Dict[str, Dict]) -> Snapshot:
+    """
+    Convertit les stats d'un timestamp en points de l'API
+
+    Args:
+        timestamp: Timestamp des stats
+        zone_stats: zone -> stats (hdfs_service.get_zone_stats_by_timestamp)
+
+    Returns:
+        Snapshot (zones sans coordonnées dans settings.ZONES ignorées)
+    """
+    coordinates = {zone['name']: zone for zone in settings.ZONES.values()}
+    label = str(timestamp)
+    traffic, pollution, noise = [], [], []
+
+    for name, stats in sorted(zone_stats.items()):
+        zone = coordinates.get(name)
+        if zone is None:
+            continue
+        lat, lon = zone['lat'], zone['lon']
+        speed = stats.get('avg_speed_kmh', 0.0)
+        pmx = stats.get('avg_pmx', 0.0)
+
+        traffic.append(TrafficDataPoint(
+            zone=name, latitude=lat, longitude=lon,
+            speed_kmh=speed,
+            vehicle_count=stats.get('vehicle_count', 0),
+            congestion_level=stats.get('congestion_level') or get_congestion_level(speed),
+            timestamp=label,
+        ))
+        pollution.append(PollutionDataPoint(
+            zone=name, latitude=lat, longitude=lon,
+            aqi=compute_aqi(pmx),
+            # SUMO ne distingue pas les fractions de particules (PMx)
+            pm25=pmx,
+            pm10=pmx,
+            co2=stats.get('avg_co2', 0.0),
+            no2=stats.get('avg_nox', 0.0),
+            quality=QUALITY_BY_POLLUTION_LEVEL.get(stats.get('pollution_level'), "Modéré"),
+            timestamp=label,
+        ))
+        noise.append(NoiseDataPoint(
+            zone=name, latitude=lat, longitude=lon,
+            decibels=stats.get('avg_noise_db', 0.0),
+            level=stats.get('noise_level', "Faible"),
+            timestamp=label,
+        ))
+
+    return Snapshot(
+        timestamp=timestamp,
+        built_at=time.time(),
+        traffic=_traffic_json.dump_json(traffic),
+        pollution=_pollution_json.dump_json(pollution),
+        noise=_noise_json.dump_json(noise),
+        zones=frozenset(p.zone for p in traffic),
+    )
+
+
+def load_snapshot() -> Optional[Snapshot]:
+    """Lit les stats du dernier timestamp (bloquant: appelé dans un thread)"""
+    timestamp = hdfs_service.get_latest_timestamp()
+    zone_stats = hdfs_service.get_zone_stats_by_timestamp(timestamp)
+    if not zone_stats:
+        return None
+    return build_snapshot(timestamp, zone_stats)
+
+
+class SnapshotStore:
+    """Instantané courant et tâche de rafraîchissement"""
+
+    def __init__(self, interval: float = settings.SNAPSHOT_REFRESH_INTERVAL):
+        self.interval = interval
+        # Remplacé d'un bloc par la tâche, lu sans verrou par les routes
+        self.current: Optional[Snapshot] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Construit un nouvel instantané (l'ancien est gardé si la lecture échoue)"""
+        try:
+            snapshot = await asyncio.to_thread(load_snapshot)
+        except Exception as e:
+            logger.error(f" Erreur rafraîchissement de l'instantané: {e}")
+            return
+        if snapshot is None:
+            logger.warning(" Aucune donnée agrégée pour l'instantané")
+            return
+        if self.current is None or snapshot.timestamp != self.current.timestamp:
+            logger.info(f" Instantané: timestamp {snapshot.timestamp}, {len(snapshot.zones)} zones")
+        self.current = snapshot
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Instance globale
+snapshot_store = SnapshotStore()
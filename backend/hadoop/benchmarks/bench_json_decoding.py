@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark du décodage JSON de mapper_clean.py
+
+Compare, pour chaque collection (gps, emissions, lieux):
+- json.loads de la bibliothèque standard + test des clés (ancien mapper)
+- record_decoder: présélection par clé + décodeur rapide installé
+- mapper_clean.map_lines complet, décodeur rapide vs stdlib
+
+Usage:
+    python bench_json_decoding.py [-n 200000] [-r 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+MAPREDUCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mapreduce')
+sys.path.insert(0, MAPREDUCE_DIR)
+
+import mapper_clean
+import record_decoder
+
+
+def make_documents(kind, n, seed=42):
+    """Documents synthétiques au format des collections MongoDB (une ligne JSON chacun)"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        emissions = {
+            'co2': rng.uniform(0, 8000), 'co': rng.uniform(0, 80), 'nox': rng.uniform(0, 3),
+            'pmx': rng.uniform(0, 0.5), 'noise': rng.uniform(50, 85), 'fuel': rng.uniform(0, 1000),
+        }
+        if kind == 'gps':
+            doc = {
+                'timestamp': i // 100, 'vehicule_id': 'veh{}'.format(i % 100),
+                'position': {'x': rng.uniform(0, 15000), 'y': rng.uniform(0, 12000), 'angle': rng.uniform(0, 360)},
+                'speed': rng.uniform(0, 30), 'emissions': emissions,
+            }
+        elif kind == 'emissions':
+            doc = {'timestamp': i // 100, 'vehicule_id': 'veh{}'.format(i % 100), 'emissions': emissions}
+        else:
+            doc = {
+                'nom': 'Lieu {}'.format(i), 'type': rng.choice(['cafe', 'school', 'bank', 'restaurant']),
+                'x': rng.uniform(0, 15000), 'y': rng.uniform(0, 12000), 'osm_id': 100000 + i,
+            }
+        lines.append(json.dumps(doc))
+    return lines
+
+
+def stdlib_classify(lines):
+    """Ancien chemin: json.loads complet puis test des clés"""
+    kinds = 0
+    for line in lines:
+        data = json.loads(line)
+        if 'osm_id' in data or ('position' in data and 'vehicule_id' in data) or 'emissions' in data:
+            kinds += 1
+    return kinds
+
+
+def decoder_classify(lines):
+    """Nouveau chemin: présélection par clé puis décodeur rapide"""
+    kinds = 0
+    for line in lines:
+        if not record_decoder.is_candidate(line):
+            continue
+        data = record_decoder.loads(line)
+        if 'osm_id' in data or ('position' in data and 'vehicule_id' in data) or 'emissions' in data:
+            kinds += 1
+    return kinds
+
+
+def run_mapper(lines):
+    return sum(1 for _ in mapper_clean.map_lines(lines))
+
+
+def best_of(func, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(lines)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du décodage JSON du mapper de nettoyage")
+    parser.add_argument('-n', '--records', type=int, default=200000, help="Documents par collection")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Répétitions (on garde la meilleure)")
+    args = parser.parse_args()
+
+    print("Décodeur rapide installé: {}".format(record_decoder.DECODER))
+    print("{:<10} {:>16} {:>16} {:>8} {:>16} {:>16} {:>8}".format(
+        'collection', 'stdlib (l/s)', 'decoder (l/s)', 'gain', 'mapper std', 'mapper fast', 'gain'))
+
+    fast_loads = record_decoder._fast_loads
+    for kind in ('gps', 'emissions', 'lieux'):
+        lines = make_documents(kind, args.records)
+
+        std = best_of(stdlib_classify, lines, args.repeat)
+        fast = best_of(decoder_classify, lines, args.repeat)
+
+        record_decoder._fast_loads = json.loads
+        mapper_std = best_of(run_mapper, lines, args.repeat)
+        record_decoder._fast_loads = fast_loads
+        mapper_fast = best_of(run_mapper, lines, args.repeat)
+
+        print("{:<10} {:>16,.0f} {:>16,.0f} {:>7.2f}x {:>16,.0f} {:>16,.0f} {:>7.2f}x".format(
+            kind, std, fast, fast / std, mapper_std, mapper_fast, mapper_fast / mapper_std))
+
+
+if __name__ == "__main__":
+    main()
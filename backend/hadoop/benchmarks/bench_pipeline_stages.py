@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark par étape des scripts MapReduce (mêmes commandes que Hadoop Streaming)
+
+Chaque mapper/combiner/reducer tourne dans son propre processus, entrée et
+sortie sur fichiers, comme une tâche streaming. Les shuffles entre étapes
+sont simulés par `sort` (LC_ALL=C, ordre des octets comme Hadoop) et ne
+sont pas chronométrés. Mesures par étape:
+- débit en lignes d'entrée par seconde (meilleur de --repeat)
+- pic de mémoire résidente (ru_maxrss de os.wait4)
+- taille de la sortie
+
+Les données viennent de generate_sumo_data.py (mis en cache dans --workdir).
+Avec --baseline, les résultats sont comparés à une exécution de référence:
+débit en baisse, mémoire ou sortie en hausse au-delà de --tolerance =>
+régression, code de retour 1.
+
+Usage:
+    python bench_pipeline_stages.py --records 1e5,1e6 --save-baseline baseline.json
+    python bench_pipeline_stages.py --records 1e5,1e6 --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MAPREDUCE_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'mapreduce')
+sys.path.insert(0, BENCH_DIR)
+
+import generate_sumo_data
+
+# (nom, script et arguments, entrée, sortie, tri de l'entrée)
+STAGES = [
+    ('mapper_clean', ['mapper_clean.py'], 'raw.txt', 'clean.out', False),
+    ('reducer_fusion', ['reducer_fusion.py'], 'clean.out', 'fused.txt', True),
+    ('mapper_aggregate_zone', ['mapper_aggregate_zone.py'], 'fused.txt', 'agg_map.out', False),
+    ('mapper_aggregate_zone --batch', ['mapper_aggregate_zone.py', '--batch'], 'fused.txt', 'agg_map_batch.out', False),
+    ('combiner_aggregate_zone', ['combiner_aggregate_zone.py'], 'agg_map.out', 'agg_combined.out', True),
+    ('reducer_aggregate_zone', ['reducer_aggregate_zone.py'], 'agg_combined.out', 'aggregated.txt', True),
+    ('alert_detector map', ['alert_detector.py', 'map'], 'aggregated.txt', 'alerts_map.out', False),
+    ('alert_detector reduce', ['alert_detector.py', 'reduce'], 'alerts_map.out', 'alerts.txt', True),
+    ('stats_aggregator map', ['stats_aggregator.py', 'map'], 'stats_input.txt', 'stats_map.out', False),
+    ('stats_aggregator combine', ['stats_aggregator.py', 'combine'], 'stats_map.out', 'stats_combined.out', True),
+    ('stats_aggregator reduce', ['stats_aggregator.py', 'reduce'], 'stats_combined.out', 'analytics.json', True),
+]
+
+
+def parse_sizes(value):
+    """'1e5,1e6' -> [100000, 1000000]"""
+    return [int(float(v)) for v in value.split(',') if v]
+
+
+def count_lines(path):
+    with open(path, 'rb') as f:
+        return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+
+
+def concat(paths, target):
+    with open(target, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+
+
+def shuffle_sort(path, target):
+    """Tri du shuffle Hadoop (ordre des octets), hors chronométrage"""
+    env = dict(os.environ, LC_ALL='C')
+    subprocess.run(['sort', '-S', '25%', '-o', target, path], env=env, check=True)
+
+
+def run_stage(command, input_path, output_path, env):
+    """
+    Exécute une étape comme une tâche streaming
+
+    Returns:
+        (secondes, pic RSS en Mo)
+    """
+    with open(input_path, 'rb') as stdin, open(output_path, 'wb') as stdout:
+        started = time.perf_counter()
+        proc = subprocess.Popen(command, stdin=stdin, stdout=stdout, env=env, cwd=MAPREDUCE_DIR)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError("{} a échoué (code {})".format(' '.join(command), proc.returncode))
+    # ru_maxrss est en Ko sous Linux
+    return elapsed, usage.ru_maxrss / 1024.0
+
+
+def prepare_data(workdir, records, vehicles, skew, seed, places_side_input):
+    """Données générées (mises en cache) et entrée du premier mapper"""
+    data_dir = os.path.join(workdir, '{}'.format(records))
+    duration = max(records // vehicles, 1)
+    paths = {name: os.path.join(data_dir, name + '.json') for name in ('gps', 'emissions', 'lieux')}
+    if not all(os.path.exists(p) for p in paths.values()):
+        print("Génération de {} enregistrements dans {}...".format(vehicles * duration, data_dir))
+        paths = generate_sumo_data.generate(data_dir, vehicles, duration, skew, seed=seed)
+
+    # Comme run_mapreduce_pipeline.sh: les lieux passent en entrée annexe si activée
+    sources = [paths['gps'], paths['emissions']]
+    if not places_side_input:
+        sources.append(paths['lieux'])
+    concat(sources, os.path.join(data_dir, 'raw.txt'))
+    return data_dir, paths['lieux']
+
+
+def bench_size(records, args):
+    """Mesures de toutes les étapes pour une taille de données"""
+    data_dir, lieux = prepare_data(args.workdir, records, args.vehicles, args.skew, args.seed,
+                                   not args.no_places)
+    env = dict(os.environ)
+    if not args.no_places:
+        env['AGG_PLACES'] = lieux
+
+    results = {}
+    for name, script, input_name, output_name, needs_sort in STAGES:
+        input_path = os.path.join(data_dir, input_name)
+        output_path = os.path.join(data_dir, output_name)
+        if name == 'stats_aggregator map':
+            concat([os.path.join(data_dir, 'aggregated.txt'), os.path.join(data_dir, 'alerts.txt')],
+                   input_path)
+        if needs_sort:
+            sorted_path = input_path + '.sorted'
+            shuffle_sort(input_path, sorted_path)
+            input_path = sorted_path
+
+        lines = count_lines(input_path)
+        best_time, best_rss = None, None
+        for _ in range(args.repeat):
+            elapsed, rss = run_stage([sys.executable] + script, input_path, output_path, env)
+            if best_time is None or elapsed < best_time:
+                best_time, best_rss = elapsed, rss
+
+        results[name] = {
+            'input_lines': lines,
+            'lines_per_sec': round(lines / best_time, 1) if best_time else 0.0,
+            'peak_rss_mb': round(best_rss, 1),
+            'output_bytes': os.path.getsize(output_path),
+        }
+        print("{:>12,} {:<30} {:>12,} {:>14,.0f} {:>10.1f} {:>14,}".format(
+            records, name, lines, results[name]['lines_per_sec'], best_rss, results[name]['output_bytes']))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Écarts au-delà de la tolérance par rapport à la référence"""
+    regressions = []
+    for size, stages in results.items():
+        for name, current in stages.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference is None:
+                continue
+            if current['lines_per_sec'] < reference['lines_per_sec'] * (1 - tolerance):
+                regressions.append("{} @ {}: débit {:,.0f} l/s (référence {:,.0f})".format(
+                    name, size, current['lines_per_sec'], reference['lines_per_sec']))
+            if current['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + tolerance):
+                regressions.append("{} @ {}: mémoire {:.1f} Mo (référence {:.1f})".format(
+                    name, size, current['peak_rss_mb'], reference['peak_rss_mb']))
+            if current['output_bytes'] > reference['output_bytes'] * (1 + tolerance):
+                regressions.append("{} @ {}: sortie {:,} octets (référence {:,})".format(
+                    name, size, current['output_bytes'], reference['output_bytes']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark par étape des scripts MapReduce")
+    parser.add_argument('--records', default='1e5', help="Tailles (enregistrements GPS), ex: 1e5,1e6,1e7")
+    parser.add_argument('--vehicles', type=int, default=1000, help="Véhicules simulés")
+    parser.add_argument('--skew', type=float, default=0.3, help="Part des véhicules dans le centre")
+    parser.add_argument('--seed', type=int, default=42, help="Graine du générateur")
+    parser.add_argument('-r', '--repeat', type=int, default=1, help="Répétitions (on garde la meilleure)")
+    parser.add_argument('--workdir', default=os.path.join(BENCH_DIR, 'data'), help="Cache des données")
+    parser.add_argument('--no-places', action='store_true', help="Lieux via le shuffle (sans entrée annexe)")
+    parser.add_argument('--baseline', help="Résultats de référence (JSON) à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Écart toléré (0.15 = 15 %%)")
+    parser.add_argument('--save-baseline', help="Enregistre les résultats comme référence")
+    args = parser.parse_args()
+
+    print("{:>12} {:<30} {:>12} {:>14} {:>10} {:>14}".format(
+        'records', 'étape', 'lignes', 'lignes/s', 'RSS (Mo)', 'sortie (o)'))
+    results = {}
+    for records in parse_sizes(args.records):
+        results[str(records)] = bench_size(records, args)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("Référence enregistrée: {}".format(args.save_baseline))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n{} régression(s):".format(len(regressions)))
+            for regression in regressions:
+                print("  - " + regression)
+            sys.exit(1)
+        print("\nAucune régression (tolérance {:.0%})".format(args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Générateur de données SUMO synthétiques et reproductibles
+
+Écrit au format de l'export MongoDB (une ligne JSON par document):
+- gps.json        VehicleGPS       (timestamp, vehicule_id, position, speed, emissions)
+- emissions.json  VehicleEmission  (timestamp, vehicule_id, emissions)
+- lieux.json      Lieu             (nom, type, x, y, osm_id)
+
+Chaque véhicule suit une marche aléatoire dans la ville (coordonnées
+SUMO), une mesure par seconde. `--skew` règle la part des véhicules qui
+circulent dans le centre (les cinq zones de mapper_aggregate_zone.py),
+le reste tombe dans 'Autre'. Écriture en flux: la mémoire ne dépend pas
+du nombre d'enregistrements (vehicules x duree par collection).
+
+Usage:
+    python generate_sumo_data.py -o data/ --vehicles 1000 --duration 100
+"""
+
+import argparse
+import os
+import random
+
+# Emprise de la ville et du centre (zones déclarées) en coordonnées SUMO
+CITY = (0.0, 15000.0, 0.0, 12000.0)
+CENTER = (5500.0, 9500.0, 5000.0, 7500.0)
+PLACE_TYPES = ['cafe', 'restaurant', 'bar', 'school', 'university', 'bank', 'pharmacy', 'hospital']
+
+GPS_TEMPLATE = (
+    '{{"timestamp": {ts}, "vehicule_id": "veh{vid}", '
+    '"position": {{"x": {x!r}, "y": {y!r}, "angle": {angle!r}}}, "speed": {speed!r}, '
+    '"emissions": {emissions}}}\n'
+)
+EMISSIONS_TEMPLATE = '{{"timestamp": {ts}, "vehicule_id": "veh{vid}", "emissions": {emissions}}}\n'
+EMISSIONS_FIELDS = (
+    '{{"co2": {co2!r}, "co": {co!r}, "nox": {nox!r}, "pmx": {pmx!r}, '
+    '"noise": {noise!r}, "fuel": {fuel!r}}}'
+)
+
+
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+
+def _emissions(rng, speed):
+    """Émissions plausibles pour une vitesse (m/s)"""
+    load = 0.3 + speed / 20.0
+    return EMISSIONS_FIELDS.format(
+        co2=round(rng.uniform(1500, 5000) * load, 2),
+        co=round(rng.uniform(5, 60) * load, 2),
+        nox=round(rng.uniform(0.2, 1.5) * load, 3),
+        pmx=round(rng.uniform(0.02, 0.4) * load, 3),
+        noise=round(rng.uniform(55, 75) + speed * 0.4, 2),
+        fuel=round(rng.uniform(200, 600) * load, 2),
+    )
+
+
+def generate(output_dir, vehicles=1000, duration=100, skew=0.3, places=200,
+             embedded_emissions=1.0, seed=42):
+    """
+    Écrit gps.json, emissions.json et lieux.json dans output_dir
+
+    Args:
+        vehicles: nombre de véhicules simulés
+        duration: secondes simulées (une mesure par véhicule et par seconde)
+        skew: part des véhicules qui circulent dans le centre
+        places: nombre de lieux
+        embedded_emissions: part des documents GPS qui embarquent leurs émissions
+        seed: graine (mêmes paramètres => mêmes fichiers)
+
+    Returns:
+        Dict collection -> chemin du fichier écrit
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = {name: os.path.join(output_dir, name + '.json') for name in ('gps', 'emissions', 'lieux')}
+
+    # État des véhicules: position, cap, vitesse, emprise
+    fleet = []
+    for vid in range(vehicles):
+        bounds = CENTER if rng.random() < skew else CITY
+        fleet.append([rng.uniform(bounds[0], bounds[1]), rng.uniform(bounds[2], bounds[3]),
+                      rng.uniform(0, 360), rng.uniform(0, 25), bounds])
+
+    with open(paths['gps'], 'w') as gps, open(paths['emissions'], 'w') as emissions:
+        for ts in range(duration):
+            for vid, state in enumerate(fleet):
+                x, y, angle, speed, bounds = state
+                angle = (angle + rng.gauss(0, 15)) % 360
+                speed = _clamp(speed + rng.gauss(0, 1.5), 0.0, 35.0)
+                x = _clamp(x + rng.uniform(-1, 1) * speed, bounds[0], bounds[1])
+                y = _clamp(y + rng.uniform(-1, 1) * speed, bounds[2], bounds[3])
+                state[:4] = x, y, angle, speed
+
+                emi = _emissions(rng, speed)
+                embedded = emi if rng.random() < embedded_emissions else '{}'
+                gps.write(GPS_TEMPLATE.format(ts=ts, vid=vid, x=round(x, 2), y=round(y, 2),
+                                              angle=round(angle, 2), speed=round(speed, 2),
+                                              emissions=embedded))
+                emissions.write(EMISSIONS_TEMPLATE.format(ts=ts, vid=vid, emissions=emi))
+
+    with open(paths['lieux'], 'w') as lieux:
+        for osm_id in range(places):
+            bounds = CENTER if rng.random() < skew else CITY
+            lieux.write('{{"nom": "Lieu {0}", "type": "{1}", "x": {2!r}, "y": {3!r}, "osm_id": {4}}}\n'.format(
+                osm_id, rng.choice(PLACE_TYPES), round(rng.uniform(bounds[0], bounds[1]), 2),
+                round(rng.uniform(bounds[2], bounds[3]), 2), 100000 + osm_id))
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des collections SUMO synthétiques (gps, emissions, lieux)")
+    parser.add_argument('-o', '--output', required=True, help="Répertoire de sortie")
+    parser.add_argument('--vehicles', type=int, default=1000, help="Nombre de véhicules")
+    parser.add_argument('--duration', type=int, default=100, help="Secondes simulées")
+    parser.add_argument('--skew', type=float, default=0.3, help="Part des véhicules dans le centre (0-1)")
+    parser.add_argument('--places', type=int, default=200, help="Nombre de lieux")
+    parser.add_argument('--embedded-emissions', type=float, default=1.0,
+                        help="Part des documents GPS avec émissions embarquées (0-1)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire")
+    args = parser.parse_args()
+
+    paths = generate(args.output, args.vehicles, args.duration, args.skew, args.places,
+                     args.embedded_emissions, args.seed)
+    print("{} enregistrements par collection horodatée".format(args.vehicles * args.duration))
+    for name, path in paths.items():
+        print("  {:<10} {} ({:.1f} Mo)".format(name, path, os.path.getsize(path) / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Job: Détection d'alertes par zone (trafic, pollution, bruit)
+Input:  sortie JSON de reducer_aggregate_zone.py (résolution 1 seconde)
+Output: un épisode d'alerte JSON par série de timestamps consécutifs en
+        dépassement (début, fin, pic, sévérité)
+
+    python alert_detector.py map     ->  zone \\t timestamp (12 chiffres) \\t valeurs
+    python alert_detector.py reduce  ->  épisodes JSON
+
+Tri secondaire: clé = (zone, timestamp complété de zéros), partition sur
+la zone seule (KeyFieldBasedPartitioner -k1,1): chaque reducer reçoit
+toute la série d'une zone, dans l'ordre chronologique.
+
+Hystérésis: un épisode s'ouvre quand la valeur franchit le seuil et ne
+se ferme que lorsqu'elle repasse au-delà du seuil relâché de HYSTERESIS
+(ou après un trou de plus de MAX_GAP secondes). État constant par zone:
+un épisode courant par règle.
+
+Les seuils reprennent settings.ALERT_THRESHOLDS (api/config.py), non
+importable depuis un nœud Hadoop; -cmdenv ALERT_THRESHOLDS='{...}' (JSON)
+les remplace.
+
+Les épisodes ont les champs du modèle Alert de l'API (latitude,
+longitude, timestamp de début) en plus de start/end/samples. Les
+coordonnées viennent d'une copie de settings.ZONES: comme pour les
+routes /current, les zones sans coordonnées ('Autre') sont ignorées.
+"""
+
+import os
+import sys
+import json
+
+# Copie de settings.ALERT_THRESHOLDS
+ALERT_THRESHOLDS = {
+    "traffic": {
+        "speed_low": 20,
+        "speed_medium": 40,
+    },
+    "pollution": {
+        "co2_high": 1000,
+        "co_high": 50,
+        "nox_high": 1.0,
+        "pmx_high": 100,
+    },
+    "noise": {
+        "low": 55,
+        "medium": 70,
+        "high": 85,
+    }
+}
+
+# Copie des coordonnées de settings.ZONES, par nom de zone
+ZONE_COORDINATES = {
+    "Maarif": (33.5731, -7.6298),
+    "Anfa": (33.5822, -7.6394),
+    "Ain Diab": (33.5892, -7.6856),
+    "Bourgogne": (33.5731, -7.5898),
+    "Hay Hassani": (33.5628, -7.5898),
+}
+
+if os.environ.get('ALERT_THRESHOLDS'):
+    ALERT_THRESHOLDS = json.loads(os.environ['ALERT_THRESHOLDS'])
+
+HYSTERESIS = 0.1    # seuil de sortie relâché de 10 %
+MAX_GAP = 5         # secondes sans mesure avant de clore un épisode
+MIN_SAMPLES = 3     # épisodes plus courts ignorés (pics isolés)
+
+# Valeurs transmises par le mapper, dans cet ordre
+METRICS = ('avg_speed_kmh', 'avg_co2', 'avg_co', 'avg_nox', 'avg_pmx', 'avg_noise_db')
+
+
+def build_rules(thresholds):
+    """
+    Règles (type, métrique, sens, niveaux): le premier niveau ouvre
+    l'épisode, les suivants ne font qu'augmenter sa sévérité
+    """
+    traffic = thresholds['traffic']
+    pollution = thresholds['pollution']
+    noise = thresholds['noise']
+    return [
+        ('traffic', 'avg_speed_kmh', 'below',
+         [(traffic['speed_medium'], 'medium'), (traffic['speed_low'], 'high')]),
+        ('pollution', 'avg_co2', 'above', [(pollution['co2_high'], 'high')]),
+        ('pollution', 'avg_co', 'above', [(pollution['co_high'], 'high')]),
+        ('pollution', 'avg_nox', 'above', [(pollution['nox_high'], 'high')]),
+        ('pollution', 'avg_pmx', 'above', [(pollution['pmx_high'], 'critical')]),
+        ('noise', 'avg_noise_db', 'above',
+         [(noise['medium'], 'medium'), (noise['high'], 'high')]),
+    ]
+
+
+RULES = build_rules(ALERT_THRESHOLDS)
+
+TITLES = {
+    'avg_speed_kmh': "Trafic dense",
+    'avg_co2': "Pic de CO2",
+    'avg_co': "Pic de CO",
+    'avg_nox': "Pic de NOx",
+    'avg_pmx': "Pic de particules",
+    'avg_noise_db': "Bruit élevé",
+}
+
+
+# ============ Map ============
+
+def map_lines(lines):
+    """Résultat JSON par zone/timestamp -> zone, timestamp trié, valeurs"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = json.loads(line)
+            # Les rollups (minute, heure...) ne servent pas à la détection
+            if record.get('resolution', 1) != 1:
+                continue
+            if record['zone'] not in ZONE_COORDINATES:
+                continue
+            stats = record['stats']
+            values = '|'.join(repr(float(stats.get(m, 0.0))) for m in METRICS)
+            yield "{}\t{:012d}\t{}".format(record['zone'], int(record['timestamp']), values)
+
+        except (ValueError, KeyError, TypeError):
+            continue
+
+
+# ============ Reduce ============
+
+class Episode(object):
+    """Épisode courant d'une règle (état constant)"""
+
+    __slots__ = ('start', 'last', 'peak', 'samples')
+
+    def __init__(self, timestamp, value):
+        self.start = timestamp
+        self.last = timestamp
+        self.peak = value
+        self.samples = 1
+
+
+class RuleState(object):
+    """Hystérésis d'une règle pour une zone"""
+
+    __slots__ = ('kind', 'metric', 'index', 'below', 'levels', 'enter', 'leave', 'episode')
+
+    def __init__(self, kind, metric, direction, levels):
+        self.kind = kind
+        self.metric = metric
+        self.index = METRICS.index(metric)
+        self.below = direction == 'below'
+        self.levels = levels
+        self.enter = levels[0][0]
+        self.leave = self.enter * (1 + HYSTERESIS) if self.below else self.enter * (1 - HYSTERESIS)
+        self.episode = None
+
+    def _beyond(self, value, threshold):
+        return value < threshold if self.below else value > threshold
+
+    def severity(self, peak):
+        severity = self.levels[0][1]
+        for threshold, level in self.levels:
+            if self._beyond(peak, threshold) or peak == threshold:
+                severity = level
+        return severity
+
+    def update(self, zone, timestamp, value):
+        """Traite une mesure, renvoie l'épisode clos (dict) ou None"""
+        closed = None
+        episode = self.episode
+        if episode is not None and timestamp - episode.last > MAX_GAP:
+            closed = self.close(zone, 'resolved')
+            episode = None
+
+        if episode is not None:
+            if self._beyond(value, self.leave):
+                episode.last = timestamp
+                episode.samples += 1
+                if self._beyond(value, episode.peak):
+                    episode.peak = value
+            else:
+                closed = self.close(zone, 'resolved')
+        elif self._beyond(value, self.enter):
+            self.episode = Episode(timestamp, value)
+        return closed
+
+    def close(self, zone, status):
+        """Clôt l'épisode courant; None s'il est trop court pour être signalé"""
+        episode = self.episode
+        self.episode = None
+        if episode is None or episode.samples < MIN_SAMPLES:
+            return None
+
+        comparison = "sous" if self.below else "au-dessus de"
+        latitude, longitude = ZONE_COORDINATES[zone]
+        return {
+            'id': "{}-{}-{}-{}".format(self.kind, zone, self.metric, episode.start),
+            'type': self.kind,
+            'metric': self.metric,
+            'title': "{} - {}".format(TITLES[self.metric], zone),
+            'description': "{} {} {} pendant {} s (pic {:.2f})".format(
+                self.metric, comparison, self.enter, episode.last - episode.start + 1, episode.peak),
+            'severity': self.severity(episode.peak),
+            'zone': zone,
+            'latitude': latitude,
+            'longitude': longitude,
+            'value': round(episode.peak, 2),
+            'threshold': self.enter,
+            'start': episode.start,
+            'end': episode.last,
+            'timestamp': str(episode.start),
+            'samples': episode.samples,
+            'status': status,
+        }
+
+
+def reduce_lines(lines, rules=None):
+    """Lignes triées par (zone, timestamp) -> épisodes d'alerte JSON"""
+    rules = rules or RULES
+    current_zone = None
+    states = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            zone, timestamp, values = line.split('\t')
+            timestamp = int(timestamp)
+            values = [float(v) for v in values.split('|')]
+        except ValueError:
+            continue
+
+        if zone != current_zone:
+            # Fin de série: les épisodes encore ouverts restent actifs
+            for state in states:
+                alert = state.close(current_zone, 'active')
+                if alert:
+                    yield json.dumps(alert)
+            current_zone = zone
+            states = [RuleState(*rule) for rule in rules]
+
+        for state in states:
+            alert = state.update(zone, timestamp, values[state.index])
+            if alert:
+                yield json.dumps(alert)
+
+    for state in states:
+        alert = state.close(current_zone, 'active')
+        if alert:
+            yield json.dumps(alert)
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'map'
+    if mode == 'map':
+        for out in map_lines(sys.stdin):
+            print(out)
+    elif mode == 'reduce':
+        for out in reduce_lines(sys.stdin):
+            print(out)
+    else:
+        sys.stderr.write("Usage: alert_detector.py map|reduce\n")
+        sys.exit(1)
@@ -1,26 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Normalise un dump JSON en une ligne JSON par document, en streaming.
+
+Formats acceptés (détectés au fil de l'eau, mélangeables):
+- tableau JSON standard [{}, {}]
+- NDJSON (un objet par ligne)
+- objets collés les uns aux autres (dumps mongo "sales": }{ ou }\\n{)
+
+Le flux est lu par blocs et décodé avec JSONDecoder.raw_decode sur un
+tampon glissant: la mémoire reste bornée par la taille du plus gros
+document, quelle que soit la taille du dump.
+"""
+
 import json
+import re
 import sys
 
-# On lit tout le fichier d'un coup (si c'est un tableau JSON [...] ou des objets a la suite)
-try:
-    content = sys.stdin.read()
-    # Cas 1: C'est une liste JSON standard [{}, {}]
-    data = json.loads(content)
-    if isinstance(data, list):
-        for entry in data:
-            print(json.dumps(entry))
-    # Cas 2: C'est un objet unique ou autre
-    elif isinstance(data, dict):
-        print(json.dumps(data))
-except:
-    # Cas 3: C'est peut-être déjà du "faux" json collé, on tente de réparer manuellement
-    # (Méthode brutale pour les fichiers mongo dumpés salement)
-    content = content.replace('}\n{', '},{')
-    if not content.startswith('['): content = '[' + content
-    if not content.endswith(']'): content = content + ']'
-    try:
-        data = json.loads(content)
-        for entry in data:
-            print(json.dumps(entry))
-    except Exception as e:
-        sys.stderr.write(str(e))
+CHUNK_SIZE = 1 << 20                 # caractères lus par bloc
+MAX_DOCUMENT_SIZE = 64 * (1 << 20)   # au-delà, le document est jugé invalide
+# Une erreur de décodage plus loin que cette marge avant la fin du tampon
+# ne peut pas venir d'un document coupé en fin de bloc
+TRUNCATION_MARGIN = 16
+
+# Séparateurs entre documents: blancs, virgules et crochets de tableau
+_SEPARATORS = re.compile(r'[\s,\[\]]*')
+# Frontière entre deux documents: fin d'objet puis début d'objet
+_NEXT_DOCUMENT = re.compile(r'\}[\s,]*(?=\{)')
+# Fin de tampon qui peut encore précéder un début d'objet: '}' puis séparateurs
+_OPEN_BOUNDARY = re.compile(r'\}[\s,]*$')
+
+_decoder = json.JSONDecoder()
+
+
+def _is_truncation(error, buf_len, eof):
+    """L'erreur peut-elle venir d'un document incomplet en fin de tampon ?
+
+    En fin de flux, seule une erreur à la toute fin des données (ou une
+    chaîne jamais fermée) est une troncature: ailleurs, le document est
+    invalide et la lecture reprend au document suivant."""
+    if error.msg.startswith('Unterminated string'):
+        return True
+    if eof:
+        return error.pos >= buf_len
+    return error.pos >= buf_len - TRUNCATION_MARGIN
+
+
+def iter_documents(stream, chunk_size=CHUNK_SIZE):
+    """Génère les documents JSON d'un flux texte, un par un"""
+    buf = ''
+    pos = 0
+    eof = False
+    resyncing = False
+
+    while True:
+        if resyncing:
+            # Après un document invalide: reprise au prochain début d'objet
+            # qui suit une fin d'objet (}{, },{ ou }\n{)
+            match = _NEXT_DOCUMENT.search(buf, pos)
+            if match:
+                pos = match.end()
+                resyncing = False
+            elif eof:
+                return
+            else:
+                # On garde une fin d'objet suivie de séparateurs: le
+                # début d'objet qui la complète peut être dans le bloc suivant
+                match = _OPEN_BOUNDARY.search(buf, pos)
+                chunk = stream.read(chunk_size)
+                buf = (buf[match.start():] if match else '') + chunk
+                pos = 0
+                eof = not chunk
+                continue
+
+        pos = _SEPARATORS.match(buf, pos).end()
+
+        if pos >= len(buf):
+            if eof:
+                return
+            buf = stream.read(chunk_size)
+            pos = 0
+            if not buf:
+                return
+            continue
+
+        try:
+            doc, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            truncated = _is_truncation(e, len(buf), eof)
+            if truncated and not eof and len(buf) - pos < MAX_DOCUMENT_SIZE:
+                # Document coupé en fin de bloc: on complète le tampon
+                chunk = stream.read(chunk_size)
+                buf = buf[pos:] + chunk
+                pos = 0
+                eof = not chunk
+                continue
+
+            if truncated and eof:
+                sys.stderr.write("Document JSON tronqué en fin de flux ignoré: {}\n".format(e))
+                return
+
+            sys.stderr.write("Document JSON invalide ignoré: {}\n".format(e))
+            resyncing = True
+            continue
+
+        if end >= len(buf) and not eof:
+            # Valeur terminée pile en fin de tampon (nombre, littéral...):
+            # elle peut continuer dans le bloc suivant, on relit avec la suite
+            chunk = stream.read(chunk_size)
+            if chunk:
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            eof = True
+
+        yield doc
+        pos = end
+        # Compacte le tampon pour ne garder que la partie non lue
+        if pos > chunk_size:
+            buf = buf[pos:]
+            pos = 0
+
+
+def main():
+    out = sys.stdout
+    for entry in iter_documents(sys.stdin):
+        out.write(json.dumps(entry))
+        out.write('\n')
+
+
+if __name__ == "__main__":
+    main()
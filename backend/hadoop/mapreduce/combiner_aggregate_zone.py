@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Combiner: Agrégation partielle Zone/Timestamp côté map
+Input:  zone|timestamp -> speed|co2|noise|co|nox|pmx|count
+Output: zone|timestamp -> sommes partielles (même format, count cumulé)
+Réduit le volume du shuffle: une ligne par clé et par spill.
+"""
+
+import sys
+
+from zone_stats import ZoneAccumulator
+
+
+def format_partial(key, acc):
+    return "{}\t{}".format(key, acc.format_partial())
+
+
+def combine_lines(lines):
+    """Cumule les valeurs partielles consécutives de même clé"""
+    current_key = None
+    acc = ZoneAccumulator()
+
+    for line in lines:
+        line = line.strip()
+        if not line: continue
+
+        try:
+            key, value = line.split('\t', 1)
+
+            if key != current_key:
+                if current_key and acc.count > 0:
+                    yield format_partial(current_key, acc)
+                current_key = key
+                acc.reset()
+
+            acc.add_partial(value)
+
+        except (ValueError, IndexError):
+            continue
+
+    if current_key and acc.count > 0:
+        yield format_partial(current_key, acc)
+
+
+if __name__ == "__main__":
+    for out in combine_lines(sys.stdin):
+        print(out)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instrumentation optionnelle des scripts streaming (compteurs, chronos, profils)
+
+Compteurs Hadoop (-cmdenv MR_INSTRUMENT=1): en fin de tâche, chaque
+compteur est écrit sur stderr au format du protocole streaming
+    reporter:counter:<groupe>,<nom>,<valeur>
+et apparaît dans l'interface du job (enregistrements lus, émis, rejetés
+par motif, temps par phase en millisecondes).
+
+Profils (-cmdenv MR_PROFILE=cprofile|tracemalloc|all): la tâche tourne
+sous cProfile et/ou tracemalloc; le résumé part dans les logs de la
+tâche (stderr) et le détail dans MR_PROFILE_DIR (répertoire de travail
+de la tâche par défaut), un fichier par tentative.
+
+Désactivé (défaut): les scripts ne font qu'incrémenter des entiers
+locaux et tester un booléen par enregistrement, aucun appel d'horloge.
+"""
+
+import os
+import sys
+import time
+
+ENABLED = os.environ.get('MR_INSTRUMENT') == '1'
+PROFILE = os.environ.get('MR_PROFILE', '')
+PROFILE_DIR = os.environ.get('MR_PROFILE_DIR', '.')
+PROFILE_TOP = 25
+
+COUNTER_GROUP = 'SmartCity'
+
+clock = time.perf_counter if hasattr(time, 'perf_counter') else time.time
+
+
+class TaskMetrics(object):
+    """Compteurs et temps par phase d'une tâche"""
+
+    def __init__(self, task, enabled=None):
+        """
+        Args:
+            task: nom de l'étape (groupe des compteurs)
+            enabled: forcer l'activation (MR_INSTRUMENT par défaut)
+        """
+        self.task = task
+        self.enabled = ENABLED if enabled is None else enabled
+        self.counters = {}
+        self.timers = {}
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def drop(self, reason):
+        """Enregistrement rejeté, par motif"""
+        if self.enabled:
+            name = 'dropped_' + reason
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def add_time(self, phase, seconds):
+        if self.enabled:
+            self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+
+    def report(self, stream=None):
+        """Écrit les compteurs au format reporter:counter de Hadoop Streaming"""
+        if not self.enabled:
+            return
+        stream = stream or sys.stderr
+        group = "{} {}".format(COUNTER_GROUP, self.task)
+        for name in sorted(self.counters):
+            stream.write("reporter:counter:{},{},{}\n".format(group, name, self.counters[name]))
+        for phase in sorted(self.timers):
+            stream.write("reporter:counter:{},{}_ms,{}\n".format(
+                group, phase, int(self.timers[phase] * 1000)))
+        stream.flush()
+
+
+def _attempt_id():
+    """Identifiant de la tentative (jobconf exporté par streaming), pid sinon"""
+    return os.environ.get('mapreduce_task_attempt_id') or str(os.getpid())
+
+
+def run_task(main, task, profile=None):
+    """
+    Exécute main(), sous profilage si MR_PROFILE le demande
+
+    Args:
+        main: fonction sans argument de la tâche
+        task: nom de l'étape (préfixe des fichiers de profil)
+        profile: 'cprofile', 'tracemalloc' ou 'all' (MR_PROFILE par défaut)
+    """
+    profile = PROFILE if profile is None else profile
+    if not profile:
+        return main()
+
+    use_cprofile = profile in ('cprofile', 'all')
+    use_tracemalloc = profile in ('tracemalloc', 'all')
+    prefix = os.path.join(PROFILE_DIR, "{}-{}".format(task, _attempt_id()))
+
+    if use_tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    if use_cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        return main()
+    finally:
+        if use_cprofile:
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(prefix + '.prof')
+            sys.stderr.write("cProfile {} ({}.prof):\n".format(task, prefix))
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        if use_tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top = snapshot.statistics('lineno')[:PROFILE_TOP]
+            with open(prefix + '.tracemalloc.txt', 'w') as f:
+                f.write("courant={} pic={}\n".format(current, peak))
+                for stat in top:
+                    f.write("{}\n".format(stat))
+            sys.stderr.write("tracemalloc {}: pic {:.1f} Mo ({}.tracemalloc.txt)\n".format(
+                task, peak / 1e6, prefix))
@@ -4,86 +4,440 @@
 Mapper: Agrégation par Zone et Timestamp
 Input: Résultat de reducer_fusion.py (avec CO, NOx, PMx)
 Output: (zone, timestamp) -> (speed, co2, noise, co, nox, pmx, count)
+        + une ligne par rollup (zone, début de fenêtre, résolution), même valeur
+
+Rollups (-cmdenv AGG_ROLLUPS=60,300,3600, vide pour les désactiver):
+minute, 5 minutes et heure calculés dans la même passe que les agrégats
+à la seconde; le combiner les réduit à une ligne par fenêtre et par spill.
+
+Bruit ambiant des lieux (-files lieux.json -cmdenv AGG_PLACES=lieux.json):
+entrée annexe chargée par chaque mapper (place_index.py), chaque
+enregistrement reçoit le niveau ambiant de sa position (champs ambient,
+ambient_count du format partiel), sans shuffle des lieux.
+
+Clés chaudes (-files hot_keys.tsv -cmdenv AGG_HOT_KEYS=hot_keys.tsv, cf.
+skew.py): salées en cle#n pour répartir leur charge entre reducers; une
+seconde étape (mapper_merge_state.py) fusionne ensuite les variantes.
+
+Mode batch (--batch ou -cmdenv AGG_BATCH_MODE=1, numpy requis):
+lecture de stdin par gros blocs, parsing en colonnes numpy et
+pré-agrégation par (zone, timestamp) avant émission.
+Une seule ligne par clé et par split (sommes partielles + digests).
+Les valeurs sont arrondies à 2 décimales avant les sommes, comme en mode
+ligne; l'ordre des sommes et la fusion des digests diffèrent néanmoins:
+moyennes égales au centième près, percentiles approchés dans les deux
+modes.
+
+Compteurs (lus, émis, rejetés par motif) et temps par phase (parsing,
+recherche de zone, formatage) avec -cmdenv MR_INSTRUMENT=1, profils avec
+MR_PROFILE (instrumentation.py).
 """
 
+import os
 import sys
 import math
+import warnings
+
+from zone_index import ZONES, ZoneGridIndex, PolygonZoneIndex
+from zone_stats import ZoneAccumulator, rollup_key
+from skew import KeySalter, load_hot_keys
+from place_index import PlaceNoiseGrid
+from quantile_sketch import grouped_centroids
+from instrumentation import TaskMetrics, clock, run_task
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Résolutions des rollups (secondes)
+ROLLUPS = [int(r) for r in os.environ.get('AGG_ROLLUPS', '60,300,3600').split(',') if r.strip()]
+
+# Clés chaudes à saler (fichier produit par scripts/sample_hot_keys.py)
+HOT_KEYS_FILE = os.environ.get('AGG_HOT_KEYS')
+
+# Mode batch
+BATCH_MODE = os.environ.get('AGG_BATCH_MODE') == '1'
+BATCH_LINES = 100000        # lignes parsées en colonnes d'un coup
+BATCH_CHUNK_BYTES = 8 << 20 # taille des lectures sur stdin
+BATCH_MAX_KEYS = 100000     # au-delà, on vide les sommes (mémoire bornée)
+
+# Polygones des quartiers (GeoJSON en coordonnées SUMO), livré par -files
+# et activé avec -cmdenv ZONES_GEOJSON=zones.geojson
+ZONES_GEOJSON = os.environ.get('ZONES_GEOJSON')
+
+# Export de la collection lieux (cache distribué), -cmdenv AGG_PLACES=lieux.json
+PLACES_FILE = os.environ.get('AGG_PLACES')
+
+
+def build_zone_index():
+    """Index précalculé une fois par tâche (polygones si fournis, sinon rectangles)"""
+    if ZONES_GEOJSON:
+        return PolygonZoneIndex.from_geojson(ZONES_GEOJSON)
+    return ZoneGridIndex(ZONES)
+
+
+ZONE_INDEX = build_zone_index()
+
+
+def build_place_index():
+    """Couche ambiante précalculée une fois par tâche (None sans lieux)"""
+    if PLACES_FILE:
+        return PlaceNoiseGrid.from_file(PLACES_FILE)
+    return None
+
+
+PLACE_INDEX = build_place_index()
 
-# Zones de Casablanca (coordonnées SUMO converties)
-ZONES = {
-    'Maarif': {'x_min': 7500, 'x_max': 8500, 'y_min': 6000, 'y_max': 7000},
-    'Anfa': {'x_min': 6500, 'x_max': 7500, 'y_min': 6500, 'y_max': 7500},
-    'Ain Diab': {'x_min': 5500, 'x_max': 6500, 'y_min': 6000, 'y_max': 7000},
-    'Bourgogne': {'x_min': 8500, 'x_max': 9500, 'y_min': 6000, 'y_max': 7000},
-    'Hay Hassani': {'x_min': 7000, 'x_max': 8000, 'y_min': 5000, 'y_max': 6000},
-}
 
 def get_zone(x, y):
     """Détermine la zone selon les coordonnées"""
-    for zone_name, bounds in ZONES.items():
-        if (bounds['x_min'] <= x <= bounds['x_max'] and 
-            bounds['y_min'] <= y <= bounds['y_max']):
-            return zone_name
-    return 'Autre'
-
-for line in sys.stdin:
-    line = line.strip()
-    if not line:
-        continue
-    
-    # Format attendu en entrée : 
-    # vehicule_id | timestamp | x,y | co2,noise,fuel,co,nox,pmx
-    parts = line.split('\t')
-    
-    # Ignorer les lignes LIEU (traitées séparément) ou incomplètes
-    if parts[0] == 'LIEU' or len(parts) != 4:
-        continue
-    
+    return ZONE_INDEX.lookup(x, y)
+
+
+def build_salter(hot_keys=None):
+    """Saleur des clés chaudes (celles de AGG_HOT_KEYS par défaut)"""
+    if hot_keys is None:
+        hot_keys = load_hot_keys(HOT_KEYS_FILE) if HOT_KEYS_FILE else {}
+    return KeySalter(hot_keys)
+
+
+def map_lines(lines, hot_keys=None, metrics=None):
+    """Émet zone|timestamp -> valeur partielle pour chaque ligne fusionnée"""
+    salter = build_salter(hot_keys)
+    if metrics is None:
+        metrics = TaskMetrics('mapper_aggregate_zone')
+    timed = metrics.enabled
+    read = emitted = 0
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        read += 1
+
+        # Format attendu en entrée : 
+        # vehicule_id | timestamp | x,y | co2,noise,fuel,co,nox,pmx
+        parts = line.split('\t')
+
+        # Ignorer les lignes LIEU (traitées séparément) ou incomplètes
+        if parts[0] == 'LIEU':
+            metrics.drop('lieu')
+            continue
+        if len(parts) != 4:
+            metrics.drop('incomplete')
+            continue
+
+        try:
+            if timed: started = clock()
+            vehicule_id = parts[0]
+            timestamp = int(parts[1])
+
+            # Position (x,y)
+            x, y = parts[2].split(',')
+            x = float(x)
+            y = float(y)
+
+            # Emissions (Parsing Robuste)
+            # On découpe la partie droite
+            emi_parts = parts[3].split(',')
+
+            # Les 3 classiques
+            co2 = float(emi_parts[0])
+            noise = float(emi_parts[1])
+            fuel = float(emi_parts[2])
+
+            # Les 3 nouveaux (avec sécurité si jamais ils manquent dans de vieilles données)
+            co = 0.0
+            nox = 0.0
+            pmx = 0.0
+
+            if len(emi_parts) >= 6:
+                co = float(emi_parts[3])
+                nox = float(emi_parts[4])
+                pmx = float(emi_parts[5])
+
+            if timed:
+                parsed = clock()
+                metrics.add_time('parse', parsed - started)
+
+            # Déterminer la zone
+            zone = get_zone(x, y)
+            if timed:
+                located = clock()
+                metrics.add_time('zone_lookup', located - parsed)
+
+            # Calculer vitesse approximative (Heuristique basée sur fuel)
+            estimated_speed = min(fuel * 0.1, 100) if fuel > 0 else 0
+
+            # Clé: zone|timestamp
+            key = "{}|{}".format(zone, timestamp)
+
+            # Valeur: speed|co2|noise|co|nox|pmx|1 (count)
+            # On passe TOUTES les infos au reducer
+            value = "{:.2f}|{:.2f}|{:.2f}|{:.2f}|{:.2f}|{:.2f}|1".format(
+                estimated_speed, co2, noise, co, nox, pmx
+            )
+
+            # Bruit ambiant des lieux à portée (digests laissés vides)
+            if PLACE_INDEX is not None:
+                ambient = PLACE_INDEX.ambient(x, y)
+                if ambient is not None:
+                    value += "|||{:.2f}|1".format(ambient)
+
+            outputs = ["{}\t{}".format(salter.salt(key), value)]
+
+            # Rollups: même valeur, clé de la fenêtre englobante
+            for resolution in ROLLUPS:
+                outputs.append("{}\t{}".format(salter.salt(rollup_key(zone, timestamp, resolution)), value))
+            if timed: metrics.add_time('format', clock() - located)
+
+        except (ValueError, IndexError) as e:
+            # Ignorer les lignes mal formées (texte au lieu de nombre, etc.)
+            metrics.drop('malformed')
+            continue
+
+        emitted += len(outputs)
+        for out in outputs:
+            yield out
+
+    metrics.count('records_read', read)
+    metrics.count('records_emitted', emitted)
+
+
+# ============ Mode batch (colonnes numpy) ============
+
+def read_line_batches(stream, chunk_bytes=BATCH_CHUNK_BYTES):
+    """Lit le flux par gros blocs d'octets et génère des listes de lignes"""
+    raw = getattr(stream, 'buffer', stream)
+    tail = b''
+    while True:
+        chunk = raw.read(chunk_bytes)
+        if not chunk:
+            break
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        yield [l.decode('utf-8', 'replace') for l in lines]
+    if tail:
+        yield [tail.decode('utf-8', 'replace')]
+
+
+def group_lines(lines, size=BATCH_LINES):
+    """Regroupe un itérable de lignes en listes de `size` lignes"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _parse_floats(values, expected):
+    """Conversion C de valeurs numériques jointes par des virgules"""
+    with warnings.catch_warnings():
+        # fromstring avertit (au lieu d'échouer) sur un texte invalide
+        warnings.simplefilter('ignore')
+        flat = np.fromstring(','.join(values), sep=',')
+    if flat.size != expected:
+        raise ValueError("valeur numérique invalide dans le lot")
+    return flat
+
+
+def _parse_columns(lines):
+    """
+    Parse un lot de lignes fusionnées en colonnes numpy.
+    Lève ValueError si une valeur du lot est invalide (le lot passe alors
+    par le chemin ligne à ligne, qui ignore les lignes mal formées).
+    """
+    ts_col = []
+    values = []
+    for line in lines:
+        parts = line.strip().split('\t')
+        if len(parts) != 4 or parts[0] == 'LIEU':
+            continue
+        emi = parts[3]
+        n_emi = emi.count(',') + 1
+        if n_emi == 3:
+            # Anciennes données sans co, nox, pmx
+            emi += ',0,0,0'
+        elif n_emi > 6:
+            emi = ','.join(emi.split(',')[:6])
+        elif n_emi != 6:
+            raise ValueError("emissions incomplètes")
+        if parts[2].count(',') != 1:
+            raise ValueError("position invalide")
+        ts_col.append(parts[1])
+        values.append(parts[2])
+        values.append(emi)
+
+    rows = len(ts_col)
+    timestamps = _parse_floats(ts_col, rows)
+    if (timestamps != np.floor(timestamps)).any():
+        raise ValueError("timestamp non entier")
+    # Colonnes: x, y, co2, noise, fuel, co, nox, pmx
+    matrix = _parse_floats(values, rows * 8).reshape(rows, 8)
+    return timestamps.astype(np.int64), matrix
+
+
+def _accumulator(sums, key):
+    acc = sums.get(key)
+    if acc is None:
+        acc = sums[key] = ZoneAccumulator()
+    return acc
+
+
+def _accumulate_groups(timestamps, zone_ids, speed, ambient, m, sums, resolution=None):
+    """Sommes et digests par (fenêtre, zone), pour une résolution donnée"""
+    if resolution is not None:
+        timestamps = timestamps - timestamps % resolution
+
+    # Clé composite entière (timestamp, zone) puis regroupement
+    n_zones = len(ZONE_INDEX.names)
+    composite = timestamps * n_zones + zone_ids
+    uniq, inverse = np.unique(composite, return_inverse=True)
+    n = uniq.size
+
+    columns = [
+        np.bincount(inverse, weights=speed, minlength=n),
+        np.bincount(inverse, weights=m[:, 2], minlength=n),  # co2
+        np.bincount(inverse, weights=m[:, 3], minlength=n),  # noise
+        np.bincount(inverse, weights=m[:, 5], minlength=n),  # co
+        np.bincount(inverse, weights=m[:, 6], minlength=n),  # nox
+        np.bincount(inverse, weights=m[:, 7], minlength=n),  # pmx
+    ]
+    counts = np.bincount(inverse, minlength=n).tolist()
+    columns = [c.tolist() for c in columns]
+    if ambient is not None:
+        covered = ~np.isnan(ambient)
+        ambient_sums = np.bincount(inverse, weights=np.where(covered, ambient, 0.0), minlength=n).tolist()
+        ambient_counts = np.bincount(inverse, weights=covered, minlength=n).astype(np.int64).tolist()
+    # Digests partiels de vitesse et de bruit, construits pour tous les groupes d'un coup
+    speed_centroids = grouped_centroids(inverse, speed, n)
+    noise_centroids = grouped_centroids(inverse, m[:, 3], n)
+    names = ZONE_INDEX.names
+
+    for k, code in enumerate(uniq.tolist()):
+        ts, zone_id = divmod(code, n_zones)
+        if resolution is None:
+            key = "{}|{}".format(names[zone_id], ts)
+        else:
+            key = rollup_key(names[zone_id], ts, resolution)
+        acc = _accumulator(sums, key)
+        acc.add_sums(columns[0][k], columns[1][k], columns[2][k],
+                     columns[3][k], columns[4][k], columns[5][k], counts[k])
+        acc.speed_digest.add_centroids(speed_centroids[k])
+        acc.noise_digest.add_centroids(noise_centroids[k])
+        if ambient is not None:
+            acc.ambient += ambient_sums[k]
+            acc.ambient_count += ambient_counts[k]
+
+
+def _accumulate_batch(lines, sums, metrics=None):
+    """Pré-agrège un lot par (zone, timestamp) et par rollup dans `sums` (clé -> ZoneAccumulator)"""
+    if metrics is None:
+        metrics = TaskMetrics('mapper_aggregate_zone')
+    timed = metrics.enabled
+    if timed: started = clock()
     try:
-        vehicule_id = parts[0]
-        timestamp = int(parts[1])
-        
-        # Position (x,y)
-        x, y = parts[2].split(',')
-        x = float(x)
-        y = float(y)
-        
-        # Emissions (Parsing Robuste)
-        # On découpe la partie droite
-        emi_parts = parts[3].split(',')
-        
-        # Les 3 classiques
-        co2 = float(emi_parts[0])
-        noise = float(emi_parts[1])
-        fuel = float(emi_parts[2])
-        
-        # Les 3 nouveaux (avec sécurité si jamais ils manquent dans de vieilles données)
-        co = 0.0
-        nox = 0.0
-        pmx = 0.0
-        
-        if len(emi_parts) >= 6:
-            co = float(emi_parts[3])
-            nox = float(emi_parts[4])
-            pmx = float(emi_parts[5])
-        
-        # Déterminer la zone
-        zone = get_zone(x, y)
-        
-        # Calculer vitesse approximative (Heuristique basée sur fuel)
-        estimated_speed = min(fuel * 0.1, 100) if fuel > 0 else 0
-        
-        # Clé: zone|timestamp
-        key = "{}|{}".format(zone, timestamp)
-        
-        # Valeur: speed|co2|noise|co|nox|pmx|1 (count)
-        # On passe TOUTES les infos au reducer
-        value = "{:.2f}|{:.2f}|{:.2f}|{:.2f}|{:.2f}|{:.2f}|1".format(
-            estimated_speed, co2, noise, co, nox, pmx
-        )
-        
-        print("{}\t{}".format(key, value))
-        
-    except (ValueError, IndexError) as e:
-        # Ignorer les lignes mal formées (texte au lieu de nombre, etc.)
-        continue
\ No newline at end of file
+        parsed = _parse_columns(lines)
+    except ValueError:
+        # Lot contenant des lignes invalides: chemin ligne à ligne (non salé,
+        # le salage se fait à l'émission des sommes)
+        metrics.count('batch_fallback')
+        fallback = TaskMetrics(metrics.task, metrics.enabled)
+        for out in map_lines(lines, hot_keys={}, metrics=fallback):
+            key, value = out.split('\t', 1)
+            _accumulator(sums, key).add_partial(value)
+        # Lignes comptées par map_batches; seuls les rejets sont repris
+        for name, amount in fallback.counters.items():
+            if name.startswith('dropped_'):
+                metrics.count(name, amount)
+        if timed: metrics.add_time('fallback', clock() - started)
+        return
+
+    timestamps, m = parsed
+    if timed:
+        parsed_at = clock()
+        metrics.add_time('parse', parsed_at - started)
+        metrics.count('dropped_lieu_or_incomplete', len(lines) - timestamps.size)
+    if timestamps.size == 0:
+        return
+
+    zone_ids = ZONE_INDEX.lookup_ids(m[:, 0], m[:, 1]).astype(np.int64)
+    fuel = m[:, 4]
+    # Même heuristique que le mode ligne: vitesse estimée depuis fuel
+    speed = np.where(fuel > 0, np.minimum(fuel * 0.1, 100), 0.0)
+    # Bruit ambiant (NaN hors de portée des lieux)
+    ambient = PLACE_INDEX.ambient_many(m[:, 0], m[:, 1]) if PLACE_INDEX is not None else None
+    # Valeurs arrondies à 2 décimales avant les sommes, comme les "{:.2f}" du
+    # mode ligne (à l'arrondi des demi-centièmes près, numpy arrondissant x*100)
+    speed = np.round(speed, 2)
+    m[:, 2:] = np.round(m[:, 2:], 2)
+    if ambient is not None:
+        ambient = np.round(ambient, 2)
+    if timed:
+        located = clock()
+        metrics.add_time('zone_lookup', located - parsed_at)
+
+    _accumulate_groups(timestamps, zone_ids, speed, ambient, m, sums)
+    for resolution in ROLLUPS:
+        _accumulate_groups(timestamps, zone_ids, speed, ambient, m, sums, resolution)
+    if timed: metrics.add_time('aggregate', clock() - located)
+
+
+def _emit_sums(sums, salter, metrics=None):
+    timed = metrics is not None and metrics.enabled
+    if timed: started = clock()
+    outputs = ["{}\t{}".format(salter.salt(key), acc.format_partial()) for key, acc in sums.items()]
+    if timed:
+        metrics.add_time('format', clock() - started)
+        metrics.count('records_emitted', len(outputs))
+    return outputs
+
+
+def map_batches(batches, hot_keys=None, metrics=None):
+    """Mode batch: lots de lignes -> une ligne de sommes partielles par clé"""
+    salter = build_salter(hot_keys)
+    if metrics is None:
+        metrics = TaskMetrics('mapper_aggregate_zone')
+    sums = {}
+    for lines in batches:
+        # Lignes vides ignorées, comme en mode ligne
+        lines = [line for line in lines if line.strip()]
+        metrics.count('records_read', len(lines))
+        _accumulate_batch(lines, sums, metrics)
+        if len(sums) >= BATCH_MAX_KEYS:
+            for out in _emit_sums(sums, salter, metrics):
+                yield out
+            sums = {}
+    for out in _emit_sums(sums, salter, metrics):
+        yield out
+
+
+def map_lines_batch(lines, hot_keys=None):
+    """Mode batch sur un itérable de lignes (utilisé par le moteur local)"""
+    if np is None:
+        return map_lines(lines, hot_keys)
+    return map_batches(group_lines(lines), hot_keys)
+
+
+def main():
+    batch_mode = BATCH_MODE or '--batch' in sys.argv[1:]
+    if batch_mode and np is None:
+        sys.stderr.write("numpy indisponible: mode ligne à ligne\n")
+        batch_mode = False
+
+    metrics = TaskMetrics('mapper_aggregate_zone')
+    if batch_mode:
+        for out in map_batches(read_line_batches(sys.stdin), metrics=metrics):
+            print(out)
+    else:
+        for out in map_lines(sys.stdin, metrics=metrics):
+            print(out)
+    metrics.report()
+
+
+if __name__ == "__main__":
+    run_task(main, 'mapper_aggregate_zone')
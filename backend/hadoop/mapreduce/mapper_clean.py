@@ -1,8 +1,34 @@
 #!/usr/bin/env python
+"""
+Mapper: Nettoyage des collections brutes (gps, emissions, lieux)
+Output (jointure):  vehicule_id_timestamp -> GPS|x,y  /  EMI|co2,noise,fuel,co,nox,pmx
+                    LIEU#n -> nom, type, x, y, decibel
+
+Les lieux sont salés sur LIEU_SALTS clés (-cmdenv CLEAN_LIEU_SALTS=n) pour
+ne pas tous tomber sur le même reducer; reducer_fusion.py rétablit LIEU.
+Ne sert qu'avec PLACES_SIDE_INPUT=0: par défaut, run_mapreduce_pipeline.sh
+et incremental_pipeline.py ne passent pas lieux.json à ce job (entrée
+annexe de l'agrégation), aucune ligne LIEU n'est alors émise.
+
+Fast path (--fast-path ou -cmdenv CLEAN_FAST_PATH=1): un document GPS qui
+embarque déjà ses émissions sort directement au format fusionné
+    vehicule_id \t timestamp \t x,y \t co2,noise,fuel,co,nox,pmx
+(job map-only, sans jointure). Seuls les GPS sans émissions sortent
+en GPS| pour la jointure de repli avec la collection emissions.
+
+Décodage: présélection du type par les clés du texte brut, puis
+décodeur JSON le plus rapide installé (cf. record_decoder.py).
+
+Compteurs (lus, émis, rejetés par motif) et temps de décodage/formatage
+avec -cmdenv MR_INSTRUMENT=1, profils avec MR_PROFILE (instrumentation.py).
+"""
+import os
 import sys
-import json
 import random
 
+import record_decoder
+from instrumentation import TaskMetrics, clock, run_task
+
 # --- CONSTANTES ---
 MAX_SPEED_KMH = 200.0
 MIN_CO2 = 0.0
@@ -11,6 +37,9 @@ MAX_NOISE_DB = 140.0
 MIN_COORD = -1000.0
 MAX_COORD = 20000.0
 
+FAST_PATH = os.environ.get('CLEAN_FAST_PATH') == '1'
+LIEU_SALTS = int(os.environ.get('CLEAN_LIEU_SALTS', '16'))
+
 
 def get_ambiance_noise(lieu_type):
     t = lieu_type.lower()
@@ -22,60 +51,142 @@ def get_ambiance_noise(lieu_type):
         return random.uniform(40, 60)
 
 
-for line in sys.stdin:
-    line = line.strip()
-    if not line: continue
-
-    try:
-        data = json.loads(line)
-
-        # CAS 1 : LIEUX
-        if 'osm_id' in data:
-            nom = data.get('nom', 'Lieu Inconnu').replace('\t', ' ')
-            if len(nom) < 2: continue
-            type_lieu = data.get('type', 'autre')
-            x = data.get('x', 0)
-            y = data.get('y', 0)
-
-            if not (MIN_COORD <= x <= MAX_COORD and MIN_COORD <= y <= MAX_COORD): continue
-
-            decibel = get_ambiance_noise(type_lieu)
-            # UTILISATION DE .format() POUR PYTHON 2
-            print("LIEU\t{}\t{}\t{}\t{}\t{:.2f}".format(nom, type_lieu, x, y, decibel))
-
-        # CAS 2 : GPS
-        elif 'position' in data and 'vehicule_id' in data:
-            v_id = data['vehicule_id']
-            ts = data['timestamp']
-            pos = data['position']
-            x = float(pos.get('x', 0))
-            y = float(pos.get('y', 0))
-            speed = float(data.get('speed', 0))
-
-            if (0 <= speed <= MAX_SPEED_KMH) and (MIN_COORD <= x <= MAX_COORD) and (MIN_COORD <= y <= MAX_COORD):
-                key = "{}_{}".format(v_id, ts)
-                print("{}\tGPS|{},{}".format(key, x, y))
-
-        
-        # CAS 3 : EMISSIONS
-        elif 'emissions' in data and 'vehicule_id' in data and 'position' not in data:
-            try:
+def format_emissions(emi):
+    """co2,noise,fuel,co,nox,pmx (lève ValueError/TypeError si invalide)"""
+    co2 = float(emi.get('co2', 0.0))
+    noise = float(emi.get('noise', 0.0))
+    fuel = float(emi.get('fuel', 0.0))
+    # javais oublier
+    co = float(emi.get('co', 0.0))
+    nox = float(emi.get('nox', 0.0))
+    pmx = float(emi.get('pmx', 0.0))
+    return "{},{},{},{},{},{}".format(co2, noise, fuel, co, nox, pmx)
+
+
+def map_lines(lines, fast_path=None, metrics=None):
+    """Nettoie et classe les documents JSON (un par ligne), génère les lignes de sortie"""
+    if fast_path is None:
+        fast_path = FAST_PATH
+    if metrics is None:
+        metrics = TaskMetrics('mapper_clean')
+    timed = metrics.enabled
+    lieux = 0
+    read = emitted = 0
+
+    for line in lines:
+        line = line.strip()
+        if not line: continue
+        read += 1
+
+        # Lignes GPS| déjà clées (sortie du fast path): reprises telles
+        # quelles par la jointure de repli
+        if line[0] != '{':
+            if '\tGPS|' in line:
+                emitted += 1
+                yield line
+            else:
+                metrics.drop('not_json')
+            continue
+
+        # Aucune clé connue: inutile de décoder
+        if not record_decoder.is_candidate(line):
+            metrics.drop('unknown_document')
+            continue
+
+        try:
+            if timed: started = clock()
+            data = record_decoder.loads(line)
+            if timed:
+                decoded = clock()
+                metrics.add_time('decode', decoded - started)
+
+            # CAS 1 : LIEUX
+            if 'osm_id' in data:
+                nom = data.get('nom', 'Lieu Inconnu').replace('\t', ' ')
+                if len(nom) < 2:
+                    metrics.drop('lieu_invalid')
+                    continue
+                type_lieu = data.get('type', 'autre')
+                x = data.get('x', 0)
+                y = data.get('y', 0)
+
+                if not (MIN_COORD <= x <= MAX_COORD and MIN_COORD <= y <= MAX_COORD):
+                    metrics.drop('lieu_out_of_bounds')
+                    continue
+
+                decibel = get_ambiance_noise(type_lieu)
+                key = "LIEU#{}".format(lieux % LIEU_SALTS) if LIEU_SALTS > 1 else "LIEU"
+                lieux += 1
+                # UTILISATION DE .format() POUR PYTHON 2
+                out = "{}\t{}\t{}\t{}\t{}\t{:.2f}".format(key, nom, type_lieu, x, y, decibel)
+                if timed: metrics.add_time('format', clock() - decoded)
+                emitted += 1
+                yield out
+
+            # CAS 2 : GPS
+            elif 'position' in data and 'vehicule_id' in data:
                 v_id = data['vehicule_id']
                 ts = data['timestamp']
-                emi = data['emissions']
-
-                co2 = float(emi.get('co2', 0.0))
-                noise = float(emi.get('noise', 0.0))
-                fuel = float(emi.get('fuel', 0.0))
-                # javais oublier
-                co = float(emi.get('co', 0.0))
-                nox = float(emi.get('nox', 0.0))
-                pmx = float(emi.get('pmx', 0.0))
-                key = "{}_{}".format(v_id, ts)
-                print("{}\tEMI|{},{},{},{},{},{}".format(key, co2, noise, fuel, co, nox, pmx))
-            
-            except (ValueError, TypeError):
-                continue
-    except Exception:
-        continue
-  
\ No newline at end of file
+                pos = data['position']
+                x = float(pos.get('x', 0))
+                y = float(pos.get('y', 0))
+                speed = float(data.get('speed', 0))
+
+                if (0 <= speed <= MAX_SPEED_KMH) and (MIN_COORD <= x <= MAX_COORD) and (MIN_COORD <= y <= MAX_COORD):
+                    fused = None
+                    if fast_path and data.get('emissions'):
+                        try:
+                            fused = format_emissions(data['emissions'])
+                        except (ValueError, TypeError, AttributeError):
+                            fused = None  # émissions embarquées invalides: jointure de repli
+                            metrics.count('fast_path_fallback')
+
+                    if fused:
+                        out = "{}\t{}\t{},{}\t{}".format(v_id, ts, x, y, fused)
+                    else:
+                        key = "{}_{}".format(v_id, ts)
+                        out = "{}\tGPS|{},{}".format(key, x, y)
+                    if timed: metrics.add_time('format', clock() - decoded)
+                    emitted += 1
+                    yield out
+                else:
+                    metrics.drop('gps_out_of_range')
+
+            # CAS 3 : EMISSIONS
+            elif 'emissions' in data and 'vehicule_id' in data and 'position' not in data:
+                try:
+                    v_id = data['vehicule_id']
+                    ts = data['timestamp']
+                    key = "{}_{}".format(v_id, ts)
+                    out = "{}\tEMI|{}".format(key, format_emissions(data['emissions']))
+                    if timed: metrics.add_time('format', clock() - decoded)
+                    emitted += 1
+                    yield out
+
+                except (ValueError, TypeError):
+                    metrics.drop('emissions_invalid')
+                    continue
+            else:
+                metrics.drop('unknown_document')
+        except Exception:
+            metrics.drop('invalid_document')
+            continue
+
+    metrics.count('records_read', read)
+    metrics.count('records_emitted', emitted)
+
+
+def map_lines_fast(lines):
+    """map_lines avec le fast path activé (moteur local)"""
+    return map_lines(lines, fast_path=True)
+
+
+def main():
+    metrics = TaskMetrics('mapper_clean')
+    for out in map_lines(sys.stdin, fast_path=FAST_PATH or '--fast-path' in sys.argv[1:], metrics=metrics):
+        print(out)
+    metrics.report()
+
+
+if __name__ == "__main__":
+    run_task(main, 'mapper_clean')
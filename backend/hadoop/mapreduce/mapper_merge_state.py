@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Mapper: Fusion incrémentale des agrégats Zone/Timestamp
+Input:  lignes JSON de reducer_aggregate_zone.py (résultats existants
+        + résultats d'un incrément), idéalement avec 'state'
+Output: zone|timestamp[|resolution] -> état partiel (format zone_stats.py)
+
+Suivi de combiner_aggregate_zone.py et reducer_aggregate_zone.py
+(AGG_EMIT_STATE=1): une clé présente des deux côtés (rollup à cheval sur
+le watermark, données tardives) est refusionnée, les autres sont recopiées.
+
+Les anciennes sorties sans 'state' sont reconstruites depuis les moyennes
+arrondies (sommes = moyenne * count, digest réduit à la moyenne).
+"""
+
+import sys
+import json
+
+from zone_stats import RAW_RESOLUTION, rollup_key
+
+
+def state_from_stats(stats):
+    """Etat partiel approché d'un résultat sans 'state'"""
+    count = int(stats['vehicle_count'])
+    return "{!r}|{!r}|{!r}|{!r}|{!r}|{!r}|{}".format(
+        stats['avg_speed_kmh'] * count,
+        stats['avg_co2'] * count,
+        stats['avg_noise_db'] * count,
+        stats.get('avg_co', 0.0) * count,
+        stats.get('avg_nox', 0.0) * count,
+        stats.get('avg_pmx', 0.0) * count,
+        count
+    )
+
+
+def map_lines(lines):
+    """Ré-émet chaque résultat JSON sous sa clé d'agrégation"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = json.loads(line)
+            zone = record['zone']
+            timestamp = int(record['timestamp'])
+            resolution = int(record.get('resolution', RAW_RESOLUTION))
+
+            if resolution == RAW_RESOLUTION:
+                key = "{}|{}".format(zone, timestamp)
+            else:
+                key = rollup_key(zone, timestamp, resolution)
+
+            state = record.get('state') or state_from_stats(record['stats'])
+            yield "{}\t{}".format(key, state)
+
+        except (ValueError, KeyError, TypeError):
+            continue
+
+
+if __name__ == "__main__":
+    for out in map_lines(sys.stdin):
+        print(out)
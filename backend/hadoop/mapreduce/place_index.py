@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Couche de bruit ambiant des lieux (entrée annexe du job d'agrégation)
+
+Les lieux (export de la collection `lieux`, une ligne JSON par document)
+sont livrés à chaque mapper par le cache distribué (-files) et projetés
+une fois par tâche sur une grille régulière: chaque cellule porte le
+niveau ambiant cumulé des lieux situés à moins de RADIUS de son centre.
+Un enregistrement véhicule reçoit ainsi le bruit ambiant de sa position
+en O(1), sans shuffle ni jointure côté reduce.
+
+Modèle acoustique (volontairement simple):
+- niveau d'un lieu: tiré dans la plage de son type (mêmes plages que
+  mapper_clean.get_ambiance_noise), graine = osm_id pour être stable
+  d'une tâche à l'autre
+- atténuation géométrique: L - 20 log10(d / REFERENCE_DISTANCE)
+- lieux voisins cumulés en énergie: 10 log10(somme 10^(L/10))
+"""
+
+import json
+import math
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RADIUS = 150.0              # portée d'un lieu (unités SUMO, ~mètres)
+RESOLUTION = 25.0           # taille des cellules de la couche
+REFERENCE_DISTANCE = 10.0   # distance du niveau nominal d'un lieu
+MAX_CELLS = 1 << 22
+
+
+def ambient_range(lieu_type):
+    """Plage de niveaux (dB) d'un type de lieu"""
+    t = lieu_type.lower()
+    if t in ['restaurant', 'cafe', 'bar', 'fast_food']:
+        return 60, 85
+    elif t in ['school', 'university', 'college']:
+        return 50, 75
+    else:
+        return 40, 60
+
+
+def ambient_level(place):
+    """Niveau nominal d'un lieu, stable pour un même osm_id"""
+    low, high = ambient_range(place.get('type', 'autre'))
+    return random.Random(place.get('osm_id', 0)).uniform(low, high)
+
+
+def load_places(path):
+    """Lieux valides d'un export JSON (une ligne par document)"""
+    places = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                doc = json.loads(line)
+                places.append((float(doc['x']), float(doc['y']), ambient_level(doc)))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return places
+
+
+class PlaceNoiseGrid(object):
+    """Grille précalculée du niveau ambiant des lieux"""
+
+    def __init__(self, places, radius=RADIUS, resolution=RESOLUTION):
+        """
+        Args:
+            places: séquence de (x, y, niveau_db)
+            radius: portée d'un lieu
+            resolution: taille des cellules
+        """
+        self.radius = float(radius)
+        self.count = len(places)
+        if not places:
+            self.x0 = self.y0 = 0.0
+            self.nx = self.ny = 0
+            self.resolution = float(resolution)
+            self._levels = []
+            return
+
+        self.x0 = min(p[0] for p in places) - self.radius
+        self.y0 = min(p[1] for p in places) - self.radius
+        width = max(p[0] for p in places) + self.radius - self.x0
+        height = max(p[1] for p in places) + self.radius - self.y0
+        # Borne sur la taille de la grille
+        while (int(width / resolution) + 1) * (int(height / resolution) + 1) > MAX_CELLS:
+            resolution *= 2.0
+
+        self.resolution = float(resolution)
+        self.nx = int(width / self.resolution) + 1
+        self.ny = int(height / self.resolution) + 1
+        self._build(places)
+
+    def _build(self, places):
+        res = self.resolution
+        span = int(math.ceil(self.radius / res))
+        energy = {}
+
+        # Chaque lieu n'alimente que les cellules à portée (pas de parcours de la grille)
+        for px, py, level in places:
+            ci = int((px - self.x0) / res)
+            cj = int((py - self.y0) / res)
+            for j in range(max(cj - span, 0), min(cj + span, self.ny - 1) + 1):
+                cy = self.y0 + (j + 0.5) * res
+                for i in range(max(ci - span, 0), min(ci + span, self.nx - 1) + 1):
+                    cx = self.x0 + (i + 0.5) * res
+                    d = math.hypot(cx - px, cy - py)
+                    if d > self.radius:
+                        continue
+                    attenuated = level - 20 * math.log10(max(d, REFERENCE_DISTANCE) / REFERENCE_DISTANCE)
+                    cell = j * self.nx + i
+                    energy[cell] = energy.get(cell, 0.0) + 10 ** (attenuated / 10.0)
+
+        # Niveau par cellule, None hors de portée de tout lieu
+        self._levels = [None] * (self.nx * self.ny)
+        for cell, e in energy.items():
+            self._levels[cell] = 10 * math.log10(e)
+        if np is not None:
+            self._levels_array = np.array(
+                [np.nan if v is None else v for v in self._levels], dtype=np.float64)
+
+    @classmethod
+    def from_file(cls, path, radius=RADIUS, resolution=RESOLUTION):
+        return cls(load_places(path), radius, resolution)
+
+    def ambient(self, x, y):
+        """Bruit ambiant (dB) au point (x, y), None si aucun lieu à portée"""
+        i = int((x - self.x0) // self.resolution)
+        j = int((y - self.y0) // self.resolution)
+        if 0 <= i < self.nx and 0 <= j < self.ny:
+            return self._levels[j * self.nx + i]
+        return None
+
+    def ambient_many(self, xs, ys):
+        """Version vectorisée (numpy): tableau de niveaux, NaN hors de portée"""
+        if np is None:
+            raise RuntimeError("numpy est requis pour ambient_many")
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        levels = np.full(xs.shape, np.nan)
+        if self.nx == 0:
+            return levels
+
+        i = np.floor((xs - self.x0) / self.resolution).astype(np.int64)
+        j = np.floor((ys - self.y0) / self.resolution).astype(np.int64)
+        inside = (i >= 0) & (i < self.nx) & (j >= 0) & (j < self.ny)
+        levels[inside] = self._levels_array[j[inside] * self.nx + i[inside]]
+        return levels
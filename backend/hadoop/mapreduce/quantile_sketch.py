@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sketch de quantiles fusionnable (t-digest "merging", fonction d'échelle k1)
+
+Permet de calculer p50/p95 par zone et timestamp sans garder toutes les
+valeurs: chaque mapper/combiner émet un digest partiel, le reducer les
+fusionne. La taille est bornée par COMPRESSION (~COMPRESSION/2 centroïdes),
+la précision est meilleure aux extrémités (p95, p99) qu'au centre.
+
+Sérialisation compacte (sans '|' ni tabulation):
+    moyenne[:poids],moyenne[:poids],...   (poids omis quand il vaut 1)
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COMPRESSION = 50
+
+
+def _k(q, compression):
+    """Fonction d'échelle k1: centroïdes plus fins près de 0 et 1"""
+    return compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+
+def _k_inverse(k, compression):
+    return (math.sin(k * 2 * math.pi / compression) + 1) / 2
+
+
+class TDigest(object):
+    """Digest de quantiles: centroïdes (moyenne, poids) triés par moyenne"""
+
+    __slots__ = ('compression', 'means', 'weights', 'total', '_pending')
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.total = 0
+        # Centroïdes ajoutés mais pas encore compressés
+        self._pending = []
+
+    def add(self, value, weight=1):
+        self._pending.append((value, weight))
+        self.total += weight
+        if len(self._pending) > 5 * self.compression:
+            self._compress()
+
+    def add_centroids(self, centroids):
+        """Ajoute une liste de (moyenne, poids), ex. un digest partiel"""
+        for mean, weight in centroids:
+            self._pending.append((mean, weight))
+            self.total += weight
+        if len(self._pending) > 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        self.add_centroids(zip(other.means, other.weights))
+
+    def centroids(self):
+        self._compress()
+        return list(zip(self.means, self.weights))
+
+    def _compress(self):
+        if not self._pending:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._pending)
+        self._pending = []
+
+        total = float(self.total)
+        compression = self.compression
+        means = []
+        weights = []
+
+        cur_mean, cur_weight = items[0]
+        weight_before = 0
+        q_limit = _k_inverse(_k(0.0, compression) + 1, compression)
+
+        for mean, weight in items[1:]:
+            if (weight_before + cur_weight + weight) / total <= q_limit:
+                # Fusion dans le centroïde courant (moyenne pondérée)
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                weight_before += cur_weight
+                q = min(weight_before / total, 1.0)
+                q_limit = _k_inverse(min(_k(q, compression) + 1, compression / 4.0), compression)
+                cur_mean, cur_weight = mean, weight
+
+        means.append(cur_mean)
+        weights.append(cur_weight)
+        self.means = means
+        self.weights = weights
+
+    def quantile(self, q):
+        """Quantile approché (q entre 0 et 1), None si le digest est vide"""
+        self._compress()
+        n = len(self.means)
+        if n == 0:
+            return None
+        if n == 1:
+            return self.means[0]
+
+        target = q * self.total
+        means = self.means
+        weights = self.weights
+
+        # Interpolation linéaire entre les centres des centroïdes
+        if target <= weights[0] / 2.0:
+            return means[0]
+        cumulative = weights[0] / 2.0
+        for i in range(n - 1):
+            step = (weights[i] + weights[i + 1]) / 2.0
+            if target <= cumulative + step:
+                return means[i] + (means[i + 1] - means[i]) * (target - cumulative) / step
+            cumulative += step
+        return means[-1]
+
+    def serialize(self):
+        self._compress()
+        parts = []
+        for mean, weight in zip(self.means, self.weights):
+            if weight == 1:
+                parts.append('{:.6g}'.format(mean))
+            else:
+                parts.append('{:.6g}:{}'.format(mean, weight))
+        return ','.join(parts)
+
+    @classmethod
+    def parse(cls, text, compression=COMPRESSION):
+        digest = cls(compression)
+        if text:
+            digest.add_centroids(parse_centroids(text))
+        return digest
+
+
+def parse_centroids(text):
+    """'m[:w],m[:w]' -> liste de (moyenne, poids)"""
+    centroids = []
+    for item in text.split(','):
+        if ':' in item:
+            mean, weight = item.split(':')
+            centroids.append((float(mean), int(weight)))
+        else:
+            centroids.append((float(item), 1))
+    return centroids
+
+
+def grouped_centroids(groups, values, n_groups, compression=COMPRESSION):
+    """
+    Construction vectorisée (numpy) des centroïdes de plusieurs groupes
+    d'un coup: tri par (groupe, valeur), rang normalisé -> cellule de la
+    fonction d'échelle k1, puis sommes par (groupe, cellule).
+
+    Args:
+        groups: id de groupe (0..n_groups-1) de chaque valeur
+        values: valeurs
+
+    Returns:
+        Liste (indexée par groupe) de listes de (moyenne, poids)
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    result = [[] for _ in range(n_groups)]
+    if values.size == 0:
+        return result
+
+    order = np.lexsort((values, groups))
+    groups = groups[order]
+    values = values[order]
+
+    sizes = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.arange(values.size) - starts[groups]
+    q = (rank + 0.5) / sizes[groups]
+    cell = np.floor(compression / (2 * math.pi) * np.arcsin(2 * q - 1)).astype(np.int64)
+
+    # Clé (groupe, cellule), déjà triée dans l'ordre des valeurs
+    span = compression + 2
+    key = groups * span + (cell + span // 2)
+    uniq, inverse = np.unique(key, return_inverse=True)
+    sums = np.bincount(inverse, weights=values)
+    counts = np.bincount(inverse)
+    means = (sums / counts).tolist()
+
+    for k, code in enumerate(uniq.tolist()):
+        result[code // span].append((means[k], int(counts[k])))
+    return result
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Décodage rapide des documents bruts (une ligne JSON par document)
+
+1. Présélection bon marché par recherche de clé dans le texte brut
+   (pas de décodage pour les lignes qu'aucun type ne concerne)
+2. Décodage par le décodeur le plus rapide installé
+   (orjson > ujson > json de la bibliothèque standard)
+
+La présélection par texte ne fait qu'écarter des lignes: le type du
+document est déterminé par l'appelant sur les clés du document décodé.
+"""
+
+import json
+
+try:
+    import orjson
+    _fast_loads = orjson.loads
+    DECODER = 'orjson'
+except ImportError:
+    try:
+        import ujson
+        _fast_loads = ujson.loads
+        DECODER = 'ujson'
+    except ImportError:
+        _fast_loads = json.loads
+        DECODER = 'json'
+
+# Clés des documents traités par mapper_clean.py (lieux, GPS, émissions)
+KNOWN_KEYS = ('"osm_id"', '"position"', '"emissions"')
+
+
+def is_candidate(line):
+    """Vrai si la ligne contient une clé d'un type de document connu"""
+    for key in KNOWN_KEYS:
+        if key in line:
+            return True
+    return False
+
+
+def loads(line):
+    """Décode une ligne JSON, avec repli sur json si le décodeur rapide refuse
+    (NaN/Infinity des dumps Mongo, par exemple)"""
+    try:
+        return _fast_loads(line)
+    except ValueError:
+        if _fast_loads is json.loads:
+            raise
+        return json.loads(line)
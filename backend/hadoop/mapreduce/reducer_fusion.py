@@ -1,38 +1,47 @@
 #!/usr/bin/env python
 import sys
 
-current_key = None
-gps_data = None
-emi_data = None
 
-for line in sys.stdin:
-    line = line.strip()
-    if not line: continue
+def reduce_lines(lines):
+    """Jointure GPS/EMI par clé vehicule_id_timestamp (lignes triées par clé)"""
+    current_key = None
+    gps_data = None
+    emi_data = None
 
-    try:
-        key, value = line.split('\t', 1)
+    for line in lines:
+        line = line.strip()
+        if not line: continue
 
-        if key == "LIEU":
-            print(line)
-            continue
+        try:
+            key, value = line.split('\t', 1)
+
+            # Lieux salés (LIEU#n) par mapper_clean.py: clé d'origine en sortie
+            if key.startswith("LIEU"):
+                yield "LIEU\t{}".format(value)
+                continue
+
+            if key != current_key:
+                if current_key and gps_data and emi_data:
+                    v_id, ts = current_key.split('_')
+                    yield "{}\t{}\t{}\t{}".format(v_id, ts, gps_data, emi_data)
 
-        if key != current_key:
-            if current_key and gps_data and emi_data:
-                v_id, ts = current_key.split('_')
-                print("{}\t{}\t{}\t{}".format(v_id, ts, gps_data, emi_data))
+                current_key = key
+                gps_data = None
+                emi_data = None
 
-            current_key = key
-            gps_data = None
-            emi_data = None
+            if value.startswith("GPS|"):
+                gps_data = value.replace("GPS|", "")
+            elif value.startswith("EMI|"):
+                emi_data = value.replace("EMI|", "")
+
+        except ValueError:
+            continue
 
-        if value.startswith("GPS|"):
-            gps_data = value.replace("GPS|", "")
-        elif value.startswith("EMI|"):
-            emi_data = value.replace("EMI|", "")
+    if current_key and gps_data and emi_data:
+        v_id, ts = current_key.split('_')
+        yield "{}\t{}\t{}\t{}".format(v_id, ts, gps_data, emi_data)
 
-    except ValueError:
-        continue
 
-if current_key and gps_data and emi_data:
-    v_id, ts = current_key.split('_')
-    print("{}\t{}\t{}\t{}".format(v_id, ts, gps_data, emi_data))
\ No newline at end of file
+if __name__ == "__main__":
+    for out in reduce_lines(sys.stdin):
+        print(out)
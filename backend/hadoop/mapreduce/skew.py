@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Clés chaudes du job d'agrégation: salage et dé-salage
+
+Une clé chaude (ex. rollup horaire de la zone 'Autre') est émise sous
+`salts` variantes `cle#0 .. cle#n-1`, réparties entre plusieurs reducers.
+Chaque reducer produit un résultat partiel (avec 'state'), fusionné par
+une seconde étape (mapper_merge_state.py) sous la clé d'origine.
+
+Fichier des clés chaudes (produit par scripts/sample_hot_keys.py):
+    cle \\t salts        une ligne par clé
+"""
+
+import random
+
+SALT_SEPARATOR = '#'
+
+
+def load_hot_keys(path):
+    """Fichier 'cle\\tsalts' -> dict cle -> nombre de variantes"""
+    hot_keys = {}
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            key, salts = line.rsplit('\t', 1)
+            if int(salts) > 1:
+                hot_keys[key] = int(salts)
+    return hot_keys
+
+
+def unsalt(key):
+    """'cle#n' -> 'cle' (une clé non salée est renvoyée telle quelle)"""
+    base, sep, salt = key.rpartition(SALT_SEPARATOR)
+    if sep and salt.isdigit():
+        return base
+    return key
+
+
+class KeySalter(object):
+    """
+    Répartit les lignes d'une clé chaude entre ses variantes, à tour de rôle.
+    Le tour commence à une variante aléatoire: une tâche qui n'émet qu'une
+    ligne par clé (mode batch, combiner) ne charge pas toujours la variante 0.
+    """
+
+    __slots__ = ('hot_keys', '_next')
+
+    def __init__(self, hot_keys):
+        self.hot_keys = hot_keys
+        self._next = {}
+
+    def salt(self, key):
+        salts = self.hot_keys.get(key)
+        if salts is None:
+            return key
+        n = self._next.get(key)
+        if n is None:
+            n = random.randrange(salts)
+        self._next[key] = (n + 1) % salts
+        return "{}{}{}".format(key, SALT_SEPARATOR, n)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Job: Cube analytique précalculé (document AnalyticsData de l'API)
+Input:  sortie JSON de reducer_aggregate_zone.py + épisodes de alert_detector.py
+Output: UN document JSON (hourly_trends, zone_distribution, top_issues,
+        performance_metrics), servi tel quel par l'API
+
+    python stats_aggregator.py map      ->  section|clé \\t sommes partielles
+    python stats_aggregator.py combine  ->  sommes partielles cumulées
+    python stats_aggregator.py reduce   ->  document JSON (1 reducer)
+
+Sections:
+    H|heure      mesures de l'heure (count, sommes vitesse/co2/bruit, lignes fluides, lignes)
+    Z|zone       mêmes sommes par zone
+    A|heure      épisodes d'alerte commencés dans l'heure
+    I|type|metr  épisodes par règle (count, actifs, secondes, nb par sévérité)
+
+Seules les lignes de résolution STATS_RESOLUTION sont lues (-cmdenv,
+3600 par défaut: les rollups horaires suffisent, 1 sans rollups). La part
+de trafic fluide compte donc des fenêtres de STATS_RESOLUTION secondes
+(vitesse moyenne de la fenêtre >= FLUID_SPEED), ce que dit son libellé.
+
+Les lignes illisibles ou aux mesures non finies (inf, nan) sont écartées
+et comptées (compteurs dropped_* si MR_INSTRUMENT=1).
+"""
+
+import os
+import sys
+import json
+import math
+
+from instrumentation import TaskMetrics, run_task
+
+STATS_RESOLUTION = int(os.environ.get('STATS_RESOLUTION', '3600'))
+
+HOUR = 3600
+FLUID_SPEED = 40        # km/h, seuil "speed_medium" de settings.ALERT_THRESHOLDS
+TOP_ISSUES = 5
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+
+# Objectifs des indicateurs de performance_metrics
+TARGET_SPEED = FLUID_SPEED
+TARGET_FLUID_SHARE = 85.0
+TARGET_RESOLUTION_RATE = 85.0
+TARGET_NOISE = 55.0
+
+# Nombre de sommes partielles par section
+FIELDS = {'H': 6, 'Z': 6, 'A': 1, 'I': 3 + len(SEVERITIES)}
+
+TITLES = {
+    'avg_speed_kmh': "Trafic dense",
+    'avg_co2': "Pics de CO2",
+    'avg_co': "Pics de CO",
+    'avg_nox': "Pics de NOx",
+    'avg_pmx': "Pics de particules",
+    'avg_noise_db': "Bruit élevé",
+}
+
+
+def _format(values):
+    return '|'.join(repr(v) if isinstance(v, float) else str(v) for v in values)
+
+
+def _parse(value):
+    # Entiers (compteurs) en int, tout le reste (sommes, inf, nan...) en float
+    return [int(v) if v.lstrip('-').isdigit() else float(v) for v in value.split('|')]
+
+
+def _finite(values):
+    return not any(math.isinf(v) or math.isnan(v) for v in values)
+
+
+# ============ Map ============
+
+def map_lines(lines, metrics=None):
+    """Résultats par zone et épisodes d'alerte -> sommes partielles par section"""
+    if metrics is None:
+        metrics = TaskMetrics('stats_aggregator')
+    read = 0
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        read += 1
+
+        try:
+            record = json.loads(line)
+
+            if 'metric' in record:
+                # Épisode d'alerte (alert_detector.py)
+                start = int(record['start'])
+                severities = [1 if record.get('severity') == s else 0 for s in SEVERITIES]
+                duration = int(record['end']) - start + 1
+                active = 1 if record.get('status') == 'active' else 0
+                yield "A|{:012d}\t1".format(start - start % HOUR)
+                yield "I|{}|{}\t{}".format(record['type'], record['metric'],
+                                            _format([1, active, duration] + severities))
+                continue
+
+            if record.get('resolution', 1) != STATS_RESOLUTION:
+                continue
+
+            stats = record['stats']
+            count = int(stats['vehicle_count'])
+            timestamp = int(record['timestamp'])
+            speed = float(stats['avg_speed_kmh'])
+            co2 = float(stats['avg_co2'])
+            noise = float(stats['avg_noise_db'])
+            if not _finite((speed, co2, noise)):
+                # inf/nan contamineraient toutes les sommes de l'heure et de la zone
+                metrics.drop('non_finite')
+                continue
+            value = _format([
+                count,
+                speed * count,
+                co2 * count,
+                noise * count,
+                1 if speed >= FLUID_SPEED else 0,
+                1,
+            ])
+            yield "H|{:012d}\t{}".format(timestamp - timestamp % HOUR, value)
+            yield "Z|{}\t{}".format(record['zone'], value)
+
+        except (ValueError, KeyError, TypeError):
+            metrics.drop('invalid_record')
+            continue
+
+    metrics.count('records_read', read)
+
+
+# ============ Combine ============
+
+def _grouped(lines, metrics):
+    """(clé, sommes) par groupe de lignes consécutives de même clé"""
+    current_key = None
+    sums = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            key, value = line.split('\t', 1)
+            values = _parse(value)
+        except ValueError:
+            metrics.drop('invalid_line')
+            continue
+        if len(values) != FIELDS.get(key[:1]) or not _finite(values):
+            metrics.drop('invalid_line')
+            continue
+
+        if key != current_key:
+            if current_key is not None:
+                yield current_key, sums
+            current_key = key
+            sums = values
+        else:
+            sums = [a + b for a, b in zip(sums, values)]
+
+    if current_key is not None:
+        yield current_key, sums
+
+
+def combine_lines(lines, metrics=None):
+    if metrics is None:
+        metrics = TaskMetrics('stats_aggregator')
+    for key, sums in _grouped(lines, metrics):
+        yield "{}\t{}".format(key, _format(sums))
+
+
+# ============ Reduce ============
+
+def _ratio(part, total, scale=1.0):
+    return round(part * scale / total, 2) if total else 0.0
+
+
+def build_document(groups):
+    """Sections cumulées -> document AnalyticsData"""
+    hours = {}
+    alerts_by_hour = {}
+    zones = {}
+    issues = {}
+
+    for key, sums in groups:
+        section, _, name = key.partition('|')
+        if section == 'H':
+            hours[int(name)] = sums
+        elif section == 'A':
+            alerts_by_hour[int(name)] = sums[0]
+        elif section == 'Z':
+            zones[name] = sums
+        elif section == 'I':
+            issues[name] = sums
+
+    hourly_trends = []
+    for hour in sorted(set(hours) | set(alerts_by_hour)):
+        count, speed, co2, noise, _, _ = hours.get(hour, [0, 0.0, 0.0, 0.0, 0, 0])
+        hourly_trends.append({
+            'hour': "{}h".format(hour // HOUR % 24),
+            'timestamp': hour,
+            'traffic': _ratio(speed, count),
+            'pollution': _ratio(co2, count),
+            'noise': _ratio(noise, count),
+            'vehicle_count': count,
+            'alerts': alerts_by_hour.get(hour, 0),
+        })
+
+    total_vehicles = sum(z[0] for z in zones.values())
+    zone_distribution = []
+    for zone, (count, speed, co2, noise, _, _) in sorted(zones.items(), key=lambda z: -z[1][0]):
+        zone_distribution.append({
+            'name': zone,
+            'value': _ratio(count, total_vehicles, 100),
+            'vehicle_count': count,
+            'avg_speed_kmh': _ratio(speed, count),
+            'avg_co2': _ratio(co2, count),
+            'avg_noise_db': _ratio(noise, count),
+        })
+
+    top_issues = []
+    for name, sums in sorted(issues.items(), key=lambda i: -i[1][0])[:TOP_ISSUES]:
+        kind, metric = name.split('|')
+        count, active, duration = sums[:3]
+        severity = 'low'
+        for level, n in zip(SEVERITIES, sums[3:]):
+            if n:
+                severity = level
+        top_issues.append({
+            'issue': TITLES.get(metric, metric),
+            'type': kind,
+            'metric': metric,
+            'count': count,
+            'active': active,
+            'total_duration_s': duration,
+            'severity': severity,
+        })
+
+    totals = [sum(values) for values in zip(*zones.values())] if zones else [0, 0.0, 0.0, 0.0, 0, 0]
+    count, speed, _, noise, fluid_rows, rows = totals
+    episodes = sum(i[0] for i in issues.values())
+    resolved = episodes - sum(i[1] for i in issues.values())
+    performance_metrics = [
+        {'label': "Vitesse moyenne", 'value': _ratio(speed, count), 'target': TARGET_SPEED, 'unit': 'km/h'},
+        {'label': "Fenêtres de {} s en trafic fluide".format(STATS_RESOLUTION), 'value': _ratio(fluid_rows, rows, 100),
+         'target': TARGET_FLUID_SHARE, 'unit': '%'},
+        {'label': "Taux de résolution des alertes", 'value': _ratio(resolved, episodes, 100),
+         'target': TARGET_RESOLUTION_RATE, 'unit': '%'},
+        {'label': "Bruit moyen", 'value': _ratio(noise, count), 'target': TARGET_NOISE, 'unit': 'dB'},
+    ]
+
+    return {
+        'hourly_trends': hourly_trends,
+        'zone_distribution': zone_distribution,
+        'top_issues': top_issues,
+        'performance_metrics': performance_metrics,
+    }
+
+
+def reduce_lines(lines, metrics=None):
+    """Toutes les sections (un seul reducer) -> une ligne JSON"""
+    if metrics is None:
+        metrics = TaskMetrics('stats_aggregator')
+    yield json.dumps(build_document(_grouped(lines, metrics)))
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'map'
+    if mode == 'map':
+        stage = map_lines
+    elif mode == 'combine':
+        stage = combine_lines
+    elif mode == 'reduce':
+        stage = reduce_lines
+    else:
+        sys.stderr.write("Usage: stats_aggregator.py map|combine|reduce\n")
+        sys.exit(1)
+    metrics = TaskMetrics('stats_aggregator')
+    for out in stage(sys.stdin, metrics=metrics):
+        print(out)
+    metrics.report()
+
+
+if __name__ == "__main__":
+    run_task(main, 'stats_aggregator')
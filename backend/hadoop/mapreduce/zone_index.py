@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Index spatial des zones (grille uniforme précalculée)
+Remplace le parcours linéaire de toutes les boîtes pour chaque point.
+
+Règle de chevauchement: les zones sont déclarées dans une SÉQUENCE
+ordonnée, la première zone déclarée qui contient le point l'emporte
+(bornes inclusives). Un point hors de toute zone tombe dans la zone
+par défaut ('Autre').
+
+Chaque cellule de la grille est soit résolue (une seule réponse
+possible pour toute la cellule), soit porte la courte liste ordonnée
+des zones qui la touchent. La recherche est donc O(1) par point.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # numpy absent sur certains noeuds: API batch en pur Python
+    np = None
+
+DEFAULT_ZONE = 'Autre'
+
+# Zones de Casablanca (coordonnées SUMO converties), partagées par
+# mapper_aggregate_zone.py et services/mongodb_service.py
+# Séquence ordonnée: en cas de chevauchement, la première zone déclarée l'emporte
+ZONES = [
+    ('Maarif', {'x_min': 7500, 'x_max': 8500, 'y_min': 6000, 'y_max': 7000}),
+    ('Anfa', {'x_min': 6500, 'x_max': 7500, 'y_min': 6500, 'y_max': 7500}),
+    ('Ain Diab', {'x_min': 5500, 'x_max': 6500, 'y_min': 6000, 'y_max': 7000}),
+    ('Bourgogne', {'x_min': 8500, 'x_max': 9500, 'y_min': 6000, 'y_max': 7000}),
+    ('Hay Hassani', {'x_min': 7000, 'x_max': 8000, 'y_min': 5000, 'y_max': 6000}),
+]
+MAX_CELLS = 1 << 20
+
+
+class ZoneGridIndex(object):
+    """Index grille pour zones rectangulaires {'x_min','x_max','y_min','y_max'}"""
+
+    def __init__(self, zones, cell_size=None, default=DEFAULT_ZONE):
+        """
+        Args:
+            zones: séquence ordonnée de (nom, bornes), ordre = priorité
+            cell_size: taille des cellules (défaut: moitié du plus petit côté de zone)
+            default: zone retournée hors de toutes les boîtes
+        """
+        self.default = default
+        self.boxes = [
+            (name, float(b['x_min']), float(b['x_max']), float(b['y_min']), float(b['y_max']))
+            for name, b in zones
+        ]
+        # Identifiants entiers: position dans la séquence, défaut en dernier
+        self.names = [box[0] for box in self.boxes] + [default]
+        self.default_id = len(self.boxes)
+
+        if not self.boxes:
+            self.x0 = self.y0 = 0.0
+            self.x1 = self.y1 = -1.0
+            self.nx = self.ny = 0
+            self.cell_size = 1.0
+            self._cells = []
+            self._cell_ids = []
+            return
+
+        self.x0 = min(b[1] for b in self.boxes)
+        self.x1 = max(b[2] for b in self.boxes)
+        self.y0 = min(b[3] for b in self.boxes)
+        self.y1 = max(b[4] for b in self.boxes)
+        width = max(self.x1 - self.x0, 1e-9)
+        height = max(self.y1 - self.y0, 1e-9)
+
+        if cell_size is None:
+            smallest = min(min(b[2] - b[1], b[4] - b[3]) for b in self.boxes)
+            cell_size = max(smallest / 2.0, 1e-9)
+        # Borne sur la taille de la grille
+        while (int(width / cell_size) + 1) * (int(height / cell_size) + 1) > MAX_CELLS:
+            cell_size *= 2.0
+
+        self.cell_size = float(cell_size)
+        self.nx = int(width / self.cell_size) + 1
+        self.ny = int(height / self.cell_size) + 1
+        self._build()
+
+    def _build(self):
+        cs = self.cell_size
+        eps = cs * 1e-9
+        # Cellule: nom (résolue) ou tuple de boîtes candidates (ordre de priorité)
+        self._cells = []
+        # Pour l'API batch: id résolu, ou -1 si la cellule demande un test
+        self._cell_ids = []
+        indexed = list(enumerate(self.boxes))
+
+        for j in range(self.ny):
+            cy0 = self.y0 + j * cs - eps
+            cy1 = self.y0 + (j + 1) * cs + eps
+            row = [(k, b) for k, b in indexed if b[3] <= cy1 and b[4] >= cy0]
+            for i in range(self.nx):
+                cx0 = self.x0 + i * cs - eps
+                cx1 = self.x0 + (i + 1) * cs + eps
+                candidates = [(k, b) for k, b in row if b[1] <= cx1 and b[2] >= cx0]
+
+                if not candidates:
+                    self._cells.append(self.default)
+                    self._cell_ids.append(self.default_id)
+                    continue
+
+                # Les candidates après la première qui couvre toute la cellule
+                # ne peuvent jamais gagner: on les retire
+                for n, (_, b) in enumerate(candidates):
+                    if self._covers(b, cx0, cx1, cy0, cy1):
+                        candidates = candidates[:n + 1]
+                        break
+
+                if len(candidates) == 1 and self._covers(candidates[0][1], cx0, cx1, cy0, cy1):
+                    # Une seule zone possible pour toute la cellule
+                    self._cells.append(candidates[0][1][0])
+                    self._cell_ids.append(candidates[0][0])
+                else:
+                    self._cells.append(tuple(b for _, b in candidates))
+                    self._cell_ids.append(-1)
+
+        if np is not None:
+            self._cell_ids = np.asarray(self._cell_ids, dtype=np.int32)
+
+    @staticmethod
+    def _covers(box, cx0, cx1, cy0, cy1):
+        return box[1] <= cx0 and box[2] >= cx1 and box[3] <= cy0 and box[4] >= cy1
+
+    def _cell_index(self, x, y):
+        i = int((x - self.x0) / self.cell_size)
+        j = int((y - self.y0) / self.cell_size)
+        if i >= self.nx: i = self.nx - 1
+        if j >= self.ny: j = self.ny - 1
+        return j * self.nx + i
+
+    def lookup(self, x, y):
+        """Zone du point (x, y) en coordonnées SUMO"""
+        if not (self.x0 <= x <= self.x1 and self.y0 <= y <= self.y1):
+            return self.default
+
+        cell = self._cells[self._cell_index(x, y)]
+        if cell.__class__ is not tuple:
+            return cell
+
+        for name, x_min, x_max, y_min, y_max in cell:
+            if x_min <= x <= x_max and y_min <= y <= y_max:
+                return name
+        return self.default
+
+    def lookup_many(self, xs, ys):
+        """Zones d'une série de points, retourne une liste de noms"""
+        if np is not None:
+            names = self.names
+            return [names[k] for k in self.lookup_ids(xs, ys).tolist()]
+        lookup = self.lookup
+        return [lookup(x, y) for x, y in zip(xs, ys)]
+
+    def lookup_ids(self, xs, ys):
+        """
+        Version vectorisée (numpy): identifiants de zone d'un tableau de points.
+        L'id k correspond à self.names[k], self.default_id hors zones.
+        """
+        if np is None:
+            raise RuntimeError("numpy est requis pour lookup_ids")
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        ids = np.full(xs.shape, self.default_id, dtype=np.int32)
+        if not self.boxes:
+            return ids
+
+        inside = (xs >= self.x0) & (xs <= self.x1) & (ys >= self.y0) & (ys <= self.y1)
+        idx = np.nonzero(inside)[0]
+        if idx.size == 0:
+            return ids
+
+        i = np.minimum(((xs[idx] - self.x0) / self.cell_size).astype(np.int64), self.nx - 1)
+        j = np.minimum(((ys[idx] - self.y0) / self.cell_size).astype(np.int64), self.ny - 1)
+        cell_ids = self._cell_ids[j * self.nx + i]
+        ids[idx] = cell_ids
+
+        # Cellules non résolues: test des boîtes par ordre de priorité
+        pending = idx[cell_ids < 0]
+        if pending.size:
+            ids[pending] = self.default_id
+            px = xs[pending]
+            py = ys[pending]
+            unassigned = np.ones(pending.size, dtype=bool)
+            for k, (_, x_min, x_max, y_min, y_max) in enumerate(self.boxes):
+                hit = unassigned & (px >= x_min) & (px <= x_max) & (py >= y_min) & (py <= y_max)
+                if hit.any():
+                    ids[pending[hit]] = k
+                    unassigned &= ~hit
+                    if not unassigned.any():
+                        break
+        return ids
+
+
+# ============ Zones polygonales (GeoJSON en coordonnées SUMO x/y) ============
+
+def load_geojson_zones(path):
+    """
+    Charge les zones d'un FeatureCollection GeoJSON (Polygon / MultiPolygon).
+    Le nom vient de properties.name (ou properties.nom). L'ordre des
+    features donne la priorité en cas de chevauchement.
+
+    Returns:
+        Liste ordonnée de (nom, anneaux), chaque anneau = liste de (x, y)
+    """
+    import json
+
+    with open(path) as f:
+        collection = json.load(f)
+
+    zones = []
+    for feature in collection.get('features', []):
+        props = feature.get('properties') or {}
+        name = props.get('name') or props.get('nom')
+        geometry = feature.get('geometry') or {}
+        if not name:
+            continue
+
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            continue
+
+        # Parité pair/impair sur tous les anneaux: les trous et les
+        # parties disjointes d'un MultiPolygon sont gérés d'un seul coup
+        rings = []
+        for polygon in polygons:
+            for ring in polygon:
+                points = [(float(p[0]), float(p[1])) for p in ring]
+                if len(points) >= 3:
+                    rings.append(points)
+        if rings:
+            zones.append((name, rings))
+    return zones
+
+
+def _point_in_rings(x, y, rings):
+    """Test pair/impair (ray casting) d'un point, pur Python"""
+    inside = False
+    for ring in rings:
+        n = len(ring)
+        x1, y1 = ring[n - 1]
+        for k in range(n):
+            x2, y2 = ring[k]
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+            x1, y1 = x2, y2
+    return inside
+
+
+class PolygonZoneIndex(object):
+    """
+    Index de zones polygonales, même interface que ZoneGridIndex.
+    Règle de chevauchement identique: la première zone déclarée l'emporte.
+    """
+
+    # Nombre max de couples (point, arête) évalués d'un coup en numpy
+    CHUNK_ELEMENTS = 1 << 22
+
+    def __init__(self, zones, default=DEFAULT_ZONE):
+        """
+        Args:
+            zones: séquence ordonnée de (nom, anneaux), cf. load_geojson_zones
+        """
+        self.default = default
+        self.zones = [(name, rings) for name, rings in zones]
+        self.names = [name for name, _ in self.zones] + [default]
+        self.default_id = len(self.zones)
+
+        self.bboxes = []
+        self._edges = []
+        for _, rings in self.zones:
+            xs = [p[0] for ring in rings for p in ring]
+            ys = [p[1] for ring in rings for p in ring]
+            self.bboxes.append((min(xs), max(xs), min(ys), max(ys)))
+            # Arêtes (x1, y1, x2, y2) de tous les anneaux, pour le test vectorisé
+            edges = []
+            for ring in rings:
+                n = len(ring)
+                for k in range(n):
+                    x1, y1 = ring[k - 1]
+                    x2, y2 = ring[k]
+                    if y1 != y2:  # une arête horizontale ne coupe jamais le rayon
+                        edges.append((x1, y1, x2, y2))
+            self._edges.append(np.asarray(edges, dtype=np.float64).reshape(-1, 4) if np is not None else edges)
+
+        # Grille grossière des boîtes englobantes pour la recherche point par point
+        self._grid = ZoneGridIndex(
+            [(k, {'x_min': b[0], 'x_max': b[1], 'y_min': b[2], 'y_max': b[3]})
+             for k, b in enumerate(self.bboxes)],
+            default=None,
+        )
+        self._cell_candidates = self._build_cell_candidates()
+
+    @classmethod
+    def from_geojson(cls, path, default=DEFAULT_ZONE):
+        return cls(load_geojson_zones(path), default=default)
+
+    def _build_cell_candidates(self):
+        # Contrairement aux rectangles, une boîte englobante qui couvre la
+        # cellule ne garantit rien: on garde toutes les zones qui la touchent
+        grid = self._grid
+        cells = []
+        if not self.bboxes:
+            return cells
+        cs = grid.cell_size
+        eps = cs * 1e-9
+        for j in range(grid.ny):
+            cy0 = grid.y0 + j * cs - eps
+            cy1 = grid.y0 + (j + 1) * cs + eps
+            row = [k for k, b in enumerate(self.bboxes) if b[2] <= cy1 and b[3] >= cy0]
+            for i in range(grid.nx):
+                cx0 = grid.x0 + i * cs - eps
+                cx1 = grid.x0 + (i + 1) * cs + eps
+                cells.append(tuple(k for k in row if self.bboxes[k][0] <= cx1 and self.bboxes[k][1] >= cx0))
+        return cells
+
+    def lookup(self, x, y):
+        """Zone du point (x, y) en coordonnées SUMO"""
+        grid = self._grid
+        if not (grid.x0 <= x <= grid.x1 and grid.y0 <= y <= grid.y1):
+            return self.default
+
+        for k in self._cell_candidates[grid._cell_index(x, y)]:
+            x_min, x_max, y_min, y_max = self.bboxes[k]
+            if x_min <= x <= x_max and y_min <= y <= y_max and _point_in_rings(x, y, self.zones[k][1]):
+                return self.zones[k][0]
+        return self.default
+
+    def lookup_many(self, xs, ys):
+        """Zones d'une série de points, retourne une liste de noms"""
+        if np is not None:
+            names = self.names
+            return [names[k] for k in self.lookup_ids(xs, ys).tolist()]
+        lookup = self.lookup
+        return [lookup(x, y) for x, y in zip(xs, ys)]
+
+    def lookup_ids(self, xs, ys):
+        """
+        Affectation vectorisée (numpy) d'un lot de points aux zones.
+        Préfiltre par boîte englobante (tranche x via tri + recherche
+        dichotomique, puis test y), puis test pair/impair vectorisé.
+        """
+        if np is None:
+            raise RuntimeError("numpy est requis pour lookup_ids")
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        ids = np.full(xs.shape, self.default_id, dtype=np.int32)
+        if xs.size == 0 or not self.zones:
+            return ids
+
+        order = np.argsort(xs, kind='stable')
+        sorted_xs = xs[order]
+        unassigned = np.ones(xs.shape, dtype=bool)
+
+        for k, (x_min, x_max, y_min, y_max) in enumerate(self.bboxes):
+            lo = np.searchsorted(sorted_xs, x_min, side='left')
+            hi = np.searchsorted(sorted_xs, x_max, side='right')
+            if lo >= hi:
+                continue
+            cand = order[lo:hi]
+            cand_y = ys[cand]
+            cand = cand[(cand_y >= y_min) & (cand_y <= y_max) & unassigned[cand]]
+            if cand.size == 0:
+                continue
+
+            hit = self._points_in_zone(xs[cand], ys[cand], self._edges[k])
+            winners = cand[hit]
+            ids[winners] = k
+            unassigned[winners] = False
+        return ids
+
+    def _points_in_zone(self, px, py, edges):
+        """Parité pair/impair vectorisée: points x arêtes, par blocs"""
+        inside = np.zeros(px.shape, dtype=bool)
+        if edges.shape[0] == 0:
+            return inside
+
+        x1 = edges[:, 0]
+        y1 = edges[:, 1]
+        x2 = edges[:, 2]
+        y2 = edges[:, 3]
+        slope = (x2 - x1) / (y2 - y1)
+
+        step = max(1, self.CHUNK_ELEMENTS // edges.shape[0])
+        for start in range(0, px.size, step):
+            bx = px[start:start + step, None]
+            by = py[start:start + step, None]
+            crosses = ((y1 > by) != (y2 > by)) & (bx < (by - y1) * slope + x1)
+            inside[start:start + step] = (np.count_nonzero(crosses, axis=1) & 1).astype(bool)
+        return inside
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Accumulateurs partagés du job d'agrégation Zone/Timestamp
+Format partiel échangé mapper -> combiner -> reducer:
+    speed|co2|noise|co|nox|pmx|count[|speed_digest|noise_digest[|ambient|ambient_count]]
+Les 6 premières valeurs sont des SOMMES sur `count` enregistrements
+(le mapper émet une somme sur 1 enregistrement, count = 1).
+Les digests (quantile_sketch.py) sont optionnels (absents ou vides: la
+moyenne de la valeur partielle entre dans le digest avec le poids count).
+`ambient` est la somme du bruit ambiant des lieux (place_index.py) sur les
+`ambient_count` enregistrements situés à portée d'un lieu.
+
+Clés:
+    zone|timestamp              agrégat à la seconde SUMO (résolution 1)
+    zone|debut_fenetre|60       rollup (minute, 5 minutes, heure...)
+    <cle>#n                     variante salée d'une clé chaude (skew.py)
+Les rollups sont produits dans la même passe que les agrégats bruts.
+"""
+
+from quantile_sketch import TDigest, parse_centroids
+from skew import unsalt
+
+NB_METRICS = 6
+
+# Résolution (en secondes) des clés zone|timestamp sans suffixe
+RAW_RESOLUTION = 1
+
+
+def rollup_key(zone, timestamp, resolution):
+    """Clé du rollup contenant `timestamp` (fenêtre alignée sur la résolution)"""
+    return "{}|{}|{}".format(zone, timestamp - timestamp % resolution, resolution)
+
+
+def parse_key(key):
+    """'zone|timestamp[|resolution][#salt]' -> (zone, timestamp, resolution)"""
+    parts = unsalt(key).split('|')
+    if len(parts) == 3:
+        return parts[0], int(parts[1]), int(parts[2])
+    zone, timestamp = parts
+    return zone, int(timestamp), RAW_RESOLUTION
+
+
+def get_congestion_level(avg_speed):
+    if avg_speed < 15: return "très dense"
+    if avg_speed < 30: return "dense"
+    if avg_speed < 50: return "modéré"
+    return "fluide"
+
+
+def get_pollution_level(co2, nox, pmx):
+    """
+    Calcule l'Indice de Qualité de l'Air (IQA) basé sur le pire polluant.
+    Seuils approximatifs inspirés des normes européennes.
+    """
+    # C'est le critère le plus strict
+    if pmx > 50:
+        return "Toxique"
+    if pmx > 25:
+        return "Dangereux"
+    if nox > 120:
+        return "Très Mauvais"
+    if nox > 60:
+        return "Mauvais"
+    if co2 > 2500:
+        return "Médiocre"
+    return "Bon"
+
+
+def get_noise_level(avg_noise):
+    if avg_noise > 85: return "Très Élevé"
+    if avg_noise > 70: return "Élevé"
+    if avg_noise > 55: return "Modéré"
+    return "Faible"
+
+
+class ZoneAccumulator(object):
+    """Somme/compteur courants d'une clé zone|timestamp (mémoire constante)"""
+
+    __slots__ = ('speed', 'co2', 'noise', 'co', 'nox', 'pmx', 'count',
+                 'speed_digest', 'noise_digest', 'ambient', 'ambient_count')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.speed = 0.0
+        self.co2 = 0.0
+        self.noise = 0.0
+        self.co = 0.0
+        self.nox = 0.0
+        self.pmx = 0.0
+        self.count = 0
+        self.speed_digest = TDigest()
+        self.noise_digest = TDigest()
+        self.ambient = 0.0
+        self.ambient_count = 0
+
+    def add_partial(self, value):
+        """Ajoute une valeur partielle 'speed|co2|noise|co|nox|pmx|count[|digests]'"""
+        parts = value.split('|')
+        # On parse tout avant de modifier l'état: une ligne invalide
+        # ne doit pas laisser l'accumulateur à moitié mis à jour
+        speed = float(parts[0])
+        co2 = float(parts[1])
+        noise = float(parts[2])
+        co = float(parts[3])
+        nox = float(parts[4])
+        pmx = float(parts[5])
+        count = int(parts[6])
+        if count <= 0:
+            return
+
+        if len(parts) >= 9 and parts[7]:
+            speed_centroids = parse_centroids(parts[7])
+            noise_centroids = parse_centroids(parts[8])
+        else:
+            speed_centroids = [(speed / count, count)]
+            noise_centroids = [(noise / count, count)]
+
+        ambient = 0.0
+        ambient_count = 0
+        if len(parts) >= 11:
+            ambient = float(parts[9])
+            ambient_count = int(parts[10])
+
+        self.add_sums(speed, co2, noise, co, nox, pmx, count)
+        self.speed_digest.add_centroids(speed_centroids)
+        self.noise_digest.add_centroids(noise_centroids)
+        self.ambient += ambient
+        self.ambient_count += ambient_count
+
+    def add_sums(self, speed, co2, noise, co, nox, pmx, count):
+        """Ajoute des sommes déjà calculées (les digests sont alimentés à part)"""
+        self.speed += speed
+        self.co2 += co2
+        self.noise += noise
+        self.co += co
+        self.nox += nox
+        self.pmx += pmx
+        self.count += count
+
+    def format_partial(self):
+        """Sérialise les sommes courantes (précision complète) et les digests"""
+        return "{!r}|{!r}|{!r}|{!r}|{!r}|{!r}|{}|{}|{}|{!r}|{}".format(
+            self.speed, self.co2, self.noise, self.co, self.nox, self.pmx, self.count,
+            self.speed_digest.serialize(), self.noise_digest.serialize(),
+            self.ambient, self.ambient_count
+        )
+
+    def to_stats(self):
+        """Statistiques finales (moyennes, percentiles + niveaux) de la clé"""
+        count = self.count
+        avg_speed = self.speed / count
+        avg_co2 = self.co2 / count
+        avg_noise = self.noise / count
+        avg_co = self.co / count
+        avg_nox = self.nox / count
+        avg_pmx = self.pmx / count
+
+        stats = {
+            'avg_speed_kmh': round(avg_speed, 2),
+            'vehicle_count': count,
+            'congestion_level': get_congestion_level(avg_speed),
+            'avg_co2': round(avg_co2, 2),
+            'pollution_level': get_pollution_level(avg_co2, avg_nox, avg_pmx),
+            'avg_noise_db': round(avg_noise, 2),
+            'noise_level': get_noise_level(avg_noise),
+            # Les nouveaux
+            'avg_co': round(avg_co, 2),
+            'avg_nox': round(avg_nox, 2),
+            'avg_pmx': round(avg_pmx, 2),
+            # Percentiles approchés (t-digest)
+            'p50_speed_kmh': round(self.speed_digest.quantile(0.5), 2),
+            'p95_speed_kmh': round(self.speed_digest.quantile(0.95), 2),
+            'p95_noise_db': round(self.noise_digest.quantile(0.95), 2)
+        }
+        # Couche ambiante: seulement si des lieux étaient à portée
+        if self.ambient_count:
+            stats['avg_ambient_noise_db'] = round(self.ambient / self.ambient_count, 2)
+        return stats
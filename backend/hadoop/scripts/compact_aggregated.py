@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Compaction des résultats agrégés + index des timestamps
+
+Fusionne les part-* de /urban_data/aggregated (une ligne JSON par zone,
+timestamp et résolution) en parts triées par (timestamp, résolution,
+zone), puis écrit à côté un index _index.json:
+
+    {"version": 1, "sorted_by": "timestamp",
+     "parts": [{"name": "part-00000", "length": 134217728}, ...],
+     "blocks": [{"part": "part-00000", "offset": 0, "length": 1048576,
+                 "ts_min": 0, "ts_max": 41, "rows": 2870}, ...]}
+
+Un bloc fait environ --block-size Mo et ne coupe jamais un timestamp:
+une lecture ponctuelle ou par plage (HDFSService.read_aggregated_range)
+ne lit que les octets des blocs concernés. La liste des parts (nom,
+taille) permet à l'API d'ignorer un index périmé si les parts ont été
+réécrites depuis (job ou passe incrémentale non suivis de compaction).
+
+compact_tail() (passes incrémentales) ne réécrit que les dernières
+parts: les lignes refusionnées, toutes postérieures aux parts gardées,
+sont triées en nouvelles parts numérotées à la suite, et l'index est
+complété au lieu d'être recalculé.
+
+Tri externe (morceaux triés sur disque puis fusion): la mémoire ne
+dépend pas du volume. Remplacement du répertoire comme
+incremental_pipeline.replace_results. Les fichiers préfixés par _ sont
+ignorés par les jobs qui lisent part-*.
+
+Usage:
+    python compact_aggregated.py [--input /urban_data/aggregated] [--part-size 128] [--block-size 1]
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+HDFS_AGGREGATED = "/urban_data/aggregated"
+INDEX_NAME = "_index.json"
+
+SORT_CHUNK_ROWS = 500000        # lignes triées en mémoire avant écriture sur disque
+PART_BYTES = 128 << 20          # taille cible des parts (un bloc HDFS)
+BLOCK_BYTES = 1 << 20           # granularité de l'index
+
+
+def hdfs(*args, check=True):
+    """Exécute une commande `hdfs dfs`"""
+    result = subprocess.run(['hdfs', 'dfs'] + list(args), capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"hdfs dfs {' '.join(args)}: {result.stderr.strip()}")
+    return result
+
+
+def sort_prefix(line):
+    """Préfixe de tri à largeur fixe (comparaison de chaînes = ordre numérique)"""
+    data = json.loads(line)
+    return f"{int(data['timestamp']):012d}\t{int(data.get('resolution', 1)):08d}\t{data['zone']}\t"
+
+
+def external_sort(lines, workdir, chunk_rows=SORT_CHUNK_ROWS):
+    """
+    Trie des lignes JSON par (timestamp, résolution, zone)
+
+    Returns:
+        Générateur de (timestamp, ligne) dans l'ordre
+    """
+    chunk_paths = []
+    chunk = []
+    invalid = 0
+
+    def spill():
+        chunk.sort()
+        path = os.path.join(workdir, f"chunk-{len(chunk_paths):05d}")
+        with open(path, 'w') as f:
+            f.writelines(chunk)
+        chunk_paths.append(path)
+        chunk.clear()
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            chunk.append(sort_prefix(line) + line + '\n')
+        except (ValueError, KeyError, TypeError):
+            invalid += 1
+            continue
+        if len(chunk) >= chunk_rows:
+            spill()
+    if chunk:
+        spill()
+    if invalid:
+        logger.warning(f" {invalid} lignes invalides ignorées")
+
+    files = [open(path) for path in chunk_paths]
+    try:
+        for record in heapq.merge(*files):
+            timestamp, _, _, line = record.split('\t', 3)
+            yield int(timestamp), line
+    finally:
+        for f in files:
+            f.close()
+
+
+def write_parts(records, output_dir, part_bytes=PART_BYTES, block_bytes=BLOCK_BYTES, first_part=0):
+    """
+    Écrit les lignes triées en parts locales et construit l'index
+
+    Args:
+        first_part: numéro de la première part écrite (part-NNNNN)
+
+    Returns:
+        Document d'index (parts et blocs)
+    """
+    parts = []
+    blocks = []
+    out = None
+    part_name = None
+    offset = 0
+    block = None
+
+    def close_block():
+        if block is not None and block['rows']:
+            block['length'] = offset - block['offset']
+            blocks.append(block)
+
+    for timestamp, line in records:
+        data = line.encode('utf-8')
+        # Nouveau bloc (et éventuellement nouvelle part) seulement entre deux timestamps
+        if block is None or (offset - block['offset'] >= block_bytes and timestamp != block['ts_max']):
+            close_block()
+            if out is None or offset >= part_bytes:
+                if out is not None:
+                    out.close()
+                    parts.append({'name': part_name, 'length': offset})
+                part_name = f"part-{first_part + len(parts):05d}"
+                out = open(os.path.join(output_dir, part_name), 'wb')
+                offset = 0
+            block = {'part': part_name, 'offset': offset, 'length': 0,
+                     'ts_min': timestamp, 'ts_max': timestamp, 'rows': 0}
+
+        out.write(data)
+        offset += len(data)
+        block['ts_max'] = timestamp
+        block['rows'] += 1
+
+    close_block()
+    if out is not None:
+        out.close()
+        parts.append({'name': part_name, 'length': offset})
+
+    return {'version': 1, 'sorted_by': 'timestamp', 'parts': parts, 'blocks': blocks}
+
+
+def replace_directory(new_dir, target):
+    """Remplace target par new_dir (l'ancienne version est gardée le temps du renommage)"""
+    previous = f"{target}.old"
+    hdfs('-rm', '-r', '-f', previous, check=False)
+    if hdfs('-test', '-e', target, check=False).returncode == 0:
+        hdfs('-mv', target, previous)
+    hdfs('-mv', new_dir, target)
+    hdfs('-rm', '-r', '-f', previous, check=False)
+
+
+def compact(input_dir=HDFS_AGGREGATED, part_bytes=PART_BYTES, block_bytes=BLOCK_BYTES):
+    """
+    Compacte les parts d'un répertoire de résultats agrégés et y ajoute l'index
+
+    Returns:
+        Document d'index écrit
+    """
+    workdir = tempfile.mkdtemp(prefix='compact_aggregated_')
+    staging = os.path.join(workdir, 'out')
+    os.makedirs(staging)
+    try:
+        logger.info(f" Lecture et tri de {input_dir}/part-*")
+        proc = subprocess.Popen(['hdfs', 'dfs', '-cat', f"{input_dir}/part-*"],
+                                stdout=subprocess.PIPE, text=True)
+        records = external_sort(proc.stdout, workdir)
+        index = write_parts(records, staging, part_bytes, block_bytes)
+        if proc.wait() != 0:
+            raise RuntimeError(f"Lecture de {input_dir} impossible")
+
+        with open(os.path.join(staging, INDEX_NAME), 'w') as f:
+            json.dump(index, f)
+
+        rows = sum(b['rows'] for b in index['blocks'])
+        logger.info(f" {rows} lignes, {len(index['parts'])} parts, {len(index['blocks'])} blocs indexés")
+
+        compacted = f"{input_dir}.compact"
+        hdfs('-rm', '-r', '-f', compacted, check=False)
+        hdfs('-mkdir', '-p', compacted)
+        files = [os.path.join(staging, name) for name in sorted(os.listdir(staging))]
+        hdfs('-put', *files, compacted)
+        replace_directory(compacted, input_dir)
+        logger.info(f" {input_dir} compacté")
+        return index
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compact_tail(target_dir, merged_dir, index, tail, part_bytes=PART_BYTES, block_bytes=BLOCK_BYTES):
+    """
+    Remplace les dernières parts d'un répertoire compacté par les lignes
+    triées de merged_dir (les autres parts sont gardées telles quelles)
+
+    Args:
+        target_dir: répertoire compacté (/urban_data/aggregated)
+        merged_dir: sortie du job de fusion des parts `tail` et de l'incrément
+        index: index actuel de target_dir
+        tail: noms des parts remplacées (suffixe de index['parts'])
+
+    Returns:
+        Nouveau document d'index
+    """
+    kept = index['parts'][:len(index['parts']) - len(tail)]
+    if [p['name'] for p in index['parts'][len(kept):]] != list(tail):
+        raise ValueError("Les parts remplacées doivent être les dernières de l'index")
+
+    workdir = tempfile.mkdtemp(prefix='compact_aggregated_')
+    staging = os.path.join(workdir, 'out')
+    os.makedirs(staging)
+    try:
+        proc = subprocess.Popen(['hdfs', 'dfs', '-cat', f"{merged_dir}/part-*"],
+                                stdout=subprocess.PIPE, text=True)
+        records = external_sort(proc.stdout, workdir)
+        written = write_parts(records, staging, part_bytes, block_bytes, first_part=len(kept))
+        if proc.wait() != 0:
+            raise RuntimeError(f"Lecture de {merged_dir} impossible")
+
+        kept_names = {p['name'] for p in kept}
+        document = {
+            'version': 1, 'sorted_by': 'timestamp',
+            'parts': kept + written['parts'],
+            'blocks': [b for b in index['blocks'] if b['part'] in kept_names] + written['blocks'],
+        }
+        with open(os.path.join(staging, INDEX_NAME), 'w') as f:
+            json.dump(document, f)
+
+        # Parts téléversées à côté (répertoire _ ignoré par part-*), puis
+        # renommées: seules les parts remplacées disparaissent un instant
+        pending = f"{target_dir}/_pending"
+        hdfs('-rm', '-r', '-f', pending, check=False)
+        hdfs('-mkdir', '-p', pending)
+        parts = [os.path.join(staging, p['name']) for p in written['parts']]
+        if parts:
+            hdfs('-put', *parts, pending)
+        if tail:
+            hdfs('-rm', '-f', *[f"{target_dir}/{name}" for name in tail])
+        if parts:
+            hdfs('-mv', f"{pending}/part-*", target_dir)
+        hdfs('-put', '-f', os.path.join(staging, INDEX_NAME), f"{target_dir}/{INDEX_NAME}")
+        hdfs('-rm', '-r', '-f', pending, check=False)
+
+        rows = sum(b['rows'] for b in written['blocks'])
+        logger.info(f" {len(tail)} parts remplacées par {len(written['parts'])} ({rows} lignes), "
+                    f"{len(kept)} parts gardées")
+        return document
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compaction triée des résultats agrégés et index des timestamps")
+    parser.add_argument('--input', default=HDFS_AGGREGATED, help="Répertoire HDFS des résultats")
+    parser.add_argument('--part-size', type=int, default=PART_BYTES >> 20, help="Taille cible des parts (Mo)")
+    parser.add_argument('--block-size', type=float, default=BLOCK_BYTES / (1 << 20),
+                        help="Granularité de l'index (Mo)")
+    args = parser.parse_args()
+
+    compact(args.input, args.part_size << 20, int(args.block_size * (1 << 20)))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f" Erreur fatale: {e}")
+        sys.exit(1)
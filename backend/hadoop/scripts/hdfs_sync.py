@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Synchronisation incrémentale HDFS -> SQLite local (services/local_store.py)
+
+Ne recopie que les part-* de /urban_data/aggregated nouvelles ou
+modifiées: une part déjà copiée est gardée si sa taille et sa somme de
+contrôle HDFS (GETFILECHECKSUM) n'ont pas changé. Les lignes d'une part
+modifiée sont remplacées, celles d'une part disparue supprimées. Toute
+la passe tient dans une transaction: l'API (mode WAL) voit l'ancienne
+ou la nouvelle version, jamais un mélange.
+
+Après une passe incrémentale, seules les dernières parts (réécrites par
+compact_tail) sont recopiées. Tant que la copie n'a pas rattrapé HDFS
+(nom, taille et date de modification de chaque part), l'API lit HDFS
+(LocalStore.matches).
+
+Usage:
+    python hdfs_sync.py [--db backend/data/aggregated.db] [--watch 60]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+SERVICES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'services')
+sys.path.insert(0, SERVICES_DIR)
+
+from local_store import LOCAL_STORE_PATH, connect
+from webhdfs_client import webhdfs, WebHDFSError
+
+# Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+HDFS_AGGREGATED = "/urban_data/aggregated"
+INSERT_BATCH = 5000
+INSERT_ROW = "INSERT INTO aggregated (part, zone, timestamp, resolution, stats) VALUES (?, ?, ?, ?, ?)"
+
+
+def part_checksum(status):
+    """Somme de contrôle HDFS d'une part (date de modification si indisponible)"""
+    try:
+        return webhdfs.get_file_checksum(status['path'])['bytes']
+    except (WebHDFSError, KeyError) as e:
+        logger.warning(f" Somme de contrôle indisponible pour {status['path']}: {e}")
+        return f"mtime:{status['modificationTime']}"
+
+
+def iter_rows(name, path):
+    """Lignes JSON d'une part -> tuples de la table aggregated"""
+    for line in webhdfs.iter_lines(path):
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            stats = data['stats']
+            yield (name, data['zone'], int(data['timestamp']), int(data.get('resolution', 1)),
+                   json.dumps(stats))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f" Ligne JSON invalide dans {name}: {line[:50]}...")
+            continue
+
+
+def load_part(conn, status, checksum):
+    """Remplace les lignes d'une part; renvoie le nombre de lignes copiées"""
+    name = status['pathSuffix']
+    conn.execute("DELETE FROM aggregated WHERE part = ?", (name,))
+    rows = 0
+    batch = []
+    for row in iter_rows(name, status['path']):
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            conn.executemany(INSERT_ROW, batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(INSERT_ROW, batch)
+        rows += len(batch)
+    conn.execute("INSERT OR REPLACE INTO parts (name, length, checksum, rows, synced_at, mtime) "
+                 "VALUES (?, ?, ?, ?, ?, ?)",
+                 (name, status['length'], checksum, rows, time.time(), status['modificationTime']))
+    return rows
+
+
+def sync(db_path=LOCAL_STORE_PATH, hdfs_dir=HDFS_AGGREGATED):
+    """
+    Une passe de synchronisation
+
+    Returns:
+        Dict: parts copiées, inchangées, supprimées et lignes copiées
+    """
+    remote = {s['pathSuffix']: s for s in webhdfs.glob_status(f"{hdfs_dir}/part-*")}
+    conn = connect(db_path)
+    summary = {'copied': 0, 'unchanged': 0, 'deleted': 0, 'rows': 0}
+    try:
+        with conn:
+            known = {name: (length, checksum, mtime) for name, length, checksum, mtime
+                     in conn.execute("SELECT name, length, checksum, mtime FROM parts")}
+
+            for name, status in sorted(remote.items()):
+                checksum = part_checksum(status)
+                if known.get(name, ())[:2] == (status['length'], checksum):
+                    # Contenu identique: seule la date, comparée par l'API, est mise à jour
+                    if known[name][2] != status['modificationTime']:
+                        conn.execute("UPDATE parts SET mtime = ? WHERE name = ?",
+                                     (status['modificationTime'], name))
+                    summary['unchanged'] += 1
+                    continue
+                summary['rows'] += load_part(conn, status, checksum)
+                summary['copied'] += 1
+
+            for name in set(known) - set(remote):
+                conn.execute("DELETE FROM aggregated WHERE part = ?", (name,))
+                conn.execute("DELETE FROM parts WHERE name = ?", (name,))
+                summary['deleted'] += 1
+    finally:
+        conn.close()
+
+    logger.info(f" Synchronisation: {summary['copied']} parts copiées ({summary['rows']} lignes), "
+                f"{summary['unchanged']} inchangées, {summary['deleted']} supprimées")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronisation incrémentale des résultats agrégés vers SQLite")
+    parser.add_argument('--db', default=LOCAL_STORE_PATH, help="Fichier SQLite local")
+    parser.add_argument('--input', default=HDFS_AGGREGATED, help="Répertoire HDFS des résultats")
+    parser.add_argument('--watch', type=int, default=0,
+                        help="Resynchronise toutes les N secondes (0 = une seule passe)")
+    args = parser.parse_args()
+
+    if not args.watch:
+        sync(args.db, args.input)
+        return
+    while True:
+        try:
+            sync(args.db, args.input)
+        except Exception as e:
+            logger.error(f" Erreur de synchronisation: {e}")
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f" Erreur fatale: {e}")
+        sys.exit(1)
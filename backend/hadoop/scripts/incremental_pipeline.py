@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Pipeline MapReduce incrémental SmartCity
+Ne traite que les documents arrivés depuis la dernière exécution:
+
+1. Watermark: plus grand `timestamp` déjà agrégé, persisté dans HDFS
+   (/urban_data/state/watermark.json)
+2. Export MongoDB des seuls documents gps/emissions de ]watermark, borne]
+   vers un répertoire d'incrément, puis jobs nettoyage/fusion et agrégation
+   sur cet incrément uniquement (le reducer émet son état partiel)
+3. Fusion: mapper_merge_state.py replie les états de l'incrément dans les
+   résultats existants (sommes, compteurs, digests). Seules les clés dont
+   la fenêtre peut chevaucher l'incrément sont relues: avec l'index des
+   parts triées (compact_aggregated.py), ce sont les dernières parts
+   (timestamp > watermark - plus grand rollup). Elles sont remplacées par
+   la sortie triée de la fusion, les autres parts ne sont pas touchées:
+   le coût d'une passe suit l'incrément, pas l'historique.
+4. Avancement du watermark, une fois toutes les collections exportées
+   et fusionnées (un export raté arrête la passe sans l'avancer)
+
+Sans index (première exécution, --no-compact), les résultats sont
+fusionnés en entier puis compactés, sauf avec --no-compact.
+
+Comme run_mapreduce_pipeline.sh, l'agrégation reçoit lieux.json en
+entrée annexe (cache distribué, -cmdenv AGG_PLACES) sauf avec
+PLACES_SIDE_INPUT=0. La collection est statique: elle n'est exportée
+que si elle manque dans HDFS.
+
+La borne est le plus grand timestamp présent moins --lag secondes: la
+dernière seconde simulée peut être encore en cours d'écriture dans MongoDB.
+Sans watermark (première exécution), les résultats sont remplacés.
+
+Usage:
+    python incremental_pipeline.py [--lag 1] [--full] [--no-compact]
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+from mongodb_to_hdfs import HDFS_BASE_PATH, export_collection_to_hdfs, get_max_timestamp
+from compact_aggregated import INDEX_NAME, compact, compact_tail
+
+# Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+HADOOP_HOME = os.environ.get('HADOOP_HOME', '/usr/local/hadoop')
+MAPREDUCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mapreduce')
+
+# Chemins HDFS
+HDFS_AGGREGATED = "/urban_data/aggregated"
+HDFS_INCREMENTS = "/urban_data/increments"
+HDFS_STATE = "/urban_data/state"
+AGGREGATED_INDEX = f"{HDFS_AGGREGATED}/{INDEX_NAME}"
+WATERMARK_PATH = f"{HDFS_STATE}/watermark.json"
+HDFS_PLACES = f"{HDFS_BASE_PATH}/lieux.json"
+
+# Collections horodatées (lieux est statique et n'entre pas dans l'agrégation)
+INCREMENTAL_COLLECTIONS = ['gps', 'emissions']
+
+CLEAN_FILES = ['mapper_clean.py', 'reducer_fusion.py', 'record_decoder.py', 'instrumentation.py']
+AGG_FILES = ['mapper_aggregate_zone.py', 'combiner_aggregate_zone.py', 'reducer_aggregate_zone.py',
+             'zone_stats.py', 'zone_index.py', 'quantile_sketch.py', 'skew.py', 'place_index.py',
+             'instrumentation.py']
+MERGE_FILES = ['mapper_merge_state.py', 'combiner_aggregate_zone.py', 'reducer_aggregate_zone.py',
+               'zone_stats.py', 'quantile_sketch.py', 'skew.py']
+
+
+# ============ HDFS ============
+
+def hdfs(*args, check=True):
+    """Exécute une commande `hdfs dfs`"""
+    result = subprocess.run(['hdfs', 'dfs'] + list(args), capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"hdfs dfs {' '.join(args)}: {result.stderr.strip()}")
+    return result
+
+
+def hdfs_exists(path):
+    return hdfs('-test', '-e', path, check=False).returncode == 0
+
+
+def read_watermark():
+    """Watermark persisté (None si aucune exécution incrémentale)"""
+    if not hdfs_exists(WATERMARK_PATH):
+        return None
+    return json.loads(hdfs('-cat', WATERMARK_PATH).stdout)['timestamp']
+
+
+def write_watermark(timestamp):
+    """Écrit le watermark (appelé seulement après la fusion des résultats)"""
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump({'timestamp': timestamp}, f)
+        local_file = f.name
+    try:
+        hdfs('-mkdir', '-p', HDFS_STATE)
+        hdfs('-put', '-f', local_file, WATERMARK_PATH)
+    finally:
+        os.remove(local_file)
+
+
+# ============ Jobs Hadoop Streaming ============
+
+def streaming_jar():
+    jars = glob.glob(f"{HADOOP_HOME}/share/hadoop/tools/lib/hadoop-streaming-*.jar")
+    if not jars:
+        raise RuntimeError(f"hadoop-streaming introuvable dans {HADOOP_HOME}")
+    return jars[0]
+
+
+def run_streaming(files, mapper, reducer, inputs, output, combiner=None, env=None):
+    """Lance un job Hadoop Streaming (scripts et fichiers hdfs:// livrés par -files)"""
+    cmd = ['hadoop', 'jar', streaming_jar(),
+           '-files', ','.join(f if f.startswith('hdfs://') else os.path.join(MAPREDUCE_DIR, f)
+                              for f in files)]
+    for name, value in (env or {}).items():
+        cmd += ['-cmdenv', f"{name}={value}"]
+    cmd += ['-mapper', mapper, '-reducer', reducer]
+    if combiner:
+        cmd += ['-combiner', combiner]
+    for path in inputs:
+        cmd += ['-input', path]
+    cmd += ['-output', output]
+
+    hdfs('-rm', '-r', '-f', output, check=False)
+    logger.info(f" Job: {mapper} -> {output}")
+    subprocess.run(cmd, check=True)
+
+
+def places_side_input():
+    """Lieux en entrée annexe de l'agrégation (PLACES_SIDE_INPUT, activé par défaut)"""
+    return os.environ.get('PLACES_SIDE_INPUT', '1') == '1'
+
+
+def aggregation_files():
+    """Fichiers du job d'agrégation, avec lieux.json depuis HDFS si l'entrée annexe est active"""
+    if places_side_input():
+        return AGG_FILES + [f"hdfs://{HDFS_PLACES}"]
+    return AGG_FILES
+
+
+def aggregation_env():
+    """Options de l'agrégation reprises de l'environnement (comme run_mapreduce_pipeline.sh)"""
+    env = {'AGG_EMIT_STATE': '1'}
+    for name in ('AGG_ROLLUPS', 'AGG_BATCH_MODE'):
+        if name in os.environ:
+            env[name] = os.environ[name]
+    if places_side_input():
+        env['AGG_PLACES'] = os.path.basename(HDFS_PLACES)
+    return env
+
+
+# ============ Étapes ============
+
+def max_resolution():
+    """Plus grande fenêtre agrégée (AGG_ROLLUPS, comme le mapper)"""
+    rollups = [int(r) for r in os.environ.get('AGG_ROLLUPS', '60,300,3600').split(',') if r.strip()]
+    return max(rollups + [1])
+
+
+def ensure_places():
+    """Exporte lieux.json (statique) s'il n'est pas encore dans HDFS"""
+    if places_side_input() and not hdfs_exists(HDFS_PLACES):
+        logger.info(f" Export des lieux vers {HDFS_PLACES}")
+        export_collection_to_hdfs('lieux', HDFS_PLACES)
+
+
+def export_increment(since, upper, raw_dir):
+    """
+    Exporte les documents de ]since, upper] (tout jusqu'à upper si since est None)
+
+    Returns:
+        Nombre de documents exportés (0: aucune donnée nouvelle; un échec
+        d'export lève une exception)
+    """
+    window = {'$lte': upper}
+    if since is not None:
+        window['$gt'] = since
+
+    total = 0
+    for collection_name in INCREMENTAL_COLLECTIONS:
+        total += export_collection_to_hdfs(
+            collection_name, f"{raw_dir}/{collection_name}.json", query={'timestamp': window}
+        ) or 0
+    return total
+
+
+def read_index():
+    """Index des parts triées, None s'il est absent ou ne décrit plus les parts"""
+    if not hdfs_exists(AGGREGATED_INDEX):
+        return None
+    index = json.loads(hdfs('-cat', AGGREGATED_INDEX).stdout)
+    listing = hdfs('-stat', '%n %b', f"{HDFS_AGGREGATED}/part-*", check=False).stdout.split('\n')
+    current = sorted(tuple(line.rsplit(' ', 1)) for line in listing if line.strip())
+    indexed = sorted((p['name'], str(p['length'])) for p in index['parts'])
+    return index if current == indexed else None
+
+
+def tail_parts(index, since):
+    """
+    Dernières parts pouvant contenir une clé dont la fenêtre chevauche ]since, ...]
+
+    Les parts étant triées par timestamp, c'est un suffixe de index['parts']
+    """
+    threshold = since - max_resolution()
+    ts_max = {}
+    for block in index['blocks']:
+        ts_max[block['part']] = max(ts_max.get(block['part'], block['ts_max']), block['ts_max'])
+    for i, part in enumerate(index['parts']):
+        if ts_max.get(part['name'], threshold + 1) > threshold:
+            return [p['name'] for p in index['parts'][i:]]
+    return []
+
+
+def merge_results(increment_output, since, compact_results=True):
+    """Replie les états de l'incrément dans /urban_data/aggregated"""
+    merged = f"{HDFS_AGGREGATED}.next"
+    index = read_index()
+    if index is None:
+        logger.warning(" Résultats non indexés: fusion de tout l'historique")
+        inputs = [f"{HDFS_AGGREGATED}/part-*"]
+    else:
+        tail = tail_parts(index, since)
+        logger.info(f" Fusion de {len(tail)}/{len(index['parts'])} parts avec l'incrément")
+        inputs = [f"{HDFS_AGGREGATED}/{name}" for name in tail]
+
+    run_streaming(
+        MERGE_FILES,
+        mapper='python mapper_merge_state.py',
+        combiner='python combiner_aggregate_zone.py',
+        reducer='python reducer_aggregate_zone.py',
+        inputs=inputs + [f"{increment_output}/part-*"],
+        output=merged,
+        env={'AGG_EMIT_STATE': '1'},
+    )
+
+    if index is None:
+        replace_results(merged)
+        if compact_results:
+            compact(HDFS_AGGREGATED)
+    else:
+        compact_tail(HDFS_AGGREGATED, merged, index, tail)
+        hdfs('-rm', '-r', '-f', merged, check=False)
+
+
+def replace_results(new_output):
+    """Remplace /urban_data/aggregated (l'ancienne version est gardée le temps du renommage)"""
+    previous = f"{HDFS_AGGREGATED}.old"
+    hdfs('-rm', '-r', '-f', previous, check=False)
+    if hdfs_exists(HDFS_AGGREGATED):
+        hdfs('-mv', HDFS_AGGREGATED, previous)
+    hdfs('-mv', new_output, HDFS_AGGREGATED)
+    hdfs('-rm', '-r', '-f', previous, check=False)
+
+
+def run_incremental(lag=1, full=False, compact_results=True):
+    """
+    Exécute une passe incrémentale
+
+    Args:
+        lag: secondes les plus récentes laissées au prochain passage
+        full: ignore le watermark et recalcule tout
+        compact_results: compacte et indexe les résultats non indexés
+            (les résultats déjà indexés restent triés à chaque fusion)
+
+    Returns:
+        Nouveau watermark (None si rien à traiter)
+    """
+    since = None if full else read_watermark()
+
+    maxima = [get_max_timestamp(name) for name in INCREMENTAL_COLLECTIONS]
+    if any(m is None for m in maxima):
+        logger.warning(" Collections vides, rien à traiter")
+        return None
+    upper = min(maxima) - lag
+
+    if since is not None and upper <= since:
+        logger.info(f" Aucune donnée nouvelle (watermark={since}, borne={upper})")
+        return None
+
+    logger.info(f" Incrément: timestamps ]{since}, {upper}]")
+    increment_dir = f"{HDFS_INCREMENTS}/{upper}"
+    raw_dir = f"{increment_dir}/raw"
+    cleaned_dir = f"{increment_dir}/cleaned"
+    aggregated_dir = f"{increment_dir}/aggregated"
+    # Restes d'une passe interrompue sur la même borne
+    hdfs('-rm', '-r', '-f', increment_dir, check=False)
+
+    # Lève une exception si un export échoue: le watermark n'avance pas
+    if export_increment(since, upper, raw_dir) == 0:
+        logger.info(" Aucun document dans la fenêtre")
+        write_watermark(upper)
+        return upper
+    ensure_places()
+
+    run_streaming(
+        CLEAN_FILES,
+        mapper='python mapper_clean.py',
+        reducer='python reducer_fusion.py',
+        inputs=[f"{raw_dir}/*.json"],
+        output=cleaned_dir,
+    )
+    run_streaming(
+        aggregation_files(),
+        mapper='python mapper_aggregate_zone.py',
+        combiner='python combiner_aggregate_zone.py',
+        reducer='python reducer_aggregate_zone.py',
+        inputs=[f"{cleaned_dir}/part-*"],
+        output=aggregated_dir,
+        env=aggregation_env(),
+    )
+
+    if since is None or not hdfs_exists(HDFS_AGGREGATED):
+        # Première exécution: l'incrément couvre tout l'historique
+        replace_results(aggregated_dir)
+        if compact_results:
+            compact(HDFS_AGGREGATED)
+    else:
+        merge_results(aggregated_dir, since, compact_results)
+
+    write_watermark(upper)
+    hdfs('-rm', '-r', '-f', increment_dir, check=False)
+    logger.info(f" Watermark avancé à {upper}")
+    return upper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline MapReduce incrémental SmartCity")
+    parser.add_argument('--lag', type=int, default=1,
+                        help="Secondes récentes non traitées (encore en écriture)")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore le watermark et recalcule tout l'historique")
+    parser.add_argument('--no-compact', action='store_true',
+                        help="Ne pas compacter ni indexer des résultats non indexés")
+    args = parser.parse_args()
+
+    run_incremental(lag=args.lag, full=args.full, compact_results=not args.no_compact)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f" Erreur fatale: {e}")
+        sys.exit(1)
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Moteur MapReduce local (sans Hadoop)
+Enchaîne dans un seul processus (par tâche) les étapes du pipeline:
+    mapper_clean -> reducer_fusion -> mapper_aggregate_zone
+        -> combiner_aggregate_zone -> reducer_aggregate_zone
+
+- Les étapes sont des générateurs de lignes chaînés en mémoire
+  (le reducer d'un job alimente directement le mapper du job suivant)
+- Les clés sont réparties par hash stable entre N partitions; les variantes
+  salées d'une clé chaude (cle#n) vont sur des partitions consécutives
+- Le shuffle est un tri externe: spills triés sur disque puis fusion k-voies
+- Les tâches map/reduce s'exécutent dans un pool multiprocessing
+
+Usage:
+    python local_pipeline.py -i raw/gps.json raw/emissions.json raw/lieux.json -o aggregated/
+"""
+
+import argparse
+import functools
+import heapq
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+MAPREDUCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mapreduce')
+sys.path.insert(0, MAPREDUCE_DIR)
+
+import mapper_clean
+import reducer_fusion
+import mapper_aggregate_zone
+import combiner_aggregate_zone
+import reducer_aggregate_zone
+import mapper_merge_state
+from skew import SALT_SEPARATOR, load_hot_keys
+
+# Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPLIT_SIZE = 64 * 1024 * 1024   # octets par split d'entrée
+DEFAULT_SORT_BUFFER = 200000            # lignes en mémoire avant spill
+
+
+class Job(object):
+    """Un job MapReduce: mapper, combiner (optionnel) et reducer"""
+
+    def __init__(self, name, mapper, reducer, combiner=None):
+        self.name = name
+        self.mapper = mapper
+        self.reducer = reducer
+        self.combiner = combiner
+
+
+def build_jobs(batch=False, hot_keys=None):
+    """
+    Chaîne complète du pipeline SmartCity (même ordre que run_mapreduce_pipeline.sh)
+
+    Args:
+        batch: mapper d'agrégation en mode colonnes numpy (pré-agrégation par split)
+        hot_keys: clés chaudes à saler (cle -> variantes, cf. sample_hot_keys.py);
+            ajoute la seconde étape qui fusionne les variantes
+    """
+    aggregate_mapper = mapper_aggregate_zone.map_lines_batch if batch else mapper_aggregate_zone.map_lines
+    jobs = [Job('nettoyage_fusion', mapper_clean.map_lines, reducer_fusion.reduce_lines)]
+    if not hot_keys:
+        jobs.append(Job('agregation_zone', aggregate_mapper, reducer_aggregate_zone.reduce_lines,
+                        combiner=combiner_aggregate_zone.combine_lines))
+        return jobs
+
+    jobs += [
+        Job('agregation_zone',
+            functools.partial(aggregate_mapper, hot_keys=hot_keys),
+            functools.partial(reducer_aggregate_zone.reduce_lines, emit_state=True),
+            combiner=combiner_aggregate_zone.combine_lines),
+        Job('fusion_cles_chaudes', mapper_merge_state.map_lines, reducer_aggregate_zone.reduce_lines,
+            combiner=combiner_aggregate_zone.combine_lines),
+    ]
+    return jobs
+
+
+SMARTCITY_JOBS = build_jobs()
+
+
+# ============ Clés / partitionnement ============
+
+def get_key(line):
+    """Clé Hadoop streaming: tout ce qui précède la première tabulation"""
+    tab = line.find('\t')
+    return line if tab < 0 else line[:tab]
+
+
+def hash_partition(key, num_partitions):
+    """Partitionnement stable entre processus (hash() de Python est randomisé)"""
+    return zlib.crc32(key.encode('utf-8')) % num_partitions
+
+
+def skew_partition(key, num_partitions):
+    """
+    hash_partition, sauf pour les variantes salées cle#n: partition de la
+    clé d'origine décalée de n, pour que les variantes ne se retrouvent
+    pas sur le même reducer (le hash seul peut les faire collisionner)
+    """
+    base, sep, salt = key.rpartition(SALT_SEPARATOR)
+    if sep and salt.isdigit():
+        return (zlib.crc32(base.encode('utf-8')) + int(salt)) % num_partitions
+    return hash_partition(key, num_partitions)
+
+
+# ============ Entrées ============
+
+def compute_splits(paths, split_size):
+    """Découpe les fichiers d'entrée en plages d'octets (path, start, end)"""
+    splits = []
+    for path in paths:
+        size = os.path.getsize(path)
+        start = 0
+        while start < size:
+            end = min(start + split_size, size)
+            splits.append((path, start, end))
+            start = end
+    return splits
+
+
+def read_split(path, start, end):
+    """
+    Lit les lignes qui COMMENCENT dans [start, end)
+    (même règle que le TextInputFormat de Hadoop)
+    """
+    with open(path, 'rb') as f:
+        pos = start
+        if start > 0:
+            # Ligne partielle: elle appartient au split précédent
+            f.seek(start - 1)
+            pos = start - 1 + len(f.readline())
+        while pos < end:
+            raw = f.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            yield raw.decode('utf-8', 'replace')
+
+
+def read_spill(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def merge_spills(paths):
+    """Fusion k-voies de spills triés, stable sur la clé"""
+    return heapq.merge(*[read_spill(p) for p in paths], key=get_key)
+
+
+# ============ Shuffle: tri externe ============
+
+class SpillWriter(object):
+    """Bufferise la sortie d'une tâche, la trie par clé et la déverse par partition"""
+
+    def __init__(self, spill_dir, prefix, num_partitions, combiner=None,
+                 sort_buffer=DEFAULT_SORT_BUFFER, partitioner=skew_partition):
+        self.spill_dir = spill_dir
+        self.prefix = prefix
+        self.num_partitions = num_partitions
+        self.combiner = combiner
+        self.sort_buffer = sort_buffer
+        self.partitioner = partitioner
+        self.buffers = [[] for _ in range(num_partitions)]
+        self.buffered = 0
+        self.spills = [[] for _ in range(num_partitions)]
+        self.records = 0
+
+    def write(self, line):
+        self.buffers[self.partitioner(get_key(line), self.num_partitions)].append(line)
+        self.buffered += 1
+        self.records += 1
+        if self.buffered >= self.sort_buffer:
+            self.flush()
+
+    def flush(self):
+        for partition, buffer in enumerate(self.buffers):
+            if not buffer:
+                continue
+            buffer.sort(key=get_key)
+            lines = self.combiner(buffer) if self.combiner else buffer
+            path = os.path.join(self.spill_dir, '{}-p{:05d}-s{:04d}'.format(
+                self.prefix, partition, len(self.spills[partition])))
+            with open(path, 'w', encoding='utf-8') as f:
+                for line in lines:
+                    f.write(line)
+                    f.write('\n')
+            self.spills[partition].append(path)
+            self.buffers[partition] = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        return self.spills
+
+
+# ============ Tâches (exécutées dans le pool) ============
+
+def chain(stages, lines):
+    for stage in stages:
+        lines = stage(lines)
+    return lines
+
+
+def run_task(task):
+    """
+    Exécute une tâche du pipeline.
+
+    task = (task_id, source, stages, sink)
+        source: ('split', path, start, end) ou ('merge', [spills])
+        stages: fonctions générateurs appliquées en chaîne
+        sink:   ('spill', spill_dir, num_partitions, combiner, sort_buffer, partitioner)
+                ou ('output', path)
+    """
+    task_id, source, stages, sink = task
+
+    if source[0] == 'split':
+        lines = read_split(source[1], source[2], source[3])
+    else:
+        lines = merge_spills(source[1])
+
+    out = chain(stages, lines)
+
+    if sink[0] == 'output':
+        count = 0
+        with open(sink[1], 'w', encoding='utf-8') as f:
+            for line in out:
+                f.write(line)
+                f.write('\n')
+                count += 1
+        return task_id, None, count
+
+    _, spill_dir, num_partitions, combiner, sort_buffer, partitioner = sink
+    writer = SpillWriter(spill_dir, task_id, num_partitions, combiner, sort_buffer, partitioner)
+    for line in out:
+        writer.write(line)
+    return task_id, writer.close(), writer.records
+
+
+# ============ Orchestration ============
+
+def tee_pending_gps(path, lines):
+    """
+    Fast path: écarte les lignes GPS| (GPS sans émissions embarquées) vers
+    un fichier de côté pour la jointure de repli, laisse passer le reste
+    """
+    with open(path, 'w', encoding='utf-8') as pending:
+        for line in lines:
+            if '\tGPS|' in line:
+                pending.write(line.rstrip('\n'))
+                pending.write('\n')
+            else:
+                yield line
+
+
+class LocalRunner(object):
+    """Exécute les phases map / shuffle / reduce dans un pool de processus"""
+
+    def __init__(self, pool, spill_dir, num_partitions, split_size=DEFAULT_SPLIT_SIZE,
+                 sort_buffer=DEFAULT_SORT_BUFFER, partitioner=skew_partition):
+        self.pool = pool
+        self.spill_dir = spill_dir
+        self.num_partitions = num_partitions
+        self.split_size = split_size
+        self.sort_buffer = sort_buffer
+        self.partitioner = partitioner
+
+    def _spill_sink(self, combiner):
+        return ('spill', self.spill_dir, self.num_partitions, combiner, self.sort_buffer, self.partitioner)
+
+    def _collect(self, name, tasks):
+        started = time.time()
+        partitions = [[] for _ in range(self.num_partitions)]
+        records = 0
+        for _, spills, count in self.pool.imap_unordered(run_task, tasks):
+            records += count
+            for partition, paths in enumerate(spills):
+                partitions[partition].extend(paths)
+        logger.info(f" {name}: {len(tasks)} tâches, {records} lignes shufflées ({time.time() - started:.1f}s)")
+        return partitions
+
+    def map_phase(self, name, input_paths, stages, combiner=None, task_stages=None):
+        """
+        Map sur les splits d'entrée -> partitions de spills triés.
+        task_stages(task_id) peut ajouter des étapes propres à chaque tâche.
+        """
+        tasks = []
+        for i, split in enumerate(compute_splits(input_paths, self.split_size)):
+            task_id = '{}-m{:05d}'.format(name, i)
+            extra = tuple(task_stages(task_id)) if task_stages else ()
+            tasks.append((task_id, ('split',) + split, tuple(stages) + extra, self._spill_sink(combiner)))
+        return self._collect(f"Map '{name}'", tasks)
+
+    def shuffle_phase(self, name, partitions, stages, combiner=None):
+        """Reduce d'un job chaîné au map du suivant -> nouvelles partitions"""
+        tasks = [
+            ('{}-r{:05d}'.format(name, p), ('merge', paths), tuple(stages), self._spill_sink(combiner))
+            for p, paths in enumerate(partitions)
+        ]
+        return self._collect(f"Reduce+map '{name}'", tasks)
+
+    def reduce_phase(self, partitions, reducer, output_dir):
+        """Reduce final -> fichiers part-* dans output_dir"""
+        started = time.time()
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = [os.path.join(output_dir, 'part-{:05d}'.format(p)) for p in range(len(partitions))]
+        tasks = [
+            ('part-{:05d}'.format(p), ('merge', paths), (reducer,), ('output', outputs[p]))
+            for p, paths in enumerate(partitions)
+        ]
+        records = sum(count for _, _, count in self.pool.imap_unordered(run_task, tasks))
+        logger.info(f" Reduce final: {records} lignes écrites ({time.time() - started:.1f}s)")
+        open(os.path.join(output_dir, '_SUCCESS'), 'w').close()
+        return outputs
+
+
+def _open_runner(workers, num_partitions, split_size, sort_buffer, partitioner, tmp_dir):
+    workers = workers or os.cpu_count() or 1
+    spill_dir = tempfile.mkdtemp(prefix='smartcity-shuffle-', dir=tmp_dir)
+    pool = multiprocessing.Pool(workers)
+    runner = LocalRunner(pool, spill_dir, num_partitions or workers, split_size, sort_buffer, partitioner)
+    return runner
+
+
+def _close_runner(runner):
+    runner.pool.close()
+    runner.pool.join()
+    shutil.rmtree(runner.spill_dir, ignore_errors=True)
+
+
+def run_pipeline(input_paths, output_dir, jobs=None, workers=None, num_partitions=None,
+                 split_size=DEFAULT_SPLIT_SIZE, sort_buffer=DEFAULT_SORT_BUFFER,
+                 partitioner=skew_partition, tmp_dir=None):
+    """
+    Exécute une chaîne de jobs MapReduce en local.
+
+    Le reducer du job k et le mapper du job k+1 tournent dans la même tâche:
+    aucune sérialisation intermédiaire hors shuffle.
+
+    Returns:
+        Liste des fichiers part-* écrits dans output_dir
+    """
+    jobs = jobs or SMARTCITY_JOBS
+    runner = _open_runner(workers, num_partitions, split_size, sort_buffer, partitioner, tmp_dir)
+    try:
+        partitions = runner.map_phase(jobs[0].name, input_paths, (jobs[0].mapper,), jobs[0].combiner)
+        for job, nxt in zip(jobs, jobs[1:]):
+            partitions = runner.shuffle_phase(nxt.name, partitions, (job.reducer, nxt.mapper), nxt.combiner)
+        return runner.reduce_phase(partitions, jobs[-1].reducer, output_dir)
+    finally:
+        _close_runner(runner)
+
+
+def run_fast_path_pipeline(gps_paths, emission_paths, output_dir, batch=False, hot_keys=None, workers=None,
+                           num_partitions=None, split_size=DEFAULT_SPLIT_SIZE,
+                           sort_buffer=DEFAULT_SORT_BUFFER, partitioner=skew_partition, tmp_dir=None):
+    """
+    Pipeline GPS-only: les documents GPS qui embarquent leurs émissions
+    vont directement au mapper d'agrégation (pas de jointure, pas de shuffle
+    du job 1). Seuls les GPS sans émissions passent par la jointure de repli
+    avec la collection emissions, qui n'est lue que si nécessaire.
+    """
+    jobs = build_jobs(batch=batch, hot_keys=hot_keys)
+    clean_job, aggregate_job = jobs[:2]
+    runner = _open_runner(workers, num_partitions, split_size, sort_buffer, partitioner, tmp_dir)
+    pending_dir = tempfile.mkdtemp(prefix='pending-gps-', dir=runner.spill_dir)
+    try:
+        # Job map-only: mapper_clean (fast path) -> mapper d'agrégation, dans la même tâche
+        partitions = runner.map_phase(
+            'gps_fast_path', gps_paths,
+            (mapper_clean.map_lines_fast,), aggregate_job.combiner,
+            task_stages=lambda task_id: (
+                functools.partial(tee_pending_gps, os.path.join(pending_dir, task_id)),
+                aggregate_job.mapper,
+            ),
+        )
+
+        pending = [os.path.join(pending_dir, name) for name in sorted(os.listdir(pending_dir))]
+        pending = [path for path in pending if os.path.getsize(path) > 0]
+        if pending:
+            logger.info(f" Jointure de repli: {len(pending)} fichiers de GPS sans émissions")
+            join = runner.map_phase(clean_job.name, pending + list(emission_paths), (clean_job.mapper,))
+            joined = runner.shuffle_phase(aggregate_job.name, join, (clean_job.reducer, aggregate_job.mapper),
+                                          aggregate_job.combiner)
+            for partition, paths in enumerate(joined):
+                partitions[partition].extend(paths)
+        else:
+            logger.info(" Tous les GPS embarquent leurs émissions: jointure ignorée")
+
+        # Seconde étape éventuelle: fusion des variantes salées des clés chaudes
+        for job, nxt in zip(jobs[1:], jobs[2:]):
+            partitions = runner.shuffle_phase(nxt.name, partitions, (job.reducer, nxt.mapper), nxt.combiner)
+        return runner.reduce_phase(partitions, jobs[-1].reducer, output_dir)
+    finally:
+        _close_runner(runner)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline MapReduce SmartCity en local (sans Hadoop)")
+    parser.add_argument('-i', '--input', nargs='+', required=True, help="Fichiers JSON bruts (un document par ligne)")
+    parser.add_argument('-o', '--output', required=True, help="Répertoire de sortie (part-*)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Processus du pool (défaut: nb CPU)")
+    parser.add_argument('-p', '--partitions', type=int, default=None, help="Nombre de partitions reduce")
+    parser.add_argument('--split-size', type=int, default=DEFAULT_SPLIT_SIZE // (1024 * 1024),
+                        help="Taille d'un split d'entrée (Mo)")
+    parser.add_argument('--sort-buffer', type=int, default=DEFAULT_SORT_BUFFER,
+                        help="Lignes en mémoire par tâche avant spill")
+    parser.add_argument('--tmp-dir', default=None, help="Répertoire des spills du shuffle")
+    parser.add_argument('--batch', action='store_true',
+                        help="Mapper d'agrégation en mode batch (colonnes numpy)")
+    parser.add_argument('--gps-only', action='store_true',
+                        help="Fast path: émissions embarquées dans gps, jointure seulement en repli "
+                             "(fichiers reconnus par leur nom: *gps*, *emission*)")
+    parser.add_argument('--hot-keys', default=None,
+                        help="Clés chaudes à saler (fichier de sample_hot_keys.py)")
+    args = parser.parse_args()
+
+    logger.info(" Démarrage du pipeline local")
+    started = time.time()
+    options = dict(
+        workers=args.workers,
+        num_partitions=args.partitions,
+        split_size=args.split_size * 1024 * 1024,
+        sort_buffer=args.sort_buffer,
+        tmp_dir=args.tmp_dir,
+    )
+    hot_keys = load_hot_keys(args.hot_keys) if args.hot_keys else None
+    if hot_keys:
+        logger.info(f" {len(hot_keys)} clés chaudes salées, fusion en seconde étape")
+    if args.gps_only:
+        gps = [p for p in args.input if 'gps' in os.path.basename(p)]
+        emissions = [p for p in args.input if 'emission' in os.path.basename(p)]
+        outputs = run_fast_path_pipeline(gps, emissions, args.output, batch=args.batch, hot_keys=hot_keys,
+                                         **options)
+    else:
+        outputs = run_pipeline(args.input, args.output, jobs=build_jobs(batch=args.batch, hot_keys=hot_keys),
+                               **options)
+    logger.info(f" Pipeline terminé en {time.time() - started:.1f}s: {len(outputs)} fichiers dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Fusion des variantes salées des clés chaudes (seconde étape du job 2)
+
+reducer_aggregate_zone.py émet les résultats partiels des clés salées
+(cle#n, marqués 'salt') à la fin de chaque part. Pour chaque part, on
+lit seulement cette fin (WebHDFS, par blocs en partant de la fin), on
+fusionne localement les résultats partiels sous leur clé d'origine
+(mapper_merge_state.py + reducer_aggregate_zone.py), écrit la fusion et
+les positions de coupe dans HDFS, puis seulement tronque chaque part
+(hdfs dfs -truncate) et publie la part fusionnée. Le coût suit le
+nombre de clés chaudes, pas la taille de la sortie.
+
+Usage:
+    python merge_salted_keys.py --input /urban_data/aggregated.salted
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(SCRIPTS_DIR)), 'services'))
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), 'mapreduce'))
+
+import mapper_merge_state
+import reducer_aggregate_zone
+from webhdfs_client import webhdfs
+
+# Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TAIL_CHUNK = 256 * 1024
+MERGED_PART = "part-salted"
+# Préfixe _: ignorés par les jobs qui lisent part-*
+PENDING_PART = "_part-salted.pending"
+CUTS_NAME = "_salted_cuts.json"
+
+
+def hdfs(*args, check=True):
+    """Exécute une commande `hdfs dfs`"""
+    result = subprocess.run(['hdfs', 'dfs'] + list(args), capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"hdfs dfs {' '.join(args)}: {result.stderr.strip()}")
+    return result
+
+
+def is_salted(line):
+    try:
+        return json.loads(line).get('salt') is not None
+    except ValueError:
+        return False
+
+
+def salted_tail(path, length):
+    """
+    Résultats salés en fin de part
+
+    Returns:
+        (offset du premier résultat salé = nouvelle longueur de la part, lignes)
+    """
+    end = length
+    buf = b''
+    while True:
+        start = max(0, end - TAIL_CHUNK)
+        buf = webhdfs.read(path, start, end - start) + buf
+        end = start
+
+        rows = []
+        cut = len(buf)
+        i = len(buf) - 1 if buf.endswith(b'\n') else len(buf)
+        while True:
+            j = buf.rfind(b'\n', 0, i)
+            if j < 0 and start > 0:
+                break  # première ligne du tampon incomplète: on lit plus loin
+            line = buf[j + 1:i]
+            if line.strip():
+                if not is_salted(line):
+                    return start + cut, rows[::-1]
+                rows.append(line.decode('utf-8'))
+            cut = j + 1
+            i = j
+            if j < 0:
+                return start, rows[::-1]
+
+
+def merge_rows(rows):
+    """Résultats partiels des variantes -> une ligne JSON par clé d'origine"""
+    partials = sorted(mapper_merge_state.map_lines(rows))
+    return list(reducer_aggregate_zone.reduce_lines(partials))
+
+
+def put_text(text, hdfs_path):
+    """Écrit `text` dans un fichier HDFS (remplacé s'il existe)"""
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        f.write(text)
+        local_file = f.name
+    try:
+        hdfs('-put', '-f', local_file, hdfs_path)
+    finally:
+        os.remove(local_file)
+
+
+def merge_salted(output_dir):
+    """
+    Retire les résultats salés de la fin des parts et ajoute leur fusion
+
+    Rien n'est tronqué avant que la part fusionnée (PENDING_PART) et les
+    positions de coupe (CUTS_NAME) soient écrites dans HDFS: une exécution
+    interrompue est reprise à partir de ces positions, les troncatures
+    déjà faites ne sont pas refaites.
+
+    Returns:
+        Nombre de parts dont la fin salée a été retirée
+    """
+    pending = f"{output_dir}/{PENDING_PART}"
+    cuts_path = f"{output_dir}/{CUTS_NAME}"
+
+    if webhdfs.exists(cuts_path):
+        logger.warning(f" Fusion interrompue dans {output_dir}: reprise")
+        cuts = json.loads(webhdfs.read(cuts_path))
+    else:
+        cuts = {}
+        rows = []
+        for status in webhdfs.glob_status(f"{output_dir}/part-*"):
+            if status['pathSuffix'] == MERGED_PART or not status['length']:
+                continue
+            cut, tail = salted_tail(status['path'], status['length'])
+            if tail:
+                cuts[status['path']] = cut
+                rows.extend(tail)
+        if not cuts:
+            logger.info(" Aucun résultat salé")
+            return 0
+
+        merged = merge_rows(rows)
+        put_text('\n'.join(merged) + '\n', pending)
+        # Point de validation: à partir d'ici, la fusion est reprise et non recalculée
+        put_text(json.dumps(cuts), cuts_path)
+        logger.info(f" {len(rows)} résultats salés fusionnés en {len(merged)} clés")
+
+    lengths = {s['path']: s['length'] for s in webhdfs.glob_status(f"{output_dir}/part-*")}
+    for path, cut in sorted(cuts.items()):
+        if lengths.get(path, cut) > cut:
+            hdfs('-truncate', '-w', str(cut), path)
+    if webhdfs.exists(pending):
+        hdfs('-mv', pending, f"{output_dir}/{MERGED_PART}")
+    hdfs('-rm', '-f', cuts_path)
+
+    logger.info(f" Fin salée retirée de {len(cuts)} parts")
+    return len(cuts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fusion des variantes salées des clés chaudes")
+    parser.add_argument('--input', required=True, help="Sortie HDFS du job d'agrégation salé")
+    args = parser.parse_args()
+
+    merge_salted(args.input)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f" Erreur fatale: {e}")
+        sys.exit(1)
@@ -5,6 +5,8 @@ Exporte toutes les collections vers HDFS en format JSON
 """
 
 import json
+import os
+import posixpath
 import subprocess
 import sys
 from pymongo import MongoClient
@@ -27,14 +29,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def export_collection_to_hdfs(collection_name, hdfs_path):
+def get_max_timestamp(collection_name):
+    """
+    Plus grand `timestamp` d'une collection (None si vide)
+    
+    Args:
+        collection_name: Nom de la collection MongoDB
+    """
+    client = MongoClient(MONGODB_URL)
+    try:
+        doc = client[DB_NAME][collection_name].find_one(
+            {'timestamp': {'$exists': True}},
+            projection={'timestamp': 1},
+            sort=[('timestamp', -1)]
+        )
+        return doc['timestamp'] if doc else None
+    finally:
+        client.close()
+
+def export_collection_to_hdfs(collection_name, hdfs_path, query=None):
     """
     Exporte une collection MongoDB vers HDFS
     
     Args:
         collection_name: Nom de la collection MongoDB
         hdfs_path: Chemin HDFS de destination
+        query: Filtre MongoDB (optionnel, ex. plage de timestamps d'un incrément)
+        
+    Returns:
+        Nombre de documents exportés (0 si aucun document ne correspond)
+
+    Raises:
+        RuntimeError: échec de la copie vers HDFS
     """
+    query = query or {}
     try:
         logger.info(f" Export de la collection '{collection_name}'...")
         
@@ -44,18 +72,18 @@ def export_collection_to_hdfs(collection_name, hdfs_path):
         collection = db[collection_name]
         
         # Compter les documents
-        count = collection.count_documents({})
+        count = collection.count_documents(query)
         logger.info(f"   {count} documents trouvés")
         
         if count == 0:
             logger.warning(f" Collection '{collection_name}' vide, skip")
-            return
+            return 0
         
         # Créer fichier temporaire local
         local_file = f"/tmp/{collection_name}.json"
         
         with open(local_file, 'w') as f:
-            cursor = collection.find({})
+            cursor = collection.find(query)
             for doc in cursor:
                 # Supprimer _id MongoDB (non JSON sérialisable)
                 if '_id' in doc:
@@ -65,45 +93,33 @@ def export_collection_to_hdfs(collection_name, hdfs_path):
         
         logger.info(f" Fichier local créé: {local_file}")
         
-        # Créer le répertoire HDFS si nécessaire
-        subprocess.run(
-            ['hdfs', 'dfs', '-mkdir', '-p', HDFS_BASE_PATH],
-            check=False,
-            capture_output=True
-        )
-        
-        # Supprimer l'ancien fichier HDFS s'il existe
-        subprocess.run(
-            ['hdfs', 'dfs', '-rm', '-f', hdfs_path],
-            check=False,
-            capture_output=True
-        )
-        
-        # Copier vers HDFS
-        result = subprocess.run(
-            ['hdfs', 'dfs', '-put', local_file, hdfs_path],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode == 0:
+        try:
+            # Créer le répertoire HDFS si nécessaire
+            result = subprocess.run(
+                ['hdfs', 'dfs', '-mkdir', '-p', posixpath.dirname(hdfs_path)],
+                capture_output=True,
+                text=True
+            )
+            if result.returncode != 0:
+                raise RuntimeError(f"hdfs dfs -mkdir {posixpath.dirname(hdfs_path)}: {result.stderr.strip()}")
+
+            # Copier vers HDFS (remplace l'ancien fichier s'il existe)
+            result = subprocess.run(
+                ['hdfs', 'dfs', '-put', '-f', local_file, hdfs_path],
+                capture_output=True,
+                text=True
+            )
+            # Un export raté n'est pas un export vide: l'appelant ne doit pas
+            # considérer la fenêtre comme traitée
+            if result.returncode != 0:
+                raise RuntimeError(f"hdfs dfs -put {hdfs_path}: {result.stderr.strip()}")
             logger.info(f" Copié vers HDFS: {hdfs_path}")
-        else:
-            logger.error(f" Erreur HDFS: {result.stderr}")
-            return
-        
-        # Supprimer le fichier local temporaire
-        subprocess.run(['rm', local_file], check=False)
-        
-        # Vérifier la copie
-        check_result = subprocess.run(
-            ['hdfs', 'dfs', '-ls', hdfs_path],
-            capture_output=True,
-            text=True
-        )
+        finally:
+            # Supprimer le fichier local temporaire
+            if os.path.exists(local_file):
+                os.remove(local_file)
         
-        if check_result.returncode == 0:
-            logger.info(f" Vérification OK")
+        return count
         
     except Exception as e:
         logger.error(f" Erreur export '{collection_name}': {e}")
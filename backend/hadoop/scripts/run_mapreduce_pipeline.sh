@@ -20,6 +20,41 @@ HDFS_RAW="/urban_data/raw"
 HDFS_CLEANED="/urban_data/cleaned"
 HDFS_AGGREGATED="/urban_data/aggregated"
 HDFS_ALERTS="/urban_data/alerts"
+HDFS_ANALYTICS="/urban_data/analytics"
+
+# Fichier GeoJSON des quartiers (optionnel, sinon rectangles de zone_index.py)
+ZONES_GEOJSON=${ZONES_GEOJSON:-}
+
+# Mode du job 1: "join" (jointure GPS/émissions) ou "gps" (émissions embarquées, jointure en repli)
+PIPELINE_MODE=${PIPELINE_MODE:-join}
+
+# Mapper d'agrégation en mode batch (1 = colonnes numpy, pré-agrégation par split)
+AGG_BATCH_MODE=${AGG_BATCH_MODE:-0}
+
+# Rollups produits par le job d'agrégation (secondes, vide = aucun)
+AGG_ROLLUPS=${AGG_ROLLUPS-60,300,3600}
+
+# Lieux en entrée annexe du mapper d'agrégation (couche de bruit ambiant, 1 = activée)
+PLACES_SIDE_INPUT=${PLACES_SIDE_INPUT:-1}
+
+# Nombre de reducers de l'agrégation (vide = défaut Hadoop)
+AGG_REDUCERS=${AGG_REDUCERS:-}
+
+# Clés chaudes: lignes nettoyées échantillonnées avant l'agrégation
+# (0 = pas de salage; nécessite AGG_REDUCERS)
+SKEW_SAMPLE_LINES=${SKEW_SAMPLE_LINES:-0}
+
+# Compaction triée des résultats agrégés + index des timestamps (1 = activée)
+COMPACT_AGGREGATED=${COMPACT_AGGREGATED:-1}
+
+# Instrumentation des mappers (compteurs Hadoop, 1 = activée) et profils
+# par tâche (cprofile, tracemalloc ou all), cf. mapreduce/instrumentation.py
+MR_INSTRUMENT=${MR_INSTRUMENT:-0}
+MR_PROFILE=${MR_PROFILE:-}
+INSTRUMENT_ENV="-cmdenv MR_INSTRUMENT=$MR_INSTRUMENT"
+if [ -n "$MR_PROFILE" ]; then
+    INSTRUMENT_ENV="$INSTRUMENT_ENV -cmdenv MR_PROFILE=$MR_PROFILE"
+fi
 
 echo "   Répertoires:"
 echo "   Project: $PROJECT_DIR"
@@ -29,7 +64,7 @@ echo ""
 
 # ÉTAPE 1: Export MongoDB → HDFS
 
-echo " ÉTAPE 1/3: Export MongoDB → HDFS"
+echo " ÉTAPE 1/5: Export MongoDB → HDFS"
 echo "────────────────────────────────────"
 
 python3 "$SCRIPTS_DIR/mongodb_to_hdfs.py"
@@ -46,19 +81,53 @@ echo ""
 
 # ÉTAPE 2: Job MapReduce - Nettoyage & Fusion
 
-echo " ÉTAPE 2/3: MapReduce - Nettoyage & Fusion"
+echo " ÉTAPE 2/5: MapReduce - Nettoyage & Fusion"
 echo "──────────────────────────────────────────"
 
 # Supprimer ancien output
 hdfs dfs -rm -r -f $HDFS_CLEANED
 
-# Exécuter Hadoop Streaming
-hadoop jar $HADOOP_HOME/share/hadoop/tools/lib/hadoop-streaming-*.jar \
-    -files "$MAPREDUCE_DIR/mapper_clean.py,$MAPREDUCE_DIR/reducer_fusion.py" \
-    -mapper "python mapper_clean.py" \
-    -reducer "python reducer_fusion.py" \
-    -input "$HDFS_RAW/*.json" \
-    -output "$HDFS_CLEANED"
+if [ "$PIPELINE_MODE" = "gps" ]; then
+    # Fast path: les documents GPS embarquent leurs émissions -> job map-only,
+    # sans jointure ni shuffle des deux collections
+    hadoop jar $HADOOP_HOME/share/hadoop/tools/lib/hadoop-streaming-*.jar \
+        -files "$MAPREDUCE_DIR/mapper_clean.py,$MAPREDUCE_DIR/record_decoder.py,$MAPREDUCE_DIR/instrumentation.py" \
+        -D mapreduce.job.reduces=0 \
+        $INSTRUMENT_ENV \
+        -mapper "python mapper_clean.py --fast-path" \
+        -input "$HDFS_RAW/gps.json" \
+        -output "$HDFS_CLEANED/fast"
+
+    # Jointure de repli, uniquement s'il reste des GPS sans émissions (lignes GPS|)
+    if hdfs dfs -cat "$HDFS_CLEANED/fast/part-*" | grep -q -F "	GPS|"; then
+        echo "   GPS sans émissions détectés: jointure de repli avec $HDFS_RAW/emissions.json"
+        hadoop jar $HADOOP_HOME/share/hadoop/tools/lib/hadoop-streaming-*.jar \
+            -files "$MAPREDUCE_DIR/mapper_clean.py,$MAPREDUCE_DIR/reducer_fusion.py,$MAPREDUCE_DIR/record_decoder.py,$MAPREDUCE_DIR/instrumentation.py" \
+            $INSTRUMENT_ENV \
+            -mapper "python mapper_clean.py" \
+            -reducer "python reducer_fusion.py" \
+            -input "$HDFS_CLEANED/fast/part-*" \
+            -input "$HDFS_RAW/emissions.json" \
+            -output "$HDFS_CLEANED/join"
+    fi
+    AGG_INPUT="$HDFS_CLEANED/*/part-*"
+else
+    # Lieux en entrée annexe de l'agrégation: inutile de les faire passer par la jointure
+    CLEAN_INPUT="$HDFS_RAW/*.json"
+    if [ "$PLACES_SIDE_INPUT" = "1" ]; then
+        CLEAN_INPUT="$HDFS_RAW/{gps,emissions}.json"
+    fi
+
+    # Exécuter Hadoop Streaming
+    hadoop jar $HADOOP_HOME/share/hadoop/tools/lib/hadoop-streaming-*.jar \
+        -files "$MAPREDUCE_DIR/mapper_clean.py,$MAPREDUCE_DIR/reducer_fusion.py,$MAPREDUCE_DIR/record_decoder.py,$MAPREDUCE_DIR/instrumentation.py" \
+        $INSTRUMENT_ENV \
+        -mapper "python mapper_clean.py" \
+        -reducer "python reducer_fusion.py" \
+        -input "$CLEAN_INPUT" \
+        -output "$HDFS_CLEANED"
+    AGG_INPUT="$HDFS_CLEANED/part-*"
+fi
 
 if [ $? -eq 0 ]; then
     echo " Job 1 terminé: Données nettoyées"
@@ -73,19 +142,70 @@ echo ""
 
 # ÉTAPE 3: Job MapReduce - Agrégation par Zone
 
-echo " ÉTAPE 3/3: MapReduce - Agrégation par Zone"
+echo " ÉTAPE 3/5: MapReduce - Agrégation par Zone"
 echo "───────────────────────────────────────────"
 
 # Supprimer ancien output
 hdfs dfs -rm -r -f $HDFS_AGGREGATED
 
+# Zones polygonales optionnelles (GeoJSON en coordonnées SUMO)
+AGG_FILES="$MAPREDUCE_DIR/mapper_aggregate_zone.py,$MAPREDUCE_DIR/combiner_aggregate_zone.py,$MAPREDUCE_DIR/reducer_aggregate_zone.py,$MAPREDUCE_DIR/zone_stats.py,$MAPREDUCE_DIR/zone_index.py,$MAPREDUCE_DIR/quantile_sketch.py,$MAPREDUCE_DIR/skew.py,$MAPREDUCE_DIR/place_index.py,$MAPREDUCE_DIR/instrumentation.py"
+AGG_ENV="-cmdenv AGG_ROLLUPS=$AGG_ROLLUPS"
+if [ "$AGG_BATCH_MODE" = "1" ]; then
+    AGG_ENV="$AGG_ENV -cmdenv AGG_BATCH_MODE=1"
+    echo "   Mapper d'agrégation: mode batch (numpy)"
+fi
+if [ -n "$ZONES_GEOJSON" ]; then
+    AGG_FILES="$AGG_FILES,$ZONES_GEOJSON"
+    AGG_ENV="$AGG_ENV -cmdenv ZONES_GEOJSON=$(basename $ZONES_GEOJSON)"
+    echo "   Zones polygonales: $ZONES_GEOJSON"
+fi
+if [ "$PLACES_SIDE_INPUT" = "1" ]; then
+    # Cache distribué: lieux.json copié une fois par nœud, lu par chaque mapper
+    AGG_FILES="$AGG_FILES,hdfs://$HDFS_RAW/lieux.json"
+    AGG_ENV="$AGG_ENV -cmdenv AGG_PLACES=lieux.json"
+    echo "   Couche ambiante: $HDFS_RAW/lieux.json"
+fi
+AGG_OPTS=""
+if [ -n "$AGG_REDUCERS" ]; then
+    AGG_OPTS="-D mapreduce.job.reduces=$AGG_REDUCERS"
+fi
+
+# Clés chaudes: salées en cle#n (réparties par le HashPartitioner sur la clé
+# complète), puis fusion des variantes sous la clé d'origine. L'échantillon
+# est tiré au hasard dans toutes les parts; les variantes sont écrites en
+# fin de part par le reducer, seule cette fin est relue par la fusion
+AGG_OUTPUT="$HDFS_AGGREGATED"
+if [ "$SKEW_SAMPLE_LINES" -gt 0 ] && [ -n "$AGG_REDUCERS" ]; then
+    HOT_KEYS_FILE="/tmp/hot_keys.tsv"
+    python3 "$SCRIPTS_DIR/sample_hot_keys.py" --hdfs "$AGG_INPUT" --limit "$SKEW_SAMPLE_LINES" \
+        -r "$AGG_REDUCERS" -o "$HOT_KEYS_FILE"
+    if [ -s "$HOT_KEYS_FILE" ]; then
+        AGG_FILES="$AGG_FILES,$HOT_KEYS_FILE"
+        AGG_ENV="$AGG_ENV -cmdenv AGG_HOT_KEYS=hot_keys.tsv"
+        AGG_OUTPUT="$HDFS_AGGREGATED.salted"
+        hdfs dfs -rm -r -f "$AGG_OUTPUT"
+        echo "   Clés chaudes salées: $(wc -l < $HOT_KEYS_FILE)"
+    fi
+fi
+
 # Exécuter Hadoop Streaming
 hadoop jar $HADOOP_HOME/share/hadoop/tools/lib/hadoop-streaming-*.jar \
-    -files "$MAPREDUCE_DIR/mapper_aggregate_zone.py,$MAPREDUCE_DIR/reducer_aggregate_zone.py" \
+    $AGG_OPTS \
+    -files "$AGG_FILES" \
+    $AGG_ENV \
+    $INSTRUMENT_ENV \
     -mapper "python mapper_aggregate_zone.py" \
+    -combiner "python combiner_aggregate_zone.py" \
     -reducer "python reducer_aggregate_zone.py" \
-    -input "$HDFS_CLEANED/part-*" \
-    -output "$HDFS_AGGREGATED"
+    -input "$AGG_INPUT" \
+    -output "$AGG_OUTPUT"
+
+if [ "$AGG_OUTPUT" != "$HDFS_AGGREGATED" ]; then
+    # Seconde étape: fusion des résultats partiels des clés salées (fins de parts)
+    python3 "$SCRIPTS_DIR/merge_salted_keys.py" --input "$AGG_OUTPUT"
+    hdfs dfs -mv "$AGG_OUTPUT" "$HDFS_AGGREGATED"
+fi
 
 if [ $? -eq 0 ]; then
     echo " Job 2 terminé: Agrégation par zone"
@@ -95,6 +215,79 @@ else
     exit 1
 fi
 
+# Parts triées par timestamp + index d'offsets (lectures par plage de l'API)
+if [ "$COMPACT_AGGREGATED" = "1" ]; then
+    python3 "$SCRIPTS_DIR/compact_aggregated.py" --input "$HDFS_AGGREGATED" || exit 1
+fi
+
+echo ""
+
+
+# ÉTAPE 4: Job MapReduce - Détection d'alertes
+
+echo " ÉTAPE 4/5: MapReduce - Détection d'alertes"
+echo "────────────────────────────────────────────"
+
+# Supprimer ancien output
+hdfs dfs -rm -r -f $HDFS_ALERTS
+
+# Tri secondaire: clé (zone, timestamp), partition sur la zone seule
+hadoop jar $HADOOP_HOME/share/hadoop/tools/lib/hadoop-streaming-*.jar \
+    -D stream.num.map.output.key.fields=2 \
+    -D mapreduce.partition.keypartitioner.options=-k1,1 \
+    -files "$MAPREDUCE_DIR/alert_detector.py" \
+    -partitioner org.apache.hadoop.mapred.lib.KeyFieldBasedPartitioner \
+    -mapper "python alert_detector.py map" \
+    -reducer "python alert_detector.py reduce" \
+    -input "$HDFS_AGGREGATED/part-*" \
+    -output "$HDFS_ALERTS"
+
+if [ $? -eq 0 ]; then
+    echo " Job 3 terminé: Épisodes d'alerte"
+    echo "   Output: $HDFS_ALERTS"
+else
+    echo " Erreur Job 3"
+    exit 1
+fi
+
+echo ""
+
+
+# ÉTAPE 5: Job MapReduce - Cube analytique
+
+echo " ÉTAPE 5/5: MapReduce - Cube analytique"
+echo "────────────────────────────────────────"
+
+# Supprimer ancien output
+hdfs dfs -rm -r -f $HDFS_ANALYTICS
+
+# Rollups horaires si disponibles, sinon agrégats à la seconde
+case ",$AGG_ROLLUPS," in
+    *,3600,*) STATS_RESOLUTION=3600 ;;
+    *) STATS_RESOLUTION=1 ;;
+esac
+
+# Un seul reducer: la sortie est un unique document JSON
+hadoop jar $HADOOP_HOME/share/hadoop/tools/lib/hadoop-streaming-*.jar \
+    -D mapreduce.job.reduces=1 \
+    -files "$MAPREDUCE_DIR/stats_aggregator.py,$MAPREDUCE_DIR/instrumentation.py" \
+    -cmdenv STATS_RESOLUTION=$STATS_RESOLUTION \
+    $INSTRUMENT_ENV \
+    -mapper "python stats_aggregator.py map" \
+    -combiner "python stats_aggregator.py combine" \
+    -reducer "python stats_aggregator.py reduce" \
+    -input "$HDFS_AGGREGATED/part-*" \
+    -input "$HDFS_ALERTS/part-*" \
+    -output "$HDFS_ANALYTICS"
+
+if [ $? -eq 0 ]; then
+    echo " Job 4 terminé: Cube analytique"
+    echo "   Output: $HDFS_ANALYTICS"
+else
+    echo " Erreur Job 4"
+    exit 1
+fi
+
 echo ""
 
 
@@ -115,5 +308,7 @@ echo " ===== PIPELINE TERMINÉ AVEC SUCCÈS ====="
 echo ""
 echo "Les résultats sont disponibles dans:"
 echo "   $HDFS_AGGREGATED"
+echo "   $HDFS_ALERTS"
+echo "   $HDFS_ANALYTICS"
 echo ""
 echo " L'API peut maintenant les lire pour alimenter le frontend"
\ No newline at end of file
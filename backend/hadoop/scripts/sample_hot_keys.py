@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Détection des clés chaudes du job d'agrégation par échantillonnage
+
+Passe le mapper d'agrégation sur un échantillon des données nettoyées
+(sortie du job 1), compte les lignes émises par clé et liste les clés
+dont le poids dépasse une fraction de la part d'un reducer. Chaque clé
+chaude reçoit assez de variantes salées (cle#n) pour revenir sous ce seuil.
+
+Sur HDFS (--hdfs), l'échantillon est lu dans des fenêtres d'octets
+tirées au hasard dans toutes les parts (WebHDFS, offset/length): il
+couvre tous les splits sans relire les données, contrairement au début
+du premier fichier.
+
+Usage:
+    python sample_hot_keys.py --hdfs '/urban_data/cleaned/part-*' --limit 2000000 -r 8 -o hot_keys.tsv
+    python sample_hot_keys.py -i cleaned/part-00000 -r 8 -o hot_keys.tsv
+"""
+
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+from collections import Counter
+
+MAPREDUCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mapreduce')
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(MAPREDUCE_DIR)), 'services')
+sys.path.insert(0, MAPREDUCE_DIR)
+sys.path.insert(0, SERVICES_DIR)
+
+import mapper_aggregate_zone
+from webhdfs_client import webhdfs
+
+# Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Une clé est chaude au-delà de cette fraction de la part d'un reducer
+DEFAULT_HOT_FRACTION = 0.5
+
+# Échantillonnage HDFS: fenêtres d'octets tirées au hasard
+DEFAULT_SAMPLE_LINES = 200000
+DEFAULT_WINDOWS = 200
+WINDOW_BYTES = 256 * 1024
+
+
+def sample_lines(paths, every=1, limit=None):
+    """Une ligne sur `every` des fichiers (ou de stdin), au plus `limit`"""
+    streams = [open(p, encoding='utf-8') for p in paths] if paths else [sys.stdin]
+    kept = 0
+    try:
+        for stream in streams:
+            for i, line in enumerate(stream):
+                if i % every:
+                    continue
+                yield line
+                kept += 1
+                if limit and kept >= limit:
+                    return
+    finally:
+        for stream in streams:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def sample_hdfs_lines(pattern, limit=DEFAULT_SAMPLE_LINES, windows=DEFAULT_WINDOWS, seed=None):
+    """
+    Lignes lues dans `windows` fenêtres d'octets tirées au hasard
+
+    Chaque fenêtre tombe dans une part choisie proportionnellement à sa
+    taille; les lignes coupées aux bords de la fenêtre sont ignorées.
+
+    Args:
+        pattern: motif HDFS des parts (/urban_data/cleaned/part-*)
+        limit: lignes échantillonnées au plus
+        windows: nombre de fenêtres
+        seed: graine du tirage (optionnel)
+    """
+    parts = [s for s in webhdfs.glob_status(pattern) if s['length']]
+    total = sum(s['length'] for s in parts)
+    if not total:
+        return
+    rng = random.Random(seed)
+    per_window = max(1, limit // windows)
+
+    draws = []
+    for _ in range(windows):
+        target = rng.randrange(total)
+        for status in parts:
+            if target < status['length']:
+                break
+            target -= status['length']
+        draws.append((status['path'], target))
+
+    # Lecture dans l'ordre des fichiers (connexions réutilisées, lectures séquentielles)
+    for path, offset in sorted(draws):
+        data = webhdfs.read(path, offset, WINDOW_BYTES)
+        lines = data.split(b'\n')
+        # Première ligne coupée, sauf en début de fichier; dernière toujours suspecte
+        lines = lines[(0 if offset == 0 else 1):-1]
+        for line in lines[:per_window]:
+            yield line.decode('utf-8', 'replace')
+
+
+def key_weights(lines):
+    """Nombre de lignes émises par le mapper d'agrégation, par clé"""
+    weights = Counter()
+    for out in mapper_aggregate_zone.map_lines(lines, hot_keys={}):
+        weights[out[:out.index('\t')]] += 1
+    return weights
+
+
+def detect_hot_keys(weights, num_reducers, hot_fraction=DEFAULT_HOT_FRACTION):
+    """
+    Clés chaudes et nombre de variantes salées
+
+    Args:
+        weights: poids (lignes) par clé
+        num_reducers: nombre de reducers du job
+        hot_fraction: seuil en fraction de la part d'un reducer
+
+    Returns:
+        Dict clé -> nombre de variantes (> 1), clés les plus lourdes d'abord
+    """
+    total = sum(weights.values())
+    if not total or num_reducers <= 1:
+        return {}
+    threshold = total / num_reducers * hot_fraction
+
+    hot_keys = {}
+    for key, weight in weights.most_common():
+        if weight <= threshold:
+            break
+        hot_keys[key] = min(num_reducers, int(math.ceil(weight / threshold)))
+    return hot_keys
+
+
+def write_hot_keys(hot_keys, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, salts in hot_keys.items():
+            f.write(f"{key}\t{salts}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Détection des clés chaudes de l'agrégation par zone")
+    parser.add_argument('-i', '--input', nargs='*', default=None,
+                        help="Données nettoyées (défaut: stdin)")
+    parser.add_argument('--hdfs', default=None,
+                        help="Motif HDFS des données nettoyées (échantillon aléatoire sur toutes les parts)")
+    parser.add_argument('--windows', type=int, default=DEFAULT_WINDOWS,
+                        help="Fenêtres d'octets tirées avec --hdfs")
+    parser.add_argument('-o', '--output', required=True, help="Fichier des clés chaudes (cle\\tsalts)")
+    parser.add_argument('-r', '--reducers', type=int, required=True, help="Nombre de reducers du job")
+    parser.add_argument('--every', type=int, default=1, help="Garder une ligne sur N")
+    parser.add_argument('--limit', type=int, default=None, help="Lignes échantillonnées au plus")
+    parser.add_argument('--hot-fraction', type=float, default=DEFAULT_HOT_FRACTION,
+                        help="Seuil en fraction de la part d'un reducer")
+    args = parser.parse_args()
+
+    if args.hdfs:
+        lines = sample_hdfs_lines(args.hdfs, args.limit or DEFAULT_SAMPLE_LINES, args.windows)
+    else:
+        lines = sample_lines(args.input, args.every, args.limit)
+    weights = key_weights(lines)
+    hot_keys = detect_hot_keys(weights, args.reducers, args.hot_fraction)
+    write_hot_keys(hot_keys, args.output)
+
+    total = sum(weights.values())
+    logger.info(f" {len(weights)} clés échantillonnées ({total} lignes), {len(hot_keys)} clés chaudes")
+    for key, salts in hot_keys.items():
+        logger.info(f"   {key}: {weights[key] / total:.1%} des lignes -> {salts} variantes")
+
+
+if __name__ == "__main__":
+    main()
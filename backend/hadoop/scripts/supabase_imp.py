@@ -75,6 +75,9 @@ def upload_to_supabase():
                 line_count += 1
                 try:
                     record = json.loads(line)
+                    # traffic_stats ne stocke que la résolution seconde (pas les rollups)
+                    if record.get('resolution', 1) != 1:
+                        continue
                     stats = record.get('stats', {})
                     zone_name = record.get('zone')
                     zone_id = zones_map.get(zone_name, zones_map.get('Autre'))
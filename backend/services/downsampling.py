@@ -0,0 +1,120 @@
+"""
+Réduction de séries temporelles avant sérialisation
+
+Une série (x, y) de n points est ramenée à `threshold` points au plus,
+en O(n), pour que la taille de la réponse suive la résolution de
+l'écran et non la durée demandée:
+
+- lttb: Largest-Triangle-Three-Buckets (Steinarsson, 2013), garde la
+  forme visuelle de la courbe (un point par bucket)
+- minmax: minimum et maximum de chaque bucket, garde tous les pics
+  (deux points par bucket)
+
+Le premier et le dernier point sont toujours conservés.
+"""
+
+from typing import Callable, Dict, List, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Largest-Triangle-Three-Buckets
+
+    Args:
+        points: série triée par x
+        threshold: nombre de points voulu (>= 3)
+
+    Returns:
+        Sous-ensemble de `points`, dans l'ordre
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    # Buckets de taille égale entre le premier et le dernier point
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Moyenne du bucket suivant (troisième sommet du triangle)
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / span
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / span
+
+        # Point du bucket courant formant le plus grand triangle avec a
+        ax, ay = points[a]
+        best_area = -1.0
+        best = next_start - 1
+        for j in range(int(i * every) + 1, next_start):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Minimum et maximum de chaque bucket (threshold / 2 buckets)
+
+    Args:
+        points: série triée par x
+        threshold: nombre de points voulu (>= 4)
+
+    Returns:
+        Sous-ensemble de `points`, dans l'ordre
+    """
+    n = len(points)
+    if threshold >= n or threshold < 4:
+        return list(points)
+
+    buckets = (threshold - 2) // 2
+    every = (n - 2) / buckets
+    sampled = [points[0]]
+
+    for i in range(buckets):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        low = high = start
+        for j in range(start + 1, end):
+            y = points[j][1]
+            if y < points[low][1]:
+                low = j
+            elif y > points[high][1]:
+                high = j
+        for j in sorted({low, high}):
+            sampled.append(points[j])
+
+    sampled.append(points[-1])
+    return sampled
+
+
+DOWNSAMPLERS: Dict[str, Callable[[Sequence[Point], int], List[Point]]] = {
+    'lttb': lttb,
+    'minmax': minmax,
+}
+
+
+def downsample(points: Sequence[Point], threshold: int, method: str = 'lttb') -> List[Point]:
+    """
+    Réduit une série avec la méthode demandée ('lttb' ou 'minmax')
+
+    Raises:
+        ValueError: méthode inconnue
+    """
+    try:
+        sampler = DOWNSAMPLERS[method]
+    except KeyError:
+        raise ValueError(f"Méthode de réduction inconnue: {method}")
+    return sampler(points, threshold)
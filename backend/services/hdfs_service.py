@@ -1,14 +1,231 @@
 """
 Service pour lire les résultats MapReduce depuis HDFS
+
+Lectures par WebHDFS (webhdfs_client.py, connexions keep-alive, parts lues
+en parallèle); HDFS_CLIENT=cli revient à `hdfs dfs -cat` si l'API REST
+du NameNode n'est pas exposée. Les requêtes par plage passent par la
+copie SQLite locale (local_store.py) quand hdfs_sync.py l'alimente.
 """
 
+import asyncio
+import bisect
+import heapq
+import os
 import subprocess
 import json
 import logging
-from typing import List, Dict, Optional
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from webhdfs_client import webhdfs, WebHDFSError
+from local_store import local_store
 
 logger = logging.getLogger(__name__)
 
+HDFS_CLIENT = os.environ.get('HDFS_CLIENT', 'webhdfs')
+
+AGGREGATED_DIR = "/urban_data/aggregated"
+# Index des timestamps écrit par scripts/compact_aggregated.py
+AGGREGATED_INDEX = f"{AGGREGATED_DIR}/_index.json"
+
+# Cache des résultats agrégés: empreinte des parts vérifiée au plus toutes
+# les CHECK_INTERVAL secondes, au plus MAX_ROWS lignes gardées en mémoire
+CACHE_CHECK_INTERVAL = float(os.environ.get('HDFS_CACHE_CHECK_INTERVAL', '5'))
+CACHE_MAX_ROWS = int(os.environ.get('HDFS_CACHE_MAX_ROWS', '1000000'))
+
+
+def _get_path(data: Dict, path: List[str]) -> Any:
+    """Valeur d'un chemin pointé déjà découpé (None si absent)"""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _project(data: Dict, projection: List[List[str]]) -> Dict:
+    """Garde les chemins demandés, en conservant l'imbrication"""
+    result: Dict = {}
+    for path in projection:
+        value = _get_path(data, path)
+        if value is None:
+            continue
+        target = result
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+    return result
+
+
+class AggregatedDataset:
+    """
+    Résultats agrégés parsés (lecture seule), indexés par (résolution, timestamp)
+
+    Au plus max_rows lignes gardées, y compris pendant la lecture: dès que
+    la limite est dépassée, les fenêtres les plus anciennes sont écartées
+    (tas des timestamps) et les lignes plus anciennes qui arrivent ensuite
+    sont ignorées. rows()/rows_between() renvoient None pour ces fenêtres
+    et l'appelant relit HDFS; les timestamps restent tous connus.
+    """
+
+    def __init__(self, fingerprint: Tuple, max_rows: int = CACHE_MAX_ROWS):
+        self.fingerprint = fingerprint
+        self.max_rows = max_rows
+        self._by_key: Dict[Tuple[int, int], List[Dict]] = {}
+        self._timestamps: Dict[int, List[int]] = {}
+        # Pendant la lecture: lignes gardées par timestamp, tas des timestamps gardés
+        self._sizes: Dict[int, int] = {}
+        self._heap: List[int] = []
+        self._seen: Dict[int, set] = {}
+        self.row_count = 0
+        self.evicted_before: Optional[int] = None
+
+    @classmethod
+    def parse(cls, lines, fingerprint: Tuple, max_rows: int = CACHE_MAX_ROWS) -> 'AggregatedDataset':
+        dataset = cls(fingerprint, max_rows)
+        for line in lines:
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+                key = (data.get('resolution', 1), int(data['timestamp']))
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                logger.warning(f" Ligne JSON invalide: {line[:50]}...")
+                continue
+            # État de fusion incrémentale, inutile côté API
+            data.pop('state', None)
+            dataset._add(key, data)
+        dataset._finalize()
+        return dataset
+
+    def _add(self, key: Tuple[int, int], data: Dict):
+        resolution, timestamp = key
+        self._seen.setdefault(resolution, set()).add(timestamp)
+        if self.evicted_before is not None and timestamp < self.evicted_before:
+            return
+
+        self._by_key.setdefault(key, []).append(data)
+        if timestamp not in self._sizes:
+            self._sizes[timestamp] = 0
+            heapq.heappush(self._heap, timestamp)
+        self._sizes[timestamp] += 1
+        self.row_count += 1
+
+        while self.row_count > self.max_rows:
+            oldest = heapq.heappop(self._heap)
+            self.row_count -= self._sizes.pop(oldest)
+            for r in self._seen:
+                self._by_key.pop((r, oldest), None)
+            self.evicted_before = oldest + 1
+
+    def _finalize(self):
+        self._timestamps = {r: sorted(ts) for r, ts in self._seen.items()}
+        self._sizes, self._heap, self._seen = {}, [], {}
+
+    def rows(self, resolution: int, timestamp: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        Lignes d'un timestamp, None si elles ont été écartées du cache
+
+        Sans timestamp: lignes de toutes les fenêtres gardées (les plus
+        récentes si le cache est plein), sans relire HDFS
+        """
+        if timestamp is None:
+            result = []
+            for ts in self._timestamps.get(resolution, []):
+                result.extend(self._by_key.get((resolution, ts), ()))
+            return result
+        if self.evicted_before is not None and timestamp < self.evicted_before:
+            return None
+        return list(self._by_key.get((resolution, timestamp), []))
+
+    def rows_between(self, resolution: int, start: int, end: int) -> Optional[List[Dict]]:
+        """Lignes des timestamps de [start, end], None si une partie a été écartée"""
+        if self.evicted_before is not None and start < self.evicted_before:
+            return None
+        timestamps = self._timestamps.get(resolution, [])
+        result = []
+        for ts in timestamps[bisect.bisect_left(timestamps, start):bisect.bisect_right(timestamps, end)]:
+            result.extend(self._by_key[(resolution, ts)])
+        return result
+
+    def timestamps(self, resolution: int = 1) -> List[int]:
+        return self._timestamps.get(resolution, [])
+
+
+class TimestampIndex:
+    """Index des parts compactées: blocs (part, offset, longueur) par plage de timestamps"""
+
+    def __init__(self, document: Dict):
+        self.parts = {(p['name'], p['length']) for p in document['parts']}
+        self.blocks = sorted(document['blocks'], key=lambda b: b['ts_min'])
+        self._ends = [b['ts_max'] for b in self.blocks]
+
+    def matches(self, fingerprint: Tuple) -> bool:
+        """Vrai si l'index décrit exactement les parts listées"""
+        return self.parts == {(name, length) for name, length, _ in fingerprint}
+
+    def blocks_between(self, start: int, end: int) -> List[Dict]:
+        """Blocs pouvant contenir des timestamps de [start, end]"""
+        first = bisect.bisect_left(self._ends, start)
+        result = []
+        for block in self.blocks[first:]:
+            if block['ts_min'] > end:
+                break
+            result.append(block)
+        return result
+
+
+class AggregatedCache:
+    """Dernier AggregatedDataset lu, rechargé quand les parts changent"""
+
+    def __init__(self, check_interval: float = CACHE_CHECK_INTERVAL, max_rows: int = CACHE_MAX_ROWS):
+        self.check_interval = check_interval
+        self.max_rows = max_rows
+        self._dataset: Optional[AggregatedDataset] = None
+        self.index: Optional[TimestampIndex] = None
+        self._checked_at = 0.0
+        self._parts: Optional[Tuple] = None
+        self._parts_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def parts(self) -> Tuple:
+        """Empreinte des parts (list_aggregated_parts), relue au plus toutes les check_interval secondes"""
+        if self._parts is None or time.monotonic() - self._parts_checked_at >= self.check_interval:
+            self._parts = HDFSService.list_aggregated_parts()
+            self._parts_checked_at = time.monotonic()
+        return self._parts
+
+    def get(self) -> AggregatedDataset:
+        dataset = self._dataset
+        if dataset is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return dataset
+
+        # Un seul rechargement à la fois; les autres lecteurs attendent le résultat
+        with self._lock:
+            dataset = self._dataset
+            if dataset is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return dataset
+            fingerprint = HDFSService.list_aggregated_parts()
+            self._parts, self._parts_checked_at = fingerprint, time.monotonic()
+            if dataset is None or dataset.fingerprint != fingerprint:
+                started = time.monotonic()
+                lines = HDFSService.iter_hdfs_lines(f"{AGGREGATED_DIR}/part-*")
+                dataset = AggregatedDataset.parse(lines, fingerprint, self.max_rows)
+                logger.info(f" {dataset.row_count} résultats agrégés chargés depuis HDFS "
+                            f"({len(fingerprint)} parts, {time.monotonic() - started:.2f} s)")
+                self.index = HDFSService.load_timestamp_index(fingerprint)
+                self._dataset = dataset
+            self._checked_at = time.monotonic()
+            return dataset
+
+    def invalidate(self):
+        with self._lock:
+            self._dataset = None
+            self.index = None
+            self._parts = None
+            self._checked_at = 0.0
+
 class HDFSService:
     """Service pour interagir avec HDFS"""
     
@@ -18,11 +235,18 @@ class HDFSService:
         Lit un fichier HDFS et retourne son contenu
         
         Args:
-            hdfs_path: Chemin HDFS du fichier
+            hdfs_path: Chemin HDFS du fichier (motifs part-* acceptés)
             
         Returns:
             Contenu du fichier en string
         """
+        if HDFS_CLIENT != 'cli':
+            try:
+                return webhdfs.read_text(hdfs_path)
+            except WebHDFSError as e:
+                logger.error(f" Erreur lecture WebHDFS {hdfs_path}: {e}")
+                raise Exception(f"Impossible de lire {hdfs_path}")
+
         try:
             result = subprocess.run(
                 ['hdfs', 'dfs', '-cat', hdfs_path],
@@ -34,37 +258,266 @@ class HDFSService:
         except subprocess.CalledProcessError as e:
             logger.error(f" Erreur lecture HDFS {hdfs_path}: {e.stderr}")
             raise Exception(f"Impossible de lire {hdfs_path}")
+
+    @staticmethod
+    async def aread_hdfs_file(hdfs_path: str) -> str:
+        """
+        Variante asynchrone de read_hdfs_file (handlers FastAPI async)
+
+        Args:
+            hdfs_path: Chemin HDFS du fichier (motifs part-* acceptés)
+
+        Returns:
+            Contenu du fichier en string
+        """
+        if HDFS_CLIENT == 'cli':
+            return await asyncio.to_thread(HDFSService.read_hdfs_file, hdfs_path)
+        try:
+            return await webhdfs.aread_text(hdfs_path)
+        except WebHDFSError as e:
+            logger.error(f" Erreur lecture WebHDFS {hdfs_path}: {e}")
+            raise Exception(f"Impossible de lire {hdfs_path}")
     
     @staticmethod
-    def read_aggregated_data(timestamp: Optional[int] = None) -> List[Dict]:
+    def iter_hdfs_lines(hdfs_path: str) -> Iterator[str]:
+        """
+        Lit un fichier HDFS ligne par ligne, en flux (mémoire bornée)
+
+        Args:
+            hdfs_path: Chemin HDFS du fichier (motifs part-* acceptés)
+
+        Returns:
+            Générateur des lignes, sans fin de ligne
+        """
+        if HDFS_CLIENT != 'cli':
+            try:
+                yield from webhdfs.iter_lines(hdfs_path)
+            except WebHDFSError as e:
+                logger.error(f" Erreur lecture WebHDFS {hdfs_path}: {e}")
+                raise Exception(f"Impossible de lire {hdfs_path}")
+            return
+
+        proc = subprocess.Popen(
+            ['hdfs', 'dfs', '-cat', hdfs_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        complete = False
+        try:
+            for line in proc.stdout:
+                yield line.rstrip('\n')
+            complete = True
+        finally:
+            # Lecture abandonnée par l'appelant: inutile de laisser tourner la JVM
+            if not complete:
+                proc.kill()
+            proc.stdout.close()
+            stderr = proc.stderr.read()
+            proc.stderr.close()
+            proc.wait()
+        if proc.returncode != 0:
+            logger.error(f" Erreur lecture HDFS {hdfs_path}: {stderr}")
+            raise Exception(f"Impossible de lire {hdfs_path}")
+
+    @staticmethod
+    def list_aggregated_parts() -> Tuple:
+        """
+        Empreinte des parts agrégées (nom, taille, date de modification),
+        obtenue par un simple listing du répertoire
+
+        Returns:
+            Tuple trié de (nom, taille, modification)
+        """
+        pattern = f"{AGGREGATED_DIR}/part-*"
+        if HDFS_CLIENT != 'cli':
+            statuses = webhdfs.glob_status(pattern)
+            return tuple((s['pathSuffix'], s['length'], s['modificationTime']) for s in statuses)
+
+        result = subprocess.run(
+            ['hdfs', 'dfs', '-stat', '%n %b %Y', pattern],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        parts = []
+        for line in result.stdout.strip().split('\n'):
+            if line:
+                name, size, mtime = line.rsplit(' ', 2)
+                parts.append((name, int(size), int(mtime)))
+        return tuple(sorted(parts))
+
+    @staticmethod
+    def local_store_current() -> bool:
+        """Vrai si la copie SQLite locale existe et a les parts actuelles de HDFS"""
+        if not local_store.available():
+            return False
+        if local_store.matches(_aggregated_cache.parts()):
+            return True
+        logger.info(" Copie locale en retard sur HDFS: lecture depuis HDFS")
+        return False
+
+    @staticmethod
+    def load_timestamp_index(fingerprint: Tuple) -> Optional[TimestampIndex]:
+        """
+        Index des timestamps des parts compactées
+
+        Args:
+            fingerprint: parts actuelles (list_aggregated_parts)
+
+        Returns:
+            Index, ou None s'il est absent, illisible ou périmé
+        """
+        if HDFS_CLIENT == 'cli':
+            # Lectures par plage d'octets impossibles avec hdfs dfs -cat
+            return None
+        try:
+            index = TimestampIndex(json.loads(webhdfs.read(AGGREGATED_INDEX)))
+        except WebHDFSError as e:
+            if e.status != 404:
+                logger.warning(f" Index des timestamps illisible: {e}")
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f" Index des timestamps invalide: {e}")
+            return None
+        if not index.matches(fingerprint):
+            logger.info(" Index des timestamps périmé (parts réécrites depuis la compaction)")
+            return None
+        return index
+
+    @staticmethod
+    def _iter_aggregated_lines(start: Optional[int] = None, end: Optional[int] = None,
+                               index: Optional[TimestampIndex] = None) -> Iterator[str]:
+        """Lignes des parts agrégées; seulement les blocs de [start, end] si l'index le permet"""
+        if (start is not None or end is not None) and HDFS_CLIENT != 'cli':
+            if index is None:
+                index = HDFSService.load_timestamp_index(HDFSService.list_aggregated_parts())
+            if index is not None:
+                low = start if start is not None else float('-inf')
+                high = end if end is not None else float('inf')
+                # Blocs contigus d'une même part lus en une seule requête
+                ranges = []
+                for block in index.blocks_between(low, high):
+                    last = ranges[-1] if ranges else None
+                    if last and last[0] == block['part'] and last[1] + last[2] == block['offset']:
+                        last[2] += block['length']
+                    else:
+                        ranges.append([block['part'], block['offset'], block['length']])
+                for part, offset, length in ranges:
+                    yield from webhdfs.iter_lines(f"{AGGREGATED_DIR}/{part}", offset, length)
+                return
+        yield from HDFSService.iter_hdfs_lines(f"{AGGREGATED_DIR}/part-*")
+
+    @staticmethod
+    def iter_aggregated_data(filters: Optional[Dict[str, Any]] = None,
+                             projection: Optional[Iterable[str]] = None,
+                             resolution: Optional[int] = 1,
+                             start: Optional[int] = None,
+                             end: Optional[int] = None,
+                             index: Optional[TimestampIndex] = None) -> Iterator[Dict]:
+        """
+        Parcourt les données agrégées en flux, sans cache ni liste intermédiaire
+        (exports historiques, traitements par lots)
+
+        Args:
+            filters: égalités sur les champs ({'zone': 'Maarif'}), chemins
+                pointés acceptés ({'stats.vehicle_count': 3})
+            projection: champs à garder (['zone', 'timestamp', 'stats.avg_co2']),
+                tout l'enregistrement si None
+            resolution: Résolution en secondes (None = toutes)
+            start: premier timestamp (inclus, optionnel)
+            end: dernier timestamp (inclus, optionnel)
+            index: index des timestamps déjà chargé (optionnel)
+
+        Returns:
+            Générateur des enregistrements (nouveaux dicts, modifiables)
+        """
+        filters = dict(filters or {})
+        # Présélection sur le texte brut: une valeur chaîne filtrée doit y apparaître
+        needles = [json.dumps(v) for v in filters.values() if isinstance(v, str)]
+        fields = [(k.split('.'), v) for k, v in filters.items()]
+        projection = [p.split('.') for p in projection] if projection else None
+
+        for line in HDFSService._iter_aggregated_lines(start, end, index):
+            if not line or any(needle not in line for needle in needles):
+                continue
+            try:
+                data = json.loads(line)
+                timestamp = data['timestamp']
+            except (json.JSONDecodeError, KeyError, TypeError):
+                logger.warning(f" Ligne JSON invalide: {line[:50]}...")
+                continue
+            # Les sorties antérieures aux rollups n'ont pas de résolution
+            if resolution is not None and data.get('resolution', 1) != resolution:
+                continue
+            if (start is not None and timestamp < start) or (end is not None and timestamp > end):
+                continue
+            if any(_get_path(data, path) != value for path, value in fields):
+                continue
+            # État de fusion incrémentale, inutile côté API
+            data.pop('state', None)
+            yield _project(data, projection) if projection else data
+
+    @staticmethod
+    def read_aggregated_range(start: int, end: int, resolution: int = 1) -> List[Dict]:
+        """
+        Lit les données agrégées des timestamps de [start, end]
+
+        Servi par la copie SQLite locale si hdfs_sync.py l'alimente et
+        qu'elle a les mêmes parts (nom, taille) que HDFS, sinon par le
+        cache; pour les fenêtres écartées du cache, lecture des seuls
+        blocs de l'index (parts compactées), sinon de toutes les parts
+
+        Args:
+            start: premier timestamp (inclus)
+            end: dernier timestamp (inclus)
+            resolution: Résolution en secondes
+
+        Returns:
+            Liste des statistiques par zone, triée par timestamp
+        """
+        try:
+            if HDFSService.local_store_current():
+                return local_store.query_range(start, end, resolution)
+
+            cache = _aggregated_cache
+            results = cache.get().rows_between(resolution, start, end)
+            if results is not None:
+                return results
+
+            index = cache.index
+            results = list(HDFSService.iter_aggregated_data(
+                resolution=resolution, start=start, end=end, index=index))
+            source = "par l'index" if index is not None else "depuis HDFS (hors cache)"
+            logger.info(f" {len(results)} résultats lus {source} ({start}-{end})")
+            results.sort(key=lambda d: d.get('timestamp', 0))
+            return results
+
+        except Exception as e:
+            logger.error(f" Erreur lecture données agrégées: {e}")
+            return []
+
+    @staticmethod
+    def read_aggregated_data(timestamp: Optional[int] = None, resolution: int = 1) -> List[Dict]:
         """
-        Lit les données agrégées par zone depuis HDFS
+        Lit les données agrégées par zone (cache en mémoire, relu
+        uniquement quand les parts HDFS changent)
         
         Args:
             timestamp: Timestamp spécifique (optionnel)
+            resolution: Résolution en secondes (1 = seconde SUMO,
+                60/300/3600 = rollups, timestamp = début de fenêtre)
             
         Returns:
-            Liste des statistiques par zone
+            Liste des statistiques par zone (dicts partagés, à ne pas modifier);
+            sans timestamp, fenêtres gardées en cache seulement (les plus
+            récentes au-delà de HDFS_CACHE_MAX_ROWS lignes)
         """
         try:
-            # Lire tous les fichiers résultats du MapReduce
-            hdfs_path = "/urban_data/aggregated/part-*"
-            content = HDFSService.read_hdfs_file(hdfs_path)
-            
-            # Parser les lignes JSON
-            results = []
-            for line in content.strip().split('\n'):
-                if line:
-                    try:
-                        data = json.loads(line)
-                        # Filtrer par timestamp si spécifié
-                        if timestamp is None or data.get('timestamp') == timestamp:
-                            results.append(data)
-                    except json.JSONDecodeError:
-                        logger.warning(f" Ligne JSON invalide: {line[:50]}...")
-                        continue
-            
-            logger.info(f" {len(results)} résultats lus depuis HDFS")
+            results = _aggregated_cache.get().rows(resolution, timestamp)
+            if results is None:
+                # Fenêtre écartée du cache: blocs de l'index ou parts HDFS
+                return HDFSService.read_aggregated_range(timestamp, timestamp, resolution)
             return results
             
         except Exception as e:
@@ -72,7 +525,7 @@ class HDFSService:
             return []
     
     @staticmethod
-    def get_available_timestamps() -> List[int]:
+    def get_available_timestamps(resolution: int = 1) -> List[int]:
         """
         Récupère la liste de tous les timestamps disponibles
         
@@ -80,28 +533,47 @@ class HDFSService:
             Liste triée des timestamps
         """
         try:
-            data = HDFSService.read_aggregated_data()
-            timestamps = sorted(set(d.get('timestamp', 0) for d in data))
-            return timestamps
+            return list(_aggregated_cache.get().timestamps(resolution))
         except Exception as e:
             logger.error(f" Erreur récupération timestamps: {e}")
             return []
     
+    @staticmethod
+    def has_resolution(resolution: int) -> bool:
+        """
+        Vrai si des résultats existent à cette résolution, d'après la source
+        qui servira la plage (copie locale à jour, sinon cache)
+        """
+        try:
+            if HDFSService.local_store_current():
+                return local_store.has_resolution(resolution)
+            return bool(_aggregated_cache.get().timestamps(resolution))
+        except Exception as e:
+            logger.error(f" Erreur récupération timestamps: {e}")
+            return False
+
     @staticmethod
     def get_latest_timestamp() -> int:
         """
-        Récupère le timestamp le plus récent
+        Récupère le timestamp le plus récent (copie locale à jour, sinon cache)
         
         Returns:
             Timestamp le plus récent
         """
-        timestamps = HDFSService.get_available_timestamps()
+        try:
+            if HDFSService.local_store_current():
+                return local_store.latest_timestamp() or 0
+            timestamps = _aggregated_cache.get().timestamps()
+        except Exception as e:
+            logger.error(f" Erreur récupération timestamps: {e}")
+            return 0
         return timestamps[-1] if timestamps else 0
     
     @staticmethod
     def get_zone_stats_by_timestamp(timestamp: int) -> Dict[str, Dict]:
         """
         Récupère les stats de toutes les zones pour un timestamp donné
+        (copie locale à jour, sinon cache)
         
         Args:
             timestamp: Le timestamp
@@ -109,6 +581,11 @@ class HDFSService:
         Returns:
             Dict avec zone comme clé et stats comme valeur
         """
+        try:
+            if HDFSService.local_store_current():
+                return local_store.zone_stats(timestamp)
+        except Exception as e:
+            logger.error(f" Erreur lecture de la copie locale: {e}")
         data = HDFSService.read_aggregated_data(timestamp)
         
         # Réorganiser par zone
@@ -120,5 +597,60 @@ class HDFSService:
         
         return zone_stats
 
-# Instance globale
+    @staticmethod
+    def read_alerts(zone: Optional[str] = None, status: Optional[str] = None) -> List[Dict]:
+        """
+        Lit les épisodes d'alerte produits par alert_detector.py
+
+        Args:
+            zone: Zone spécifique (optionnel)
+            status: "active" ou "resolved" (optionnel)
+
+        Returns:
+            Liste des épisodes, les plus récents d'abord
+        """
+        try:
+            alerts = []
+            for line in HDFSService.iter_hdfs_lines("/urban_data/alerts/part-*"):
+                if not line:
+                    continue
+                try:
+                    alert = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f" Ligne JSON invalide: {line[:50]}...")
+                    continue
+                if zone is not None and alert.get('zone') != zone:
+                    continue
+                if status is not None and alert.get('status') != status:
+                    continue
+                alerts.append(alert)
+
+            alerts.sort(key=lambda a: a.get('end', 0), reverse=True)
+            logger.info(f" {len(alerts)} alertes lues depuis HDFS")
+            return alerts
+
+        except Exception as e:
+            logger.error(f" Erreur lecture alertes: {e}")
+            return []
+
+    @staticmethod
+    def read_analytics() -> Optional[Dict]:
+        """
+        Lit le cube analytique précalculé par stats_aggregator.py
+
+        Returns:
+            Document AnalyticsData (None s'il n'a pas encore été calculé)
+        """
+        try:
+            content = HDFSService.read_hdfs_file("/urban_data/analytics/part-*")
+            for line in content.strip().split('\n'):
+                if line:
+                    return json.loads(line)
+            return None
+        except Exception as e:
+            logger.error(f" Erreur lecture analytics: {e}")
+            return None
+
+# Instances globales
+_aggregated_cache = AggregatedCache()
 hdfs_service = HDFSService()
\ No newline at end of file
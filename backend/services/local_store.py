@@ -0,0 +1,153 @@
+"""
+Copie locale (SQLite) des résultats agrégés, alimentée par hadoop/scripts/hdfs_sync.py
+
+Les requêtes par plage de temps et par zone sont servies depuis un
+fichier SQLite indexé sur (zone, timestamp) et (resolution, timestamp),
+sans aller sur HDFS. La table `parts` garde, pour chaque part-* copiée,
+sa taille, sa somme de contrôle et sa date de modification HDFS: la
+synchronisation ne recopie que les parts nouvelles ou modifiées, et
+l'API ne sert la copie que si ces parts sont encore celles de HDFS
+(matches: nom, taille et date, une part réécrite sous le même nom et à
+la même taille est donc détectée).
+
+Base: LOCAL_STORE_PATH (backend/data/aggregated.db par défaut), en mode
+WAL pour que l'API lise pendant une synchronisation.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCAL_STORE_PATH = os.environ.get(
+    'LOCAL_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'aggregated.db')
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parts (
+    name TEXT PRIMARY KEY,
+    length INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    mtime INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS aggregated (
+    part TEXT NOT NULL,
+    zone TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    stats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_aggregated_zone_ts ON aggregated (zone, timestamp);
+CREATE INDEX IF NOT EXISTS idx_aggregated_res_ts ON aggregated (resolution, timestamp);
+CREATE INDEX IF NOT EXISTS idx_aggregated_part ON aggregated (part);
+"""
+
+
+def connect(path: str = LOCAL_STORE_PATH) -> sqlite3.Connection:
+    """
+    Connexion en écriture (synchronisation), schéma créé si besoin
+
+    Args:
+        path: fichier SQLite
+
+    Returns:
+        Connexion SQLite
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    # Bases créées avant la colonne mtime: parts considérées comme périmées
+    # jusqu'à la prochaine synchronisation
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(parts)")}
+    if 'mtime' not in columns:
+        conn.execute("ALTER TABLE parts ADD COLUMN mtime INTEGER NOT NULL DEFAULT 0")
+    return conn
+
+
+def _row_to_record(row) -> Dict:
+    zone, timestamp, resolution, stats = row
+    return {'zone': zone, 'timestamp': timestamp, 'resolution': resolution, 'stats': json.loads(stats)}
+
+
+class LocalStore:
+    """Requêtes en lecture seule sur la copie locale"""
+
+    def __init__(self, path: str = LOCAL_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def available(self) -> bool:
+        """Vrai si une synchronisation a déjà alimenté la base"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            return self._connection().execute("SELECT 1 FROM parts LIMIT 1").fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread (les routes sync tournent dans un pool de threads)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def query_range(self, start: int, end: int, resolution: int = 1,
+                    zone: Optional[str] = None) -> List[Dict]:
+        """
+        Résultats des timestamps de [start, end]
+
+        Args:
+            start: premier timestamp (inclus)
+            end: dernier timestamp (inclus)
+            resolution: Résolution en secondes
+            zone: Zone spécifique (optionnel)
+
+        Returns:
+            Enregistrements {zone, timestamp, resolution, stats}, triés par timestamp
+        """
+        if zone is None:
+            rows = self._connection().execute(
+                "SELECT zone, timestamp, resolution, stats FROM aggregated "
+                "WHERE resolution = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp, zone",
+                (resolution, start, end))
+        else:
+            rows = self._connection().execute(
+                "SELECT zone, timestamp, resolution, stats FROM aggregated "
+                "WHERE zone = ? AND timestamp BETWEEN ? AND ? AND resolution = ? ORDER BY timestamp",
+                (zone, start, end, resolution))
+        return [_row_to_record(row) for row in rows]
+
+    def latest_timestamp(self, resolution: int = 1) -> Optional[int]:
+        row = self._connection().execute(
+            "SELECT MAX(timestamp) FROM aggregated WHERE resolution = ?", (resolution,)).fetchone()
+        return row[0] if row else None
+
+    def has_resolution(self, resolution: int) -> bool:
+        """Vrai si la copie contient des résultats à cette résolution"""
+        row = self._connection().execute(
+            "SELECT 1 FROM aggregated WHERE resolution = ? LIMIT 1", (resolution,)).fetchone()
+        return row is not None
+
+    def zone_stats(self, timestamp: int, resolution: int = 1) -> Dict[str, Dict]:
+        """Stats de toutes les zones pour un timestamp (zone -> stats)"""
+        return {r['zone']: r['stats'] for r in self.query_range(timestamp, timestamp, resolution)}
+
+    def matches(self, fingerprint: Tuple) -> bool:
+        """Vrai si les parts copiées sont exactement les parts listées (nom, taille, modification)"""
+        rows = self._connection().execute("SELECT name, length, mtime FROM parts")
+        return set(rows) == set(fingerprint)
+
+
+# Instance globale
+local_store = LocalStore()
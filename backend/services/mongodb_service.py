@@ -0,0 +1,350 @@
+"""
+Agrégations zone/temps exécutées dans MongoDB (collections gps/emissions)
+
+Au lieu de rapatrier les documents bruts en Python, les statistiques
+par zone et par fenêtre de temps sont calculées par des pipelines
+d'agrégation:
+
+    $match    plage de timestamps (index (timestamp, vehicule_id)),
+              filtres GPS de mapper_clean.py et, pour une zone, boîte
+              englobante de la zone
+    $lookup   émissions du même (vehicule_id, timestamp) pour les GPS qui
+              ne les embarquent pas (index (vehicule_id, timestamp) de
+              emissions); les GPS sans émissions sont écartés, comme par
+              la jointure du job Hadoop
+    $project  zone du véhicule
+    $group    moyennes par (zone, début de fenêtre)
+    $bucket   histogramme des vitesses
+
+Les zones sont celles du job d'agrégation (zone_index.ZONES, même ordre
+de priorité), ou les polygones de ZONES_GEOJSON s'il est défini (même
+fichier que celui livré au job): la zone est alors calculée par
+$function (JavaScript serveur, test pair/impair de zone_index.py).
+
+Les index composés (timestamp, vehicule_id) et (vehicule_id, timestamp)
+sont créés au démarrage de l'API (ensure_indexes, idempotent). explain()
+renvoie le plan gagnant d'un pipeline pour vérifier qu'il passe par un
+index (IXSCAN) et non par un parcours complet (COLLSCAN).
+"""
+
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+
+# Modules du job d'agrégation (zones, filtres de nettoyage)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hadoop', 'mapreduce'))
+
+from mapper_clean import MAX_COORD, MAX_SPEED_KMH, MIN_COORD
+from zone_index import DEFAULT_ZONE, ZONES, load_geojson_zones
+
+logger = logging.getLogger(__name__)
+
+ZONES_GEOJSON = os.environ.get('ZONES_GEOJSON')
+
+
+def load_zone_shapes(geojson: Optional[str] = ZONES_GEOJSON) -> List:
+    """
+    Zones (nom, boîte englobante, anneaux), dans l'ordre de priorité
+
+    Returns:
+        Polygones du GeoJSON si fourni (anneaux), sinon rectangles de
+        zone_index.ZONES (anneaux à None)
+    """
+    if not geojson:
+        return [(name, bounds, None) for name, bounds in ZONES]
+    shapes = []
+    for name, rings in load_geojson_zones(geojson):
+        xs = [p[0] for ring in rings for p in ring]
+        ys = [p[1] for ring in rings for p in ring]
+        bounds = {'x_min': min(xs), 'x_max': max(xs), 'y_min': min(ys), 'y_max': max(ys)}
+        shapes.append((name, bounds, [[list(p) for p in ring] for ring in rings]))
+    return shapes
+
+
+ZONE_SHAPES = load_zone_shapes()
+
+# Test pair/impair de zone_index._point_in_rings, première zone qui contient le point
+POINT_IN_ZONES_JS = """function(x, y, zones, fallback) {
+    for (var i = 0; i < zones.length; i++) {
+        var rings = zones[i][1], inside = false;
+        for (var r = 0; r < rings.length; r++) {
+            var ring = rings[r], n = ring.length;
+            for (var k = 0, j = n - 1; k < n; j = k++) {
+                var x1 = ring[j][0], y1 = ring[j][1], x2 = ring[k][0], y2 = ring[k][1];
+                if ((y1 > y) != (y2 > y) && x < (x2 - x1) * (y - y1) / (y2 - y1) + x1) {
+                    inside = !inside;
+                }
+            }
+        }
+        if (inside) return zones[i][0];
+    }
+    return fallback;
+}"""
+
+# Index créés au démarrage, par collection
+INDEXES = {
+    collection: [
+        IndexModel([('timestamp', ASCENDING), ('vehicule_id', ASCENDING)], name='timestamp_vehicule_id'),
+        IndexModel([('vehicule_id', ASCENDING), ('timestamp', ASCENDING)], name='vehicule_id_timestamp'),
+    ]
+    for collection in ('gps', 'emissions')
+}
+
+# Vitesse estimée comme dans mapper_aggregate_zone.py: min(fuel * 0.1, 100),
+# 0 sans consommation
+ESTIMATED_SPEED = {'$cond': [
+    {'$gt': ['$emissions.fuel', 0]},
+    {'$min': [{'$multiply': ['$emissions.fuel', 0.1]}, 100]},
+    0,
+]}
+
+# Valeurs moyennées par fenêtre (clé de stats -> expression sur le GPS joint à ses émissions)
+AVERAGED_FIELDS = {
+    'avg_speed_kmh': ESTIMATED_SPEED,
+    'avg_co2': '$emissions.co2',
+    'avg_co': '$emissions.co',
+    'avg_nox': '$emissions.nox',
+    'avg_pmx': '$emissions.pmx',
+    'avg_noise_db': '$emissions.noise',
+}
+
+SPEED_BOUNDARIES = [0, 15, 30, 50, 70, 90, 130]
+
+
+def zone_expression() -> Dict:
+    """Expression donnant la zone d'un document gps (position.x/y)"""
+    if any(rings is not None for _, _, rings in ZONE_SHAPES):
+        return {'$function': {
+            'body': POINT_IN_ZONES_JS,
+            'args': ['$position.x', '$position.y',
+                     [[name, rings] for name, _, rings in ZONE_SHAPES], DEFAULT_ZONE],
+            'lang': 'js',
+        }}
+
+    branches = []
+    for name, bounds, _ in ZONE_SHAPES:
+        branches.append({
+            'case': {'$and': [
+                {'$gte': ['$position.x', bounds['x_min']]},
+                {'$lte': ['$position.x', bounds['x_max']]},
+                {'$gte': ['$position.y', bounds['y_min']]},
+                {'$lte': ['$position.y', bounds['y_max']]},
+            ]},
+            'then': name,
+        })
+    return {'$switch': {'branches': branches, 'default': DEFAULT_ZONE}}
+
+
+def match_stage(start: int, end: int, zone: Optional[str] = None) -> Dict:
+    """
+    $match sur la plage de timestamps, les filtres GPS de mapper_clean.py
+    et la boîte englobante de la zone si demandée
+
+    Raises:
+        ValueError: zone inconnue
+    """
+    query: Dict[str, Any] = {
+        'timestamp': {'$gte': start, '$lte': end},
+        'speed': {'$gte': 0, '$lte': MAX_SPEED_KMH},
+        'position.x': {'$gte': MIN_COORD, '$lte': MAX_COORD},
+        'position.y': {'$gte': MIN_COORD, '$lte': MAX_COORD},
+    }
+    if zone is not None and zone != DEFAULT_ZONE:
+        bounds = {name: b for name, b, _ in ZONE_SHAPES}.get(zone)
+        if bounds is None:
+            raise ValueError(f"Zone inconnue: {zone}")
+        query['position.x'] = {'$gte': max(bounds['x_min'], MIN_COORD), '$lte': min(bounds['x_max'], MAX_COORD)}
+        query['position.y'] = {'$gte': max(bounds['y_min'], MIN_COORD), '$lte': min(bounds['y_max'], MAX_COORD)}
+    return {'$match': query}
+
+
+def emissions_lookup() -> List[Dict]:
+    """Émissions jointes par (vehicule_id, timestamp) si le GPS ne les embarque pas"""
+    return [
+        {'$lookup': {
+            'from': 'emissions',
+            'let': {'vehicule_id': '$vehicule_id', 'timestamp': '$timestamp'},
+            'pipeline': [
+                {'$match': {'$expr': {'$and': [
+                    {'$eq': ['$vehicule_id', '$$vehicule_id']},
+                    {'$eq': ['$timestamp', '$$timestamp']},
+                ]}}},
+                {'$limit': 1},
+                {'$project': {'_id': 0, 'emissions': 1}},
+            ],
+            'as': 'joined',
+        }},
+        {'$set': {'emissions': {'$ifNull': ['$emissions', {'$first': '$joined.emissions'}]}}},
+        {'$match': {'emissions': {'$type': 'object'}}},
+    ]
+
+
+def _with_zone(start: int, end: int, zone: Optional[str], fields: Dict[str, Any],
+               join_emissions: bool = False) -> List[Dict]:
+    """$match (+ jointure des émissions) + $project de la zone, puis filtre exact sur la zone"""
+    stages = [match_stage(start, end, zone)]
+    if join_emissions:
+        stages += emissions_lookup()
+    stages.append({'$project': dict(fields, zone=zone_expression())})
+    if zone is not None:
+        stages.append({'$match': {'zone': zone}})
+    return stages
+
+
+def zone_stats_pipeline(start: int, end: int, resolution: int = 60,
+                        zone: Optional[str] = None) -> List[Dict]:
+    """
+    Pipeline des moyennes par zone et fenêtre de `resolution` secondes
+
+    Args:
+        start: premier timestamp (inclus)
+        end: dernier timestamp (inclus)
+        resolution: taille des fenêtres en secondes
+        zone: Zone spécifique (optionnel)
+
+    Returns:
+        Étapes d'agrégation sur la collection gps
+    """
+    fields = {'timestamp': 1, 'emissions': 1}
+    group = {
+        '_id': {'zone': '$zone', 'window': {'$subtract': ['$timestamp', {'$mod': ['$timestamp', resolution]}]}},
+        'vehicle_count': {'$sum': 1},
+    }
+    group.update({key: {'$avg': field} for key, field in AVERAGED_FIELDS.items()})
+
+    stats = {'vehicle_count': '$vehicle_count'}
+    stats.update({key: {'$round': [f"${key}", 2]} for key in AVERAGED_FIELDS})
+
+    return _with_zone(start, end, zone, fields, join_emissions=True) + [
+        {'$group': group},
+        {'$sort': {'_id.window': 1, '_id.zone': 1}},
+        {'$project': {
+            '_id': 0,
+            'zone': '$_id.zone',
+            'timestamp': '$_id.window',
+            'resolution': {'$literal': resolution},
+            'stats': stats,
+        }},
+    ]
+
+
+def speed_histogram_pipeline(start: int, end: int, boundaries: List[float] = SPEED_BOUNDARIES,
+                             zone: Optional[str] = None) -> List[Dict]:
+    """
+    Pipeline de l'histogramme des vitesses ($bucket)
+
+    Returns:
+        Étapes d'agrégation sur la collection gps
+    """
+    return _with_zone(start, end, zone, {'speed': 1}) + [
+        {'$bucket': {
+            'groupBy': '$speed',
+            'boundaries': boundaries,
+            'default': 'hors_bornes',
+            'output': {'count': {'$sum': 1}},
+        }},
+    ]
+
+
+class MongoDBService:
+    """Agrégations MongoDB (base motor passée par l'appelant: database.mongodb.db)"""
+
+    @staticmethod
+    async def ensure_indexes(db) -> List[str]:
+        """
+        Crée les index composés s'ils n'existent pas (sans effet sinon)
+
+        Returns:
+            Noms des index garantis
+        """
+        names = []
+        for collection, indexes in INDEXES.items():
+            names += await db[collection].create_indexes(indexes)
+        logger.info(f" Index MongoDB: {', '.join(sorted(set(names)))}")
+        return names
+
+    @staticmethod
+    async def aggregate(db, collection: str, pipeline: List[Dict]) -> List[Dict]:
+        cursor = db[collection].aggregate(pipeline, allowDiskUse=True)
+        return await cursor.to_list(length=None)
+
+    @staticmethod
+    async def get_zone_stats(db, start: int, end: int, resolution: int = 60,
+                             zone: Optional[str] = None) -> List[Dict]:
+        """
+        Moyennes par zone et fenêtre, calculées par MongoDB
+
+        Args:
+            db: base motor
+            start: premier timestamp (inclus)
+            end: dernier timestamp (inclus)
+            resolution: taille des fenêtres en secondes
+            zone: Zone spécifique (optionnel)
+
+        Returns:
+            Enregistrements {zone, timestamp, resolution, stats} triés par
+            timestamp (même forme que hdfs_service.read_aggregated_range)
+
+        Raises:
+            ValueError: zone inconnue
+        """
+        pipeline = zone_stats_pipeline(start, end, resolution, zone)
+        try:
+            return await MongoDBService.aggregate(db, 'gps', pipeline)
+        except Exception as e:
+            logger.error(f" Erreur agrégation MongoDB: {e}")
+            return []
+
+    @staticmethod
+    async def get_speed_histogram(db, start: int, end: int, boundaries: List[float] = SPEED_BOUNDARIES,
+                                  zone: Optional[str] = None) -> List[Dict]:
+        """
+        Répartition des vitesses GPS (champ speed) entre `boundaries`
+
+        Returns:
+            Buckets {_id: borne basse (ou 'hors_bornes'), count}
+        """
+        pipeline = speed_histogram_pipeline(start, end, boundaries, zone)
+        try:
+            return await MongoDBService.aggregate(db, 'gps', pipeline)
+        except Exception as e:
+            logger.error(f" Erreur agrégation MongoDB: {e}")
+            return []
+
+    @staticmethod
+    async def explain(db, collection: str, pipeline: List[Dict]) -> Dict:
+        """
+        Plan d'exécution d'un pipeline (commande explain, verbosité queryPlanner)
+
+        Returns:
+            Réponse brute de MongoDB (voir winning_stages)
+        """
+        return await db.command({
+            'explain': {'aggregate': collection, 'pipeline': pipeline, 'cursor': {}},
+            'verbosity': 'queryPlanner',
+        })
+
+    @staticmethod
+    def winning_stages(explain_result: Dict) -> List[str]:
+        """Étapes du plan gagnant (ex. ['FETCH', 'IXSCAN']; 'COLLSCAN' = pas d'index)"""
+        planner = explain_result.get('queryPlanner')
+        if planner is None:
+            # Pipeline: le plan de la requête est dans la première étape ($cursor)
+            for stage in explain_result.get('stages', []):
+                if '$cursor' in stage:
+                    planner = stage['$cursor'].get('queryPlanner')
+                    break
+        stages = []
+        plan = (planner or {}).get('winningPlan', {})
+        plan = plan.get('queryPlan', plan)
+        while plan:
+            stages.append(plan.get('stage'))
+            plan = plan.get('inputStage')
+        return stages
+
+
+# Instance globale
+mongodb_service = MongoDBService()
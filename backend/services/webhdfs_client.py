@@ -0,0 +1,358 @@
+"""
+Client WebHDFS (API REST du NameNode) avec pool de connexions keep-alive
+
+Remplace `hdfs dfs -cat`, qui démarre une JVM à chaque lecture:
+- une connexion HTTP persistante par hôte (NameNode et DataNodes),
+  réutilisée d'une requête à l'autre
+- OPEN suit la redirection 307 du NameNode vers le DataNode
+- lectures en flux (blocs ou lignes), sans charger le fichier en mémoire
+- motifs `part-*` résolus par LISTSTATUS + fnmatch
+- variantes async (asyncio.to_thread) et lectures parallèles des parts
+"""
+
+import asyncio
+import fnmatch
+import http.client
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Mêmes valeurs par défaut que api/config.py (surchargeables par l'environnement)
+HDFS_URL = os.environ.get('HDFS_URL', 'http://localhost:9870')
+HDFS_USER = os.environ.get('HDFS_USER', 'hadoop')
+
+CHUNK_SIZE = 64 * 1024
+POOL_SIZE = 8           # connexions inactives conservées par hôte
+MAX_PARALLEL_READS = 8
+MAX_REDIRECTS = 3
+
+# Erreurs de transport: la connexion concernée est fermée, jamais rendue au pool
+TRANSPORT_ERRORS = (OSError, http.client.HTTPException)
+
+
+def has_magic(pattern: str) -> bool:
+    """Vrai si le chemin contient un joker (*, ?, [)"""
+    return any(c in pattern for c in '*?[')
+
+
+class WebHDFSError(Exception):
+    """Erreur renvoyée par WebHDFS (RemoteException) ou réseau"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """Connexions HTTP inactives, par hôte (scheme, netloc)"""
+
+    def __init__(self, size: int = POOL_SIZE, timeout: float = 30.0):
+        self.size = size
+        self.timeout = timeout
+        self._idle: Dict[tuple, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def connect(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        """Nouvelle connexion vers l'hôte"""
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout)
+
+    def acquire(self, scheme: str, netloc: str):
+        """Connexion inactive de l'hôte (reused=True), ou nouvelle connexion"""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        return self.connect(scheme, netloc), False
+
+    def release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection):
+        """Rend une connexion dont la réponse a été entièrement lue"""
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+class WebHDFSClient:
+    """Client WebHDFS synchrone et asynchrone"""
+
+    def __init__(self, base_url: str = HDFS_URL, user: str = HDFS_USER,
+                 pool_size: int = POOL_SIZE, timeout: float = 30.0):
+        """
+        Args:
+            base_url: URL HTTP du NameNode (settings.HDFS_URL)
+            user: utilisateur HDFS (user.name)
+            pool_size: connexions inactives conservées par hôte
+            timeout: délai réseau en secondes
+        """
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.netloc = parts.netloc
+        self.user = user
+        self.pool = ConnectionPool(pool_size, timeout)
+
+    # ============ Transport ============
+
+    def _url(self, path: str, op: str, **params) -> str:
+        query = {'op': op, 'user.name': self.user}
+        query.update({k: v for k, v in params.items() if v is not None})
+        return f"/webhdfs/v1{path}?{urlencode(query)}"
+
+    def _send(self, scheme: str, netloc: str, method: str, url: str):
+        """Requête sur une connexion du pool; une reprise si la connexion réutilisée était fermée"""
+        conn, reused = self.pool.acquire(scheme, netloc)
+        try:
+            conn.request(method, url)
+            return conn, conn.getresponse()
+        except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                ConnectionResetError, BrokenPipeError):
+            conn.close()
+            if not reused:
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        # Connexion keep-alive fermée par le serveur entre deux requêtes
+        conn = self.pool.connect(scheme, netloc)
+        try:
+            conn.request(method, url)
+            return conn, conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+
+    def _open_response(self, method: str, url: str):
+        """
+        Envoie la requête en suivant les redirections (OPEN -> DataNode)
+
+        Returns:
+            (scheme, netloc, connexion, réponse) dont le corps reste à lire
+
+        Raises:
+            WebHDFSError: erreur HTTP (status) ou de transport (status None)
+        """
+        scheme, netloc = self.scheme, self.netloc
+        for _ in range(MAX_REDIRECTS + 1):
+            try:
+                conn, response = self._send(scheme, netloc, method, url)
+            except TRANSPORT_ERRORS as e:
+                raise WebHDFSError(f"WebHDFS injoignable ({netloc}): {e}")
+
+            if response.status in (301, 302, 303, 307, 308) or response.status >= 400:
+                body = self._read_body(conn, response, netloc)
+                self.pool.release(scheme, netloc, conn)
+                if response.status >= 400:
+                    raise WebHDFSError(self._remote_message(body, response.status), response.status)
+                location = urlsplit(response.getheader('Location', ''))
+                scheme = location.scheme or scheme
+                netloc = location.netloc or netloc
+                url = location.path + ('?' + location.query if location.query else '')
+                continue
+            return scheme, netloc, conn, response
+
+        raise WebHDFSError(f"Trop de redirections pour {url}")
+
+    @staticmethod
+    def _read_body(conn, response, netloc: str, amount: Optional[int] = None) -> bytes:
+        """Lit (une partie du) corps; en cas d'erreur, ferme la connexion et lève WebHDFSError"""
+        try:
+            return response.read(amount)
+        except TRANSPORT_ERRORS as e:
+            conn.close()
+            raise WebHDFSError(f"Réponse WebHDFS interrompue ({netloc}): {e}")
+
+    @staticmethod
+    def _remote_message(body: bytes, status: int) -> str:
+        try:
+            remote = json.loads(body)['RemoteException']
+            return f"{remote.get('exception')}: {remote.get('message')}"
+        except (ValueError, KeyError, TypeError):
+            return f"HTTP {status}"
+
+    def _json(self, method: str, url: str) -> Dict:
+        scheme, netloc, conn, response = self._open_response(method, url)
+        body = self._read_body(conn, response, netloc)
+        self.pool.release(scheme, netloc, conn)
+        return json.loads(body)
+
+    def close(self):
+        self.pool.close()
+
+    # ============ Métadonnées ============
+
+    def list_status(self, path: str) -> List[Dict]:
+        """
+        Contenu d'un répertoire (LISTSTATUS)
+
+        Returns:
+            FileStatus WebHDFS (pathSuffix, type, length, modificationTime...)
+        """
+        data = self._json('GET', self._url(path, 'LISTSTATUS'))
+        return data['FileStatuses']['FileStatus']
+
+    def get_file_status(self, path: str) -> Dict:
+        return self._json('GET', self._url(path, 'GETFILESTATUS'))['FileStatus']
+
+    def get_file_checksum(self, path: str) -> Dict:
+        """Somme de contrôle du fichier (FileChecksum: algorithm, bytes, length)"""
+        return self._json('GET', self._url(path, 'GETFILECHECKSUM'))['FileChecksum']
+
+    def exists(self, path: str) -> bool:
+        try:
+            self.get_file_status(path)
+            return True
+        except WebHDFSError as e:
+            if e.status == 404:
+                return False
+            raise
+
+    def glob_status(self, pattern: str) -> List[Dict]:
+        """
+        Fichiers correspondant à un motif (`/urban_data/aggregated/part-*`)
+
+        Returns:
+            FileStatus complétés du chemin absolu ('path'), triés par chemin
+        """
+        segments = [s for s in pattern.split('/') if s]
+        candidates = ['']
+        for depth, segment in enumerate(segments):
+            last = depth == len(segments) - 1
+            matches = []
+            for parent in candidates:
+                if not has_magic(segment) and not last:
+                    matches.append(f"{parent}/{segment}")
+                    continue
+                try:
+                    statuses = self.list_status(parent or '/')
+                except WebHDFSError as e:
+                    if e.status == 404:
+                        continue
+                    raise
+                for status in statuses:
+                    name = status['pathSuffix']
+                    if not fnmatch.fnmatchcase(name, segment):
+                        continue
+                    if last:
+                        if status['type'] == 'FILE':
+                            matches.append(dict(status, path=f"{parent}/{name}"))
+                    elif status['type'] == 'DIRECTORY':
+                        matches.append(f"{parent}/{name}")
+            candidates = matches
+        return sorted(candidates, key=lambda s: s['path'])
+
+    def glob(self, pattern: str) -> List[str]:
+        """Chemins des fichiers correspondant au motif"""
+        return [status['path'] for status in self.glob_status(pattern)]
+
+    # ============ Lecture ============
+
+    def iter_chunks(self, path: str, offset: Optional[int] = None, length: Optional[int] = None,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Lit un fichier en flux (OPEN), bloc par bloc
+
+        Args:
+            offset: position de départ en octets (optionnel)
+            length: nombre d'octets à lire (optionnel)
+        """
+        scheme, netloc, conn, response = self._open_response(
+            'GET', self._url(path, 'OPEN', offset=offset, length=length))
+        complete = False
+        try:
+            while True:
+                chunk = self._read_body(conn, response, netloc, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            complete = True
+        finally:
+            # Lecture interrompue: la connexion ne peut pas être réutilisée
+            if complete:
+                self.pool.release(scheme, netloc, conn)
+            else:
+                conn.close()
+
+    def iter_lines(self, pattern: str, offset: Optional[int] = None,
+                   length: Optional[int] = None) -> Iterator[str]:
+        """
+        Lignes (sans fin de ligne) des fichiers du motif, l'un après l'autre, en flux
+
+        Raises:
+            WebHDFSError: 404 si aucun fichier ne correspond (comme `hdfs dfs -cat`)
+        """
+        paths = self.glob(pattern) if has_magic(pattern) else [pattern]
+        if not paths:
+            raise WebHDFSError(f"Aucun fichier pour {pattern}", 404)
+        for path in paths:
+            tail = b''
+            for chunk in self.iter_chunks(path, offset, length):
+                lines = (tail + chunk).split(b'\n')
+                tail = lines.pop()
+                for line in lines:
+                    yield line.decode('utf-8', 'replace')
+            if tail:
+                yield tail.decode('utf-8', 'replace')
+
+    def read(self, path: str, offset: Optional[int] = None, length: Optional[int] = None) -> bytes:
+        return b''.join(self.iter_chunks(path, offset, length))
+
+    def read_many(self, paths: List[str], max_workers: int = MAX_PARALLEL_READS) -> List[bytes]:
+        """Lit plusieurs fichiers en parallèle (contenus dans l'ordre de `paths`)"""
+        if len(paths) <= 1:
+            return [self.read(p) for p in paths]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+            return list(executor.map(self.read, paths))
+
+    def read_text(self, pattern: str) -> str:
+        """Équivalent de `hdfs dfs -cat motif` (parts lues en parallèle)"""
+        paths = self.glob(pattern) if has_magic(pattern) else [pattern]
+        if not paths:
+            raise WebHDFSError(f"Aucun fichier pour {pattern}", 404)
+        return b''.join(self.read_many(paths)).decode('utf-8', 'replace')
+
+    # ============ Async (handlers FastAPI) ============
+
+    async def alist_status(self, path: str) -> List[Dict]:
+        return await asyncio.to_thread(self.list_status, path)
+
+    async def aglob(self, pattern: str) -> List[str]:
+        return await asyncio.to_thread(self.glob, pattern)
+
+    async def aread(self, path: str, offset: Optional[int] = None, length: Optional[int] = None) -> bytes:
+        return await asyncio.to_thread(self.read, path, offset, length)
+
+    async def aread_many(self, paths: List[str], max_parallel: int = MAX_PARALLEL_READS) -> List[bytes]:
+        """Lectures concurrentes, au plus max_parallel à la fois"""
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def read_one(path):
+            async with semaphore:
+                return await self.aread(path)
+
+        return list(await asyncio.gather(*(read_one(p) for p in paths)))
+
+    async def aread_text(self, pattern: str) -> str:
+        paths = await self.aglob(pattern) if has_magic(pattern) else [pattern]
+        if not paths:
+            raise WebHDFSError(f"Aucun fichier pour {pattern}", 404)
+        return b''.join(await self.aread_many(paths)).decode('utf-8', 'replace')
+
+
+# Instance globale
+webhdfs = WebHDFSClient()
@@ -0,0 +1,146 @@
+"""
+Tests des pipelines d'agrégation MongoDB
+
+Les tests de plan d'exécution demandent un mongod (MONGODB_TEST_URL,
+mongodb://localhost:27017 par défaut) et sont ignorés sans serveur.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services'))
+
+from mongodb_service import INDEXES, MongoDBService, zone_stats_pipeline
+
+MONGODB_TEST_URL = os.environ.get('MONGODB_TEST_URL', 'mongodb://localhost:27017')
+TEST_DB = 'smartcity_test_indexes'
+
+
+def mongod_available():
+    try:
+        from pymongo import MongoClient
+        client = MongoClient(MONGODB_TEST_URL, serverSelectionTimeoutMS=500)
+        client.admin.command('ping')
+        client.close()
+        return True
+    except Exception:
+        return False
+
+
+requires_mongod = pytest.mark.skipif(not mongod_available(), reason="mongod indisponible")
+
+
+@pytest.fixture
+def db_name():
+    """Base de test remplie par pymongo (synchrone); chaque test ouvre son client motor"""
+    from pymongo import MongoClient
+
+    seed = MongoClient(MONGODB_TEST_URL)
+    seed.drop_database(TEST_DB)
+    # Assez de documents pour que le planificateur préfère l'index. Les
+    # véhicules impairs n'embarquent pas leurs émissions (collection emissions)
+    gps, emissions = [], []
+    for t in range(200):
+        for v in range(20):
+            values = {'co2': 1000.0, 'co': 1.0, 'nox': 0.1, 'pmx': 0.01, 'noise': 60.0, 'fuel': 200.0 + v % 2 * 100}
+            doc = {'timestamp': t, 'vehicule_id': f"veh{v}", 'speed': 30.0,
+                   'position': {'x': 7600.0 + v, 'y': 6100.0}}
+            if v % 2:
+                emissions.append({'timestamp': t, 'vehicule_id': f"veh{v}", 'emissions': values})
+            else:
+                doc['emissions'] = values
+            gps.append(doc)
+    # Un GPS sans émissions nulle part: écarté, comme par la jointure Hadoop
+    gps.append({'timestamp': 10, 'vehicule_id': 'orphan', 'speed': 90.0, 'position': {'x': 7600.0, 'y': 6100.0}})
+    seed[TEST_DB].gps.insert_many(gps)
+    seed[TEST_DB].emissions.insert_many(emissions)
+
+    yield TEST_DB
+    seed.drop_database(TEST_DB)
+    seed.close()
+
+
+def run_with_db(db_name, body):
+    """Exécute body(db) dans une seule boucle asyncio, avec un client motor créé dans cette boucle"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def main():
+        client = AsyncIOMotorClient(MONGODB_TEST_URL)
+        try:
+            return await body(client[db_name])
+        finally:
+            client.close()
+
+    return asyncio.run(main())
+
+
+def test_winning_stages_of_find_plan():
+    explain = {'queryPlanner': {'winningPlan': {
+        'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'timestamp_vehicule_id'}}}}
+    assert MongoDBService.winning_stages(explain) == ['FETCH', 'IXSCAN']
+
+
+def test_winning_stages_of_pipeline_plan():
+    # Explain d'un pipeline: plan de la requête sous la première étape $cursor
+    explain = {'stages': [
+        {'$cursor': {'queryPlanner': {'winningPlan': {'queryPlan': {
+            'stage': 'PROJECTION_SIMPLE', 'inputStage': {
+                'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}}}}}},
+        {'$group': {}},
+    ]}
+    assert MongoDBService.winning_stages(explain) == ['PROJECTION_SIMPLE', 'FETCH', 'IXSCAN']
+    assert MongoDBService.winning_stages({'stages': [{'$group': {}}]}) == []
+
+
+def test_zone_stats_pipeline_matches_on_timestamp_first():
+    pipeline = zone_stats_pipeline(10, 20, resolution=60, zone='Maarif')
+    assert pipeline[0]['$match']['timestamp'] == {'$gte': 10, '$lte': 20}
+    with pytest.raises(ValueError):
+        zone_stats_pipeline(10, 20, zone='Inconnue')
+
+
+@requires_mongod
+def test_ensure_indexes_is_idempotent(db_name):
+    async def body(db):
+        first = await MongoDBService.ensure_indexes(db)
+        second = await MongoDBService.ensure_indexes(db)
+        return first, second, await db.gps.index_information(), await db.emissions.index_information()
+
+    first, second, gps_info, emissions_info = run_with_db(db_name, body)
+    expected = {index.document['name'] for index in INDEXES['gps']}
+    assert expected <= set(first)
+    assert sorted(first) == sorted(second)
+    assert expected <= set(gps_info)
+    assert expected <= set(emissions_info)
+
+
+@requires_mongod
+@pytest.mark.parametrize('zone', [None, 'Maarif'])
+def test_zone_stats_pipeline_uses_index(db_name, zone):
+    async def body(db):
+        await MongoDBService.ensure_indexes(db)
+        pipeline = zone_stats_pipeline(50, 59, resolution=60, zone=zone)
+        return await MongoDBService.explain(db, 'gps', pipeline)
+
+    stages = MongoDBService.winning_stages(run_with_db(db_name, body))
+    assert 'IXSCAN' in stages
+    assert 'COLLSCAN' not in stages
+
+
+@requires_mongod
+def test_zone_stats_join_emissions_like_hdfs(db_name):
+    async def body(db):
+        await MongoDBService.ensure_indexes(db)
+        return await MongoDBService.get_zone_stats(db, 0, 59, resolution=60, zone='Maarif')
+
+    rows = run_with_db(db_name, body)
+    assert len(rows) == 1
+    stats = rows[0]['stats']
+    # GPS sans émissions écarté, émissions jointes pour les véhicules impairs
+    assert stats['vehicle_count'] == 60 * 20
+    # min(fuel * 0.1, 100), comme mapper_aggregate_zone.py: moyenne de 20 et 30
+    assert stats['avg_speed_kmh'] == 25.0
+    assert stats['avg_co2'] == 1000.0
@@ -0,0 +1,228 @@
+"""
+Tests du client WebHDFS contre un NameNode et un DataNode simulés
+(http.server en tâche de fond, HTTP/1.1 keep-alive)
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services'))
+
+from webhdfs_client import WebHDFSClient, WebHDFSError
+
+FILES = {
+    '/urban_data/aggregated/part-00000': b'{"zone": "Maarif"}\n{"zone": "Anfa"}\n',
+    '/urban_data/aggregated/part-00001': b'{"zone": "Ain Diab"}\n',
+    '/urban_data/aggregated/_SUCCESS': b'',
+    '/urban_data/alerts/part-00000': b'{"id": "a"}\n',
+}
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Serveur WebHDFS simulé: compte les connexions TCP et les requêtes"""
+
+    daemon_threads = True
+
+    def __init__(self, handler, datanode=None):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.datanode = datanode
+        self.connections = 0
+        self.requests = []
+
+    @property
+    def netloc(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, content_type='application/json', headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self, path):
+        remote = {'exception': 'FileNotFoundException', 'message': f"File does not exist: {path}"}
+        self.send_body(404, json.dumps({'RemoteException': remote}).encode())
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path[len('/webhdfs/v1'):] or '/'
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.requests.append((path, query['op']))
+        self.handle_op(path.rstrip('/') or '/', query)
+
+
+class NameNodeHandler(Handler):
+    def handle_op(self, path, query):
+        op = query['op']
+        if path == '/broken/status':
+            self.wfile.write(b'garbage\r\n\r\n')
+            self.close_connection = True
+            return
+        if path == '/broken/truncated':
+            self.send_response(200)
+            self.send_header('Content-Length', '100')
+            self.end_headers()
+            self.wfile.write(b'{"FileStatus": ')
+            self.close_connection = True
+            return
+        if op == 'OPEN':
+            if path not in FILES:
+                return self.not_found(path)
+            location = f"http://{self.server.datanode.netloc}{self.path}"
+            return self.send_body(307, b'', headers=[('Location', location)])
+
+        if op == 'GETFILESTATUS':
+            if path not in FILES:
+                return self.not_found(path)
+            status = {'pathSuffix': '', 'type': 'FILE', 'length': len(FILES[path])}
+            return self.send_body(200, json.dumps({'FileStatus': status}).encode())
+
+        if op == 'LISTSTATUS':
+            prefix = '' if path == '/' else path
+            children = {}
+            for name in FILES:
+                if name.startswith(prefix + '/'):
+                    child, _, rest = name[len(prefix) + 1:].partition('/')
+                    if rest:
+                        children[child] = {'pathSuffix': child, 'type': 'DIRECTORY', 'length': 0}
+                    else:
+                        children[child] = {'pathSuffix': child, 'type': 'FILE', 'length': len(FILES[name])}
+            if not children:
+                return self.not_found(path)
+            statuses = {'FileStatuses': {'FileStatus': list(children.values())}}
+            return self.send_body(200, json.dumps(statuses).encode())
+
+        self.send_body(400, b'{}')
+
+
+class DataNodeHandler(Handler):
+    def handle_op(self, path, query):
+        data = FILES[path]
+        offset = int(query.get('offset', 0))
+        length = int(query['length']) if 'length' in query else len(data)
+        self.send_body(200, data[offset:offset + length], 'application/octet-stream')
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def cluster():
+    datanode = serve(FakeServer(DataNodeHandler))
+    namenode = serve(FakeServer(NameNodeHandler, datanode))
+    client = WebHDFSClient(f"http://{namenode.netloc}", user='test')
+    yield client, namenode, datanode
+    client.close()
+    for server in (namenode, datanode):
+        server.shutdown()
+        server.server_close()
+
+
+def test_glob_resolves_wildcards(cluster):
+    client, _, _ = cluster
+    assert client.glob('/urban_data/aggregated/part-*') == [
+        '/urban_data/aggregated/part-00000',
+        '/urban_data/aggregated/part-00001',
+    ]
+    assert client.glob('/urban_data/*/part-00000') == [
+        '/urban_data/aggregated/part-00000',
+        '/urban_data/alerts/part-00000',
+    ]
+    statuses = client.glob_status('/urban_data/aggregated/part-*')
+    assert [s['length'] for s in statuses] == [len(FILES[s['path']]) for s in statuses]
+    assert all(s['length'] for s in statuses)
+    assert client.glob('/urban_data/missing/part-*') == []
+
+
+def test_open_follows_redirect_to_datanode(cluster):
+    client, namenode, datanode = cluster
+    path = '/urban_data/aggregated/part-00000'
+    assert client.read(path) == FILES[path]
+    assert namenode.requests == [(path, 'OPEN')]
+    assert datanode.requests == [(path, 'OPEN')]
+
+
+def test_read_offset_and_length(cluster):
+    client, _, _ = cluster
+    path = '/urban_data/aggregated/part-00000'
+    assert client.read(path, offset=19) == b'{"zone": "Anfa"}\n'
+    assert client.read(path, offset=2, length=4) == b'zone'
+    assert list(client.iter_lines(path, offset=19)) == ['{"zone": "Anfa"}']
+
+
+def test_iter_lines_over_parts(cluster):
+    client, _, _ = cluster
+    lines = list(client.iter_lines('/urban_data/aggregated/part-*'))
+    assert lines == ['{"zone": "Maarif"}', '{"zone": "Anfa"}', '{"zone": "Ain Diab"}']
+
+
+def test_missing_file_raises_404(cluster):
+    client, _, _ = cluster
+    with pytest.raises(WebHDFSError) as error:
+        client.read('/urban_data/missing.json')
+    assert error.value.status == 404
+    assert 'FileNotFoundException' in str(error.value)
+    assert not client.exists('/urban_data/missing.json')
+    assert client.exists('/urban_data/alerts/part-00000')
+
+
+def test_empty_glob_raises_404(cluster):
+    client, _, _ = cluster
+    with pytest.raises(WebHDFSError) as error:
+        list(client.iter_lines('/urban_data/aggregated/missing-*'))
+    assert error.value.status == 404
+
+
+@pytest.mark.parametrize('path', ['/broken/status', '/broken/truncated'])
+def test_protocol_errors_raise_webhdfs_error(cluster, path):
+    client, namenode, _ = cluster
+    with pytest.raises(WebHDFSError) as error:
+        client.get_file_status(path)
+    assert error.value.status is None
+    # La connexion fautive n'est pas rendue au pool: la requête suivante en ouvre une autre
+    assert client.exists('/urban_data/alerts/part-00000')
+    assert namenode.connections == 2
+
+
+def test_connections_are_reused(cluster):
+    client, namenode, datanode = cluster
+    for _ in range(5):
+        client.read('/urban_data/alerts/part-00000')
+        client.list_status('/urban_data/aggregated')
+    assert len(namenode.requests) == 10
+    assert namenode.connections == 1
+    assert datanode.connections == 1
+
+
+def test_interrupted_read_closes_connection(cluster):
+    client, _, datanode = cluster
+    path = '/urban_data/aggregated/part-00000'
+    chunks = client.iter_chunks(path, chunk_size=4)
+    next(chunks)
+    chunks.close()
+    # La connexion à moitié lue n'est pas rendue au pool
+    assert client.read(path) == FILES[path]
+    assert datanode.connections == 2